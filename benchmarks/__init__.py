@@ -0,0 +1,10 @@
+"""
+Offline benchmarks for the review pipeline.
+
+The benchmarks run the Processor, DiffCollection, Problems and
+Review.publish against a fake GitHub API built from the recorded
+fixtures in tests/fixtures, and a fake docker backend that replays
+canned tool output. No network access or docker daemon is required.
+
+Run with `python -m benchmarks --help` from the repository root.
+"""
@@ -0,0 +1,50 @@
+import argparse
+import logging
+import sys
+
+from benchmarks import runner
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Benchmark the review pipeline with a fake '
+                    'GitHub API and docker backend.')
+    parser.add_argument('--sizes',
+                        default=','.join(str(s) for s in runner.SIZES),
+                        help='Comma separated pull request sizes in files. '
+                             'Default: %(default)s')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds each fake container run takes.')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip measuring peak memory per stage.')
+    parser.add_argument('--output',
+                        help='Save the results as JSON to this path.')
+    parser.add_argument('--baseline',
+                        help='Compare the results with a saved JSON file.')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed increase over the baseline before '
+                             'a stage is a regression. Default: %(default)s')
+    args = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('buildlog').setLevel(logging.ERROR)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    results = runner.run(sizes, args.latency, memory=not args.no_memory)
+    print(runner.format_results(results))
+
+    if args.output:
+        runner.save(results, args.output)
+    if args.baseline:
+        regressions = runner.compare(
+            results, runner.load(args.baseline), args.threshold)
+        for regression in regressions:
+            print(u'Regression: {}'.format(regression))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
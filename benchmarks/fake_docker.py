@@ -0,0 +1,67 @@
+import time
+
+import lintreview.docker as docker
+
+
+class FakeDocker(object):
+    """Replaces the lintreview.docker functions used by tools
+    with a backend that replays canned tool output.
+
+    `outputs` is a dict of filename to a list of output lines.
+    Each container run sleeps for `latency` seconds to simulate
+    container startup.
+    """
+    VERSION = 'flake8 3.7.9 (benchmark)'
+
+    def __init__(self, outputs, latency=0.0):
+        self.outputs = outputs
+        self.latency = latency
+        self.runs = 0
+        self._original = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        replacements = {
+            'run': self.run,
+            'image_exists': self.image_exists,
+            'rm_image': self.noop,
+            'rm_container': self.noop,
+        }
+        for name, func in replacements.items():
+            self._original[name] = getattr(docker, name)
+            setattr(docker, name, func)
+
+    def stop(self):
+        for name, func in self._original.items():
+            setattr(docker, name, func)
+        self._original = {}
+
+    def image_exists(self, name):
+        return True
+
+    def noop(self, *args, **kwargs):
+        pass
+
+    def run(self, image, command, source_dir, **kwargs):
+        self.runs += 1
+        if self.latency:
+            time.sleep(self.latency)
+        output = docker.ContainerOutput(docker._max_output)
+        if '--version' in command:
+            output.write(self.VERSION)
+        for arg in command:
+            arg = str(arg)
+            if not arg.startswith(docker.DOCKER_BASE):
+                continue
+            for line in self.outputs.get(docker.strip_base(arg), []):
+                output.write(line + u'\n')
+        if kwargs.get('stream'):
+            return output
+        with output:
+            return output.read()
@@ -0,0 +1,113 @@
+import json
+import os
+import re
+from urllib.parse import urlparse, parse_qs
+
+import responses
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+fixtures_path = os.path.join(root_dir, 'tests', 'fixtures')
+
+API = 'https://api.github.com/repos/markstory/lint-test'
+
+
+def load_fixture(filename):
+    with open(os.path.join(fixtures_path, filename), 'r') as fh:
+        return fh.read()
+
+
+class FakeGitHub(object):
+    """A fake of the GitHub API endpoints used in a review.
+
+    Responses are built from the recorded fixtures, with the
+    pull request files and existing review comments replaced by
+    the generated ones in `scenario`. List endpoints are paginated
+    like the GitHub API so large pull requests make the same
+    number of requests they would against GitHub.
+
+    Requests made are counted by method and endpoint in `requests`.
+    """
+    PER_PAGE = 30
+
+    def __init__(self, scenario):
+        self.scenario = scenario
+        self.requests = {}
+        self.reviews = []
+        self._mock = responses.RequestsMock(
+            assert_all_requests_are_fired=False)
+        self._register()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._mock.start()
+
+    def stop(self):
+        self._mock.stop()
+        self._mock.reset()
+
+    @property
+    def request_count(self):
+        return sum(self.requests.values())
+
+    def _register(self):
+        pull = json.loads(load_fixture('pull_request.json'))
+        head = pull['head']['sha']
+        fixtures = [
+            ('GET', '', json.loads(load_fixture('repository.json'))),
+            ('GET', '/pulls/1', pull),
+            ('GET', '/pulls/1/commits',
+             json.loads(load_fixture('commits.json'))),
+        ]
+        for method, path, body in fixtures:
+            self._add(method, path, self._static(body))
+
+        self._add('GET', '/pulls/1/files',
+                  self._paginated(self.scenario.pull_files))
+        self._add('GET', '/pulls/1/comments',
+                  self._paginated(self.scenario.comments))
+        self._add('POST', '/pulls/1/reviews', self._create_review)
+        self._add('POST', '/statuses/' + head, self._static({}, 201))
+        self._add('POST', '/issues/1/comments', self._static({}, 201))
+
+    def _add(self, method, path, callback):
+        url = re.compile(re.escape(API + path) + r'(\?.*)?$')
+
+        def counted(request):
+            key = '{} {}'.format(method, path or '/')
+            self.requests[key] = self.requests.get(key, 0) + 1
+            return callback(request)
+        self._mock.add_callback(method, url, callback=counted,
+                                content_type='application/json')
+
+    def _static(self, body, status=200):
+        data = json.dumps(body)
+
+        def callback(request):
+            return (status, {}, data)
+        return callback
+
+    def _paginated(self, items):
+        def callback(request):
+            url = urlparse(request.url)
+            query = parse_qs(url.query)
+            per_page = int(query.get('per_page', [self.PER_PAGE])[0])
+            page = int(query.get('page', [1])[0])
+            start = (page - 1) * per_page
+            headers = {}
+            if start + per_page < len(items):
+                next_url = '{}://{}{}?per_page={}&page={}'.format(
+                    url.scheme, url.netloc, url.path, per_page, page + 1)
+                headers['Link'] = '<{}>; rel="next"'.format(next_url)
+            body = json.dumps(items[start:start + per_page])
+            return (200, headers, body)
+        return callback
+
+    def _create_review(self, request):
+        self.reviews.append(json.loads(request.body))
+        return (200, {}, json.dumps({}))
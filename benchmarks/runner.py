@@ -0,0 +1,160 @@
+import gc
+import json
+import logging
+import platform
+import tempfile
+import time
+import tracemalloc
+
+from lintreview.config import build_review_config
+from lintreview.diff import parse_diff
+from lintreview.processor import Processor
+from lintreview.repo import GithubRepository
+from benchmarks.fake_docker import FakeDocker
+from benchmarks.fake_github import FakeGitHub
+from benchmarks.scenarios import Scenario, load_templates
+
+log = logging.getLogger(__name__)
+
+SIZES = (10, 1000, 3000)
+
+STAGES = ('parse_diff', 'load_changes', 'run_tools', 'publish')
+
+LINTRC = """
+[tools]
+linters = flake8
+"""
+
+APP_CONFIG = {
+    'GITHUB_OAUTH_TOKEN': 'fake-token',
+    'SUMMARY_THRESHOLD': 1000000,
+}
+
+# Time differences smaller than this are treated as noise.
+MIN_SECONDS = 0.005
+
+
+def run(sizes=SIZES, latency=0.0, memory=True):
+    """Run the benchmark for pull requests of each size in `sizes`.
+
+    Returns a dict of results that can be saved as JSON.
+    """
+    templates = load_templates()
+    results = {}
+    for size in sizes:
+        scenario = Scenario(size, templates)
+        log.info('Running benchmark for %d files', size)
+        result = run_scenario(scenario, latency)
+        if memory:
+            peaks = run_scenario(scenario, latency, trace=True)
+            for stage, values in result['stages'].items():
+                values['peak_bytes'] = peaks['stages'][stage]['peak_bytes']
+        results[str(size)] = result
+    return {
+        'python': platform.python_version(),
+        'latency': latency,
+        'results': results,
+    }
+
+
+def run_scenario(scenario, latency=0.0, trace=False):
+    """Review the scenario pull request once, timing each stage.
+
+    When `trace` is set the peak memory allocated in each stage
+    is measured with tracemalloc, which slows the stages down.
+    """
+    stages = {}
+
+    def measure(stage, func):
+        gc.collect()
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            elapsed = time.perf_counter() - start
+            values = {}
+            if trace:
+                values['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                values['seconds'] = round(elapsed, 6)
+            stages[stage] = values
+
+    measure('parse_diff', lambda: len(parse_diff(scenario.diff_text)))
+
+    github = FakeGitHub(scenario)
+    fake_docker = FakeDocker(scenario.outputs, latency)
+    with github, fake_docker, tempfile.TemporaryDirectory() as target:
+        config = build_review_config(LINTRC, APP_CONFIG)
+        repo = GithubRepository(APP_CONFIG, 'markstory', 'lint-test')
+        pull = repo.pull_request(1)
+        processor = Processor(repo, pull, target, config)
+
+        measure('load_changes', processor.load_changes)
+        review, problems = measure('run_tools', processor.execute)
+        found = len(problems)
+        measure('publish', lambda: review.publish(problems))
+
+    published = sum(len(r['comments']) for r in github.reviews)
+    return {
+        'files': scenario.size,
+        'problems': found,
+        'comments': published,
+        'requests': github.request_count,
+        'containers': fake_docker.runs,
+        'stages': stages,
+    }
+
+
+def compare(current, baseline, threshold=0.2):
+    """Compare results with a baseline.
+
+    Returns a list of messages for stages that are slower or
+    use more memory than the baseline by more than `threshold`.
+    """
+    regressions = []
+    for size, result in sorted(current['results'].items()):
+        base = baseline.get('results', {}).get(size)
+        if not base:
+            continue
+        for stage, values in sorted(result['stages'].items()):
+            base_values = base['stages'].get(stage, {})
+            for key, value in sorted(values.items()):
+                previous = base_values.get(key)
+                if not previous:
+                    continue
+                if key == 'seconds' and value - previous < MIN_SECONDS:
+                    continue
+                if value > previous * (1 + threshold):
+                    regressions.append(
+                        u'{} files {} {}: {} > {} (+{:.0%})'.format(
+                            size, stage, key, value, previous,
+                            value / previous - 1))
+    return regressions
+
+
+def format_results(results):
+    lines = [u'{:>6} {:<14} {:>10} {:>12}'.format(
+        'files', 'stage', 'seconds', 'peak KiB')]
+    for size, result in sorted(results['results'].items(),
+                               key=lambda item: int(item[0])):
+        for stage in STAGES:
+            values = result['stages'].get(stage, {})
+            peak = values.get('peak_bytes')
+            lines.append(u'{:>6} {:<14} {:>10.4f} {:>12}'.format(
+                size, stage, values.get('seconds', 0),
+                '-' if peak is None else peak // 1024))
+    return u'\n'.join(lines)
+
+
+def load(path):
+    with open(path, 'r') as fh:
+        return json.load(fh)
+
+
+def save(results, path):
+    with open(path, 'w') as fh:
+        json.dump(results, fh, indent=2, sort_keys=True)
+        fh.write('\n')
@@ -0,0 +1,108 @@
+import json
+import os
+
+from lintreview.diff import parse_diff
+from benchmarks.fake_github import fixtures_path, load_fixture
+
+# Recorded diffs used as templates for the generated pull request files.
+DIFF_FIXTURES = (
+    'diff/one_file.txt',
+    'diff/two_files.txt',
+    'diff/long_diff.txt',
+    'diff/two_file_pull_request.txt',
+    'diff/multiple_wildcard_pull_request.txt',
+    'diff/diff_single_line_add.txt',
+)
+
+# Problems reported per file on changed lines, and on lines
+# outside of the diff that are removed by Problems.limit_to_changes()
+CHANGED_PROBLEMS = 3
+UNCHANGED_PROBLEMS = 2
+
+# One in every EXISTING_EVERY files has its first problem
+# already published as a review comment.
+EXISTING_EVERY = 4
+
+
+class Template(object):
+    """A recorded file diff and the lines it changes."""
+
+    def __init__(self, diff):
+        self.patch = diff.patch
+        self.added = sorted(diff.added_lines())
+        self.deleted = sorted(diff.deleted_lines())
+        self.positions = dict(
+            (line, diff.line_position(line))
+            for line in self.added[:CHANGED_PROBLEMS])
+
+
+def load_templates():
+    templates = []
+    for filename in DIFF_FIXTURES:
+        with open(os.path.join(fixtures_path, filename), 'r') as fh:
+            for diff in parse_diff(fh):
+                if diff.added_lines():
+                    templates.append(Template(diff))
+    return templates
+
+
+class Scenario(object):
+    """A generated pull request with `size` changed python files.
+
+    Each file reuses the patch of a recorded diff fixture, and has
+    canned flake8 output in `outputs` along with the review comments
+    that would already exist from a previous review in `comments`.
+    """
+
+    def __init__(self, size, templates=None):
+        self.size = size
+        templates = templates or load_templates()
+        pull_file = json.loads(load_fixture('one_file_pull_request.json'))[0]
+        comment = json.loads(load_fixture('comments_current.json'))[0]
+
+        self.pull_files = []
+        self.comments = []
+        self.outputs = {}
+        self.diff_text = []
+        for i in range(size):
+            template = templates[i % len(templates)]
+            filename = 'pkg{:03d}/module_{:05d}.py'.format(i // 100, i)
+
+            data = dict(pull_file)
+            data.update({
+                'filename': filename,
+                'patch': template.patch,
+                'additions': len(template.added),
+                'deletions': len(template.deleted),
+                'changes': len(template.added) + len(template.deleted),
+            })
+            self.pull_files.append(data)
+
+            lines = self._output(filename, template)
+            self.outputs[filename] = lines
+            if i % EXISTING_EVERY == 0:
+                line = template.added[0]
+                data = dict(comment)
+                data.update({
+                    'path': filename,
+                    'position': template.positions[line],
+                    'body': self._message(line),
+                })
+                self.comments.append(data)
+
+            self.diff_text.append(
+                u'diff --git a/{0} b/{0}\n--- a/{0}\n+++ b/{0}\n{1}\n'.format(
+                    filename, template.patch))
+        self.diff_text = u''.join(self.diff_text)
+
+    def _message(self, line):
+        return u'E501 line too long ({} > 79 characters)'.format(80 + line)
+
+    def _output(self, filename, template):
+        lines = template.added[:CHANGED_PROBLEMS]
+        end = max(template.added + template.deleted)
+        lines += [end + 100 + i for i in range(UNCHANGED_PROBLEMS)]
+        return [
+            u'/src/{}:{}:80: {}'.format(filename, line, self._message(line))
+            for line in lines
+        ]
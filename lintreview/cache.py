@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+
+@contextmanager
+def connect(path, timeout=30):
+    """Open a transaction on a sqlite database used as a local store.
+
+    Connections are opened per operation so that stores are
+    safe to use across threads and forked celery workers.
+    """
+    dirname = os.path.dirname(path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    db = sqlite3.connect(path, timeout=timeout)
+    try:
+        with db:
+            yield db
+    finally:
+        db.close()
+
+
+def get_result_cache(config):
+    """Get the lint result cache if it is enabled in the config.
+    """
+    path = config.get('RESULT_CACHE_PATH')
+    if not path:
+        return None
+    max_size = config.get('RESULT_CACHE_SIZE', ResultCache.DEFAULT_SIZE)
+    return ResultCache(path, max_size)
+
+
+class ResultCache(object):
+    """Persistent store of tool results.
+
+    Values are JSON serializable objects stored by content
+    addressed keys. When the stored values exceed `max_size` bytes
+    the least recently used entries are evicted.
+    """
+    DEFAULT_SIZE = 100 * 1024 * 1024
+
+    def __init__(self, path, max_size=DEFAULT_SIZE):
+        self.path = path
+        self.max_size = int(max_size)
+        self._setup()
+
+    def _setup(self):
+        with self._connect() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, '
+                'value TEXT NOT NULL, '
+                'size INTEGER NOT NULL, '
+                'accessed REAL NOT NULL)')
+            db.execute(
+                'CREATE INDEX IF NOT EXISTS results_accessed '
+                'ON results (accessed)')
+            # The total size of the results is kept as a running total
+            # so that writes don't need to scan the whole table.
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS meta ('
+                'name TEXT PRIMARY KEY, '
+                'value INTEGER NOT NULL)')
+            db.execute(
+                "INSERT OR IGNORE INTO meta (name, value) "
+                "SELECT 'size', COALESCE(SUM(size), 0) FROM results")
+
+    def _connect(self):
+        return connect(self.path)
+
+    def get(self, key):
+        """Get a value from the cache. Returns None on a miss.
+        """
+        try:
+            with self._connect() as db:
+                row = db.execute(
+                    'SELECT value FROM results WHERE key = ?',
+                    (key,)).fetchone()
+                if row is None:
+                    return None
+                db.execute(
+                    'UPDATE results SET accessed = ? WHERE key = ?',
+                    (time.time(), key))
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            log.warning('Could not read result cache. error=%s', e)
+            return None
+
+    def set(self, key, value):
+        """Store a value in the cache and evict old entries
+        if the cache has grown too large.
+        """
+        data = json.dumps(value)
+        try:
+            with self._connect() as db:
+                row = db.execute(
+                    'SELECT size FROM results WHERE key = ?',
+                    (key,)).fetchone()
+                previous = row[0] if row else 0
+                db.execute(
+                    'INSERT OR REPLACE INTO results '
+                    '(key, value, size, accessed) VALUES (?, ?, ?, ?)',
+                    (key, data, len(data), time.time()))
+                self._add_size(db, len(data) - previous)
+                self._evict(db)
+        except sqlite3.Error as e:
+            log.warning('Could not write result cache. error=%s', e)
+
+    def _add_size(self, db, delta):
+        db.execute(
+            "UPDATE meta SET value = value + ? WHERE name = 'size'",
+            (delta,))
+
+    def size(self):
+        """Get the total size of the stored values in bytes."""
+        with self._connect() as db:
+            return self._size(db)
+
+    def _size(self, db):
+        row = db.execute(
+            "SELECT value FROM meta WHERE name = 'size'").fetchone()
+        return row[0] if row else 0
+
+    def _evict(self, db):
+        total = self._size(db)
+        if total <= self.max_size:
+            return
+        log.info('Result cache is %s bytes, evicting old entries', total)
+        rows = db.execute('SELECT key, size FROM results ORDER BY accessed')
+        remove = []
+        removed = 0
+        for key, size in rows:
+            if total - removed <= self.max_size:
+                break
+            remove.append((key,))
+            removed += size
+        db.executemany('DELETE FROM results WHERE key = ?', remove)
+        self._add_size(db, -removed)
+
+    def __len__(self):
+        with self._connect() as db:
+            return db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
@@ -1,3 +1,5 @@
+import hashlib
+import json
 import os
 import logging.config
 
@@ -167,6 +169,63 @@ class ReviewConfig(object):
         except Exception:
             return None
 
+    def tool_workers(self):
+        """Get the number of tools that can be run concurrently.
+        """
+        try:
+            return max(1, int(self._data['TOOL_WORKERS']))
+        except Exception:
+            return 1
+
+    def checkrun_workers(self):
+        """Get the number of checkrun annotation chunks that can
+        be published concurrently.
+        """
+        try:
+            return max(1, int(self._data['CHECKRUN_WORKERS']))
+        except Exception:
+            return 4
+
+    def local_diff(self):
+        """Check whether pull request changes should be read
+        from the cloned repository instead of the GitHub API.
+        """
+        try:
+            return bool(self._data['GIT_LOCAL_DIFF'])
+        except Exception:
+            return False
+
+    def incremental_review(self):
+        """Check whether only files changed since the last
+        review should be linted.
+        """
+        try:
+            return bool(self._data['INCREMENTAL_REVIEW'])
+        except Exception:
+            return False
+
+    def filter_unchanged_lines(self):
+        """Check whether problems on unchanged lines should
+        be dropped as soon as tools report them.
+        """
+        try:
+            return bool(self._data['FILTER_UNCHANGED_LINES'])
+        except Exception:
+            return False
+
+    def digest(self):
+        """Get a digest of the repository configuration
+        that affects lint results.
+        """
+        data = {
+            'linters': dict(
+                (linter, self.linter_config(linter))
+                for linter in self.linters()),
+            'ignore': self.ignore_patterns(),
+        }
+        encoded = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.sha1(encoded.encode('utf8')).hexdigest()
+
     def passed_review_label(self):
         """Get the label name that is managed by review publishing
         """
@@ -1,6 +1,9 @@
 import fnmatch
+import io
 import re
 import logging
+from array import array
+from bisect import bisect_right
 from collections import namedtuple
 
 log = logging.getLogger(__name__)
@@ -20,19 +23,46 @@ filename_pattern = re.compile(r'^[+]{3}\s*(?:[ab]/)?(.*)$')
 def parse_diff(text):
     """Parse the output of `git diff` into
     a DiffCollection and set of diff objects
+
+    `text` can be a string, a file-like object or
+    an iterable of lines.
     """
     if not text:
         return DiffCollection([])
-    blocks = re.split(block_pattern, text)
-    diffs = []
-    for chunk in blocks:
-        if len(chunk) == 0:
+    return DiffCollection(iter_diff(text))
+
+
+def iter_diff(source):
+    """Parse the output of `git diff` one file at a time.
+
+    `source` can be a string, a file-like object or an
+    iterable of lines. Yields a DiffAdapter for each file so
+    only a single file diff is held in memory at a time.
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    chunk = []
+    for line in source:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', 'ignore')
+        match = block_pattern.match(line)
+        if match:
+            diff = _parse_chunk(chunk)
+            if diff:
+                yield diff
+            chunk = [line[match.end():]]
             continue
-        diff = parse_file_diff(chunk)
-        if diff:
-            diffs.append(diff)
+        chunk.append(line)
+    diff = _parse_chunk(chunk)
+    if diff:
+        yield diff
 
-    return DiffCollection(diffs)
+
+def _parse_chunk(lines):
+    chunk = ''.join(lines)
+    if len(chunk) == 0:
+        return None
+    return parse_file_diff(chunk)
 
 
 def parse_file_diff(chunk):
@@ -92,6 +122,7 @@ class DiffCollection(object):
 
     def __init__(self, contents):
         self._diffs = []
+        self._index = {}
         for change in contents:
             self._add(change)
 
@@ -112,6 +143,7 @@ class DiffCollection(object):
                       content.filename,
                       content.sha)
         self._diffs.append(change)
+        self._index.setdefault(change.filename, []).append(change)
 
     def _has_additions(self, content):
         """
@@ -165,8 +197,7 @@ class DiffCollection(object):
         """Get all the changes for a given file independant
         of which commit changed them.
         """
-        return [change for change in self._diffs
-                if change.filename == filename]
+        return list(self._index.get(filename, ()))
 
     def has_line_changed(self, filename, line):
         """Check whether or not a line has changed in a file.
@@ -175,24 +206,36 @@ class DiffCollection(object):
         are new and likely to be related to the lines
         changed in the pull request.
         """
-        changed = [change for change in self.all_changes(filename)
-                   if change.has_line_changed(line)]
-        return len(changed) > 0
+        return any(change.has_line_changed(line)
+                   for change in self._index.get(filename, ()))
 
     def line_position(self, filename, line):
         """
         Find the line position for a given file + line
         """
-        changes = self.all_changes(filename)
-        if len(changes):
+        changes = self._index.get(filename)
+        if changes:
             return changes[0].line_position(line)
         return None
 
+    def line_positions(self, filename, lines):
+        """
+        Find the line positions for several lines in a file.
+
+        Returns a dict of line to position. The file's diff
+        is only looked up once.
+        """
+        changes = self._index.get(filename)
+        if not changes:
+            return dict.fromkeys(lines)
+        change = changes[0]
+        return dict((line, change.line_position(line)) for line in lines)
+
     def first_changed_line(self, filename):
         """Get the first changed line in a file diff.
         """
-        changes = self.all_changes(filename)
-        if len(changes):
+        changes = self._index.get(filename)
+        if changes:
             return changes[0].first_changed_line()
         return None
 
@@ -203,9 +246,13 @@ class Diff(object):
     Github's API returns one Diff per file
     in a pull request.
     """
+    __slots__ = ('_filename', '_sha', '_hunks', '_starts', '_ordered')
+
     def __init__(self, patch, filename, sha, hunks=None):
         self._filename = filename
         self._sha = sha
+        self._starts = None
+        self._ordered = None
         if hunks is not None:
             for hunk in hunks:
                 assert isinstance(hunk, Hunk), 'Hunk objects are required.'
@@ -222,7 +269,7 @@ class Diff(object):
         line intersects with the previous change we also care.
         """
         hunks = []
-        hunk_separator = r'(^\@\@ \-\d+,\d+ \+\d+(?:,\d+)? \@\@.*?\n)'
+        hunk_separator = r'(^\@\@ \-\d+(?:,\d+)? \+\d+(?:,\d+)? \@\@.*?\n)'
         blocks = re.split(hunk_separator, patch, 0, re.M)
 
         if len(blocks) and blocks[0] == '':
@@ -241,6 +288,25 @@ class Diff(object):
                 header = body = False
         self._hunks = tuple(hunks)
 
+    def _find_hunk(self, lineno):
+        """Find the hunk that covers `lineno` in the new file.
+
+        Hunks are sorted by the first line they cover
+        when the first lookup is made.
+        """
+        if not isinstance(lineno, int):
+            return None
+        if self._starts is None:
+            self._ordered = sorted(self._hunks, key=lambda hunk: hunk.start)
+            self._starts = array('I', [hunk.start for hunk in self._ordered])
+        i = bisect_right(self._starts, lineno) - 1
+        if i < 0:
+            return None
+        hunk = self._ordered[i]
+        if lineno > hunk.end:
+            return None
+        return hunk
+
     @property
     def hunks(self):
         return self._hunks
@@ -276,23 +342,21 @@ class Diff(object):
         Find out if a particular line changed in this commit's
         diffs
         """
-        for hunk in self._hunks:
-            if hunk.has_line_changed(line):
-                return True
-        return False
+        hunk = self._find_hunk(line)
+        return hunk is not None and hunk.has_line_changed(line)
 
     def added_lines(self):
         """Get the line numbers of lines that were added"""
         adds = set()
         for hunk in self._hunks:
-            adds = adds.union(hunk.added_lines())
+            adds.update(hunk.added_lines())
         return adds
 
     def deleted_lines(self):
         """Get the line numbers of lines that were deleted"""
         dels = set()
         for hunk in self._hunks:
-            dels = dels.union(hunk.deleted_lines())
+            dels.update(hunk.deleted_lines())
         return dels
 
     def first_changed_line(self):
@@ -301,20 +365,17 @@ class Diff(object):
         Useful for repositioning file level errors to the
         first modified line.
         """
-        hunk = self._hunks[0]
-        for line in sorted(hunk.added_lines()):
-            return line
+        return self._hunks[0].first_added_line()
 
     def line_position(self, lineno):
         """
         Find the line number position given a line number in the new
         file content.
         """
-        for hunk in self._hunks:
-            position = hunk.line_position(lineno)
-            if position:
-                return position
-        return None
+        hunk = self._find_hunk(lineno)
+        if hunk is None:
+            return None
+        return hunk.line_position(lineno)
 
     def intersection(self, other):
         """Get the intersecting or overlapping hunks that
@@ -330,71 +391,156 @@ class Diff(object):
         return overlapping
 
 
+def _find_run(runs, stride, value):
+    """Find the index of the run containing `value`.
+
+    `runs` is a flat array of records `stride` items wide that
+    start with a sorted (start, length) pair.
+    """
+    if not isinstance(value, int):
+        return None
+    lo = 0
+    hi = len(runs) // stride
+    while lo < hi:
+        mid = (lo + hi) // 2
+        start = runs[mid * stride]
+        if value < start:
+            hi = mid
+        elif value >= start + runs[mid * stride + 1]:
+            lo = mid + 1
+        else:
+            return mid * stride
+    return None
+
+
+def _expand_runs(runs, stride):
+    """Get all the values covered by runs."""
+    values = set()
+    for i in range(0, len(runs), stride):
+        values.update(range(runs[i], runs[i] + runs[i + 1]))
+    return values
+
+
 class Hunk(object):
     """Provide an interface for interacting with diff hunks
 
     Each Diff is made of multiple hunks of various sizes.
     Each Hunk begins with the ``@@`` delimiter.
+
+    Added lines are stored as runs of (line, length, position)
+    and deleted lines as runs of (line, length). The hunk body
+    is only parsed when line data is first needed.
     """
-    start_line_pattern = re.compile(r'@@ -(\d+),\d+ \+(\d+)(?:,\d+)? @@')
+    __slots__ = ('_header', '_patch', '_offset', '_old_start',
+                 '_start', '_end', '_added', '_deleted')
+
+    start_line_pattern = re.compile(r'@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@')
 
     def __init__(self, header, patch, offset):
         self._header = header
         self._patch = patch
-        self._parse(patch, offset)
+        self._offset = offset
+        self._added = None
+        self._deleted = None
+        self._parse_header()
 
-    def _parse(self, patch, offset):
+    def _parse_header(self):
         match = self.start_line_pattern.match(self._header)
         if not match:
             msg = u'Could not parse hunk header {}'.format(self._header)
             raise ParseError(msg)
+        self._old_start = int(match.group(1))
+        self._start = int(match.group(2))
 
+    def _parse(self):
+        if self._added is not None:
+            return
         # Account for the header
-        offset += 1
+        offset = self._offset + 1
 
         # Compensate for the increment done in the line loop
-        line_num = int(match.group(2)) - 1
-        old_line_num = int(match.group(1)) - 1
+        line_num = self._start - 1
+        old_line_num = self._old_start - 1
+
+        added = array('I')
+        deleted = array('I')
+        patch = self._patch
+        index = 0
+        while True:
+            # Only the first character of each line is needed.
+            marker = patch[index:index + 1]
 
-        additions = []
-        deletions = []
-        line_map = {}
-        for line in self._patch.split('\n'):
             # Increment lines through additions and
             # unchanged lines.
-            if not line.startswith('-'):
+            if marker != '-':
                 line_num += 1
                 old_line_num += 1
-            if line.startswith('-'):
-                deletions.append(old_line_num + 1)
-            if line.startswith('+'):
-                additions.append(line_num)
-                line_map[line_num] = offset
+            if marker == '-':
+                line = old_line_num + 1
+                if deleted and deleted[-2] + deleted[-1] - 1 == line:
+                    pass
+                elif deleted and deleted[-2] + deleted[-1] == line:
+                    deleted[-1] += 1
+                else:
+                    deleted.extend((line, 1))
+            if marker == '+':
+                if (added and added[-3] + added[-2] == line_num and
+                        added[-1] + added[-2] == offset):
+                    added[-2] += 1
+                else:
+                    added.extend((line_num, 1, offset))
             offset += 1
-        self._additions = set(additions)
-        self._deletions = set(deletions)
-        self._positions = line_map
+
+            index = patch.find('\n', index) + 1
+            if not index:
+                break
+        self._added = added
+        self._deleted = deleted
+        self._end = line_num
 
     @property
     def patch(self):
         return "".join([self._header, self._patch])
 
+    @property
+    def start(self):
+        """The first line in the new file covered by this hunk"""
+        return self._start
+
+    @property
+    def end(self):
+        """The last line in the new file covered by this hunk"""
+        self._parse()
+        return self._end
+
     def contains_line(self, lineno):
         """Check if a hunk contains the provided lineno
         in either its deletions or additions"""
-        return lineno in self._additions or lineno in self._deletions
+        self._parse()
+        return (_find_run(self._added, 3, lineno) is not None or
+                _find_run(self._deleted, 2, lineno) is not None)
 
     def has_line_changed(self, lineno):
         """Check if a line was added"""
-        return lineno in self._additions
+        self._parse()
+        return _find_run(self._added, 3, lineno) is not None
 
     def added_lines(self):
         """Get the lines added in this hunk"""
-        return self._additions
+        self._parse()
+        return _expand_runs(self._added, 3)
 
     def deleted_lines(self):
         """Get the lines deleted in this hunk"""
-        return self._deletions
+        self._parse()
+        return _expand_runs(self._deleted, 2)
+
+    def first_added_line(self):
+        """Get the first line added in this hunk"""
+        self._parse()
+        if self._added:
+            return self._added[0]
+        return None
 
     def line_position(self, line_number):
         """Find the line position given a line number in the
@@ -402,6 +548,8 @@ class Hunk(object):
 
         The line position is used to post github comments.
         """
-        if line_number in self._positions:
-            return self._positions[line_number]
-        return None
+        self._parse()
+        i = _find_run(self._added, 3, line_number)
+        if i is None:
+            return None
+        return self._added[i + 2] + line_number - self._added[i]
@@ -1,8 +1,14 @@
+import atexit
 import re
 import os
 import logging
 import hashlib
-from typing import Dict, List, Optional  # noqa: F401
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from tempfile import SpooledTemporaryFile
+from typing import Dict, Iterator, List, Optional, Tuple, Union  # noqa: F401
 
 import docker
 from docker.errors import (
@@ -10,8 +16,15 @@ from docker.errors import (
     APIError,
     NotFound
 )
+from docker.transport import UnixHTTPAdapter
+from docker.transport.unixconn import UnixHTTPConnectionPool
+from docker.utils import kwargs_from_env
+from functools import wraps
 from requests.exceptions import ReadTimeout, ConnectionError
 
+import lintreview.metrics as metrics
+from lintreview.cache import connect
+
 log = logging.getLogger(__name__)
 buildlog = logging.getLogger('buildlog')
 
@@ -19,15 +32,205 @@ buildlog = logging.getLogger('buildlog')
 DOCKER_BASE = '/src'
 CUSTOM_IMAGE_PATTERN = re.compile(r'^\w+-[a-f0-9]+$')
 
+# Prefix of the named volumes used for tool caches.
+CACHE_VOLUME_PREFIX = 'lintreview-cache-'
+
 
 class TimeoutError(Exception):
     """Exception for when we timeout waiting for docker."""
 
 
-def _get_client(timeout=60):
+# The container pool used by run() when enabled with configure()
+_pool = None
+
+# The maximum bytes of output read from a container. Set by configure()
+_max_output = None
+
+# The CacheVolumes of tool caches. Set by configure()
+_cache_volumes = None
+
+# The shared docker client and the process it was created in.
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_client_pool_size = 10
+_local = threading.local()
+
+
+def configure(config):
+    """Configure docker operations from the application config.
+
+    Sets the connection pool size of the shared client, the
+    output size limit, enables tool cache volumes when
+    DOCKER_CACHE_PATH is set and enables the warm container
+    pool when DOCKER_POOL_ENABLED is set.
+    """
+    global _pool, _client_pool_size, _max_output, _cache_volumes
+    max_output = config.get('DOCKER_MAX_OUTPUT', None)
+    _max_output = int(max_output) if max_output else None
+
+    _cache_volumes = None
+    cache_path = config.get('DOCKER_CACHE_PATH')
+    if cache_path:
+        _cache_volumes = CacheVolumes(
+            cache_path,
+            config.get('DOCKER_CACHE_MAX_SIZE', CacheVolumes.DEFAULT_SIZE))
+
+    pool_size = int(config.get('DOCKER_CLIENT_POOL_SIZE', 10))
+    if pool_size != _client_pool_size:
+        _client_pool_size = pool_size
+        _reset_client()
+
+    if _pool is not None:
+        _pool.drain()
+        _pool = None
+    if not config.get('DOCKER_POOL_ENABLED', False):
+        return
+    _pool = ContainerPool(
+        max_size=config.get('DOCKER_POOL_SIZE', 2),
+        max_uses=config.get('DOCKER_POOL_MAX_USES', 50),
+        idle_timeout=config.get('DOCKER_POOL_IDLE_TIMEOUT', 300))
+
+
+def drain_pool(source_dir=None):
+    """Remove pooled containers.
+
+    If `source_dir` is provided only containers with that
+    directory mounted will be removed.
+    """
+    if _pool is not None:
+        _pool.drain(source_dir)
+
+
+atexit.register(drain_pool)
+
+
+def cache_enabled():
+    """Check whether tool cache volumes are enabled."""
+    return _cache_volumes is not None
+
+
+def cache_volume(*key):
+    """Get the name of the tool cache volume for `key`.
+
+    Returns None when cache volumes are not enabled.
+    """
+    if _cache_volumes is None:
+        return None
+    return _cache_volumes.volume(key)
+
+
+def evict_cache_volumes():
+    """Remove the least recently used tool cache volumes
+    when they use too much space.
+    """
+    if _cache_volumes is not None:
+        _cache_volumes.evict()
+
+
+class _UnixHTTPAdapter(UnixHTTPAdapter):
+    """UnixHTTPAdapter with a configurable connection pool size."""
+
+    def __init__(self, socket_url, timeout=60, maxsize=10):
+        super(_UnixHTTPAdapter, self).__init__(socket_url, timeout)
+        self.maxsize = maxsize
+
+    def get_connection(self, url, proxies=None):
+        with self.pools.lock:
+            pool = self.pools.get(url)
+            if pool:
+                return pool
+            pool = UnixHTTPConnectionPool(
+                url, self.socket_path, self.timeout, maxsize=self.maxsize)
+            self.pools[url] = pool
+        return pool
+
+
+class _APIClient(docker.APIClient):
+    """APIClient that can be shared between threads.
+
+    Request timeouts are read from the calling thread, so one
+    client can serve calls that need different timeouts.
+    """
+
+    def __init__(self, *args, **kwargs):
+        pool_size = kwargs.pop('pool_size', 10)
+        super(_APIClient, self).__init__(*args, **kwargs)
+        adapter = getattr(self, '_custom_adapter', None)
+        if isinstance(adapter, UnixHTTPAdapter):
+            self._custom_adapter = _UnixHTTPAdapter(
+                adapter.socket_path, adapter.timeout, maxsize=pool_size)
+            self.mount('http+docker://', self._custom_adapter)
+
+    def _set_request_timeout(self, kwargs):
+        kwargs.setdefault('timeout', getattr(_local, 'timeout', self.timeout))
+        return kwargs
+
+
+class _DockerClient(docker.DockerClient):
+    def __init__(self, *args, **kwargs):
+        self.api = _APIClient(*args, **kwargs)
+
+
+def _get_client():
     # type: () -> docker.DockerClient
-    """Get a docker client."""
-    return docker.from_env(timeout=timeout)
+    """Get the docker client shared by the current process.
+
+    The client is created on first use and again after a fork, so
+    each celery worker has its own connection pool. Use
+    _request_timeout() to change the timeout of requests.
+    """
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            log.debug('Creating docker client')
+            _client = _DockerClient(
+                pool_size=_client_pool_size,
+                **kwargs_from_env())
+            _client_pid = os.getpid()
+        return _client
+
+
+@contextmanager
+def _request_timeout(timeout):
+    # type: (Optional[int]) -> Iterator[None]
+    """Use `timeout` for requests made by the calling thread
+    with the shared client, until the block exits.
+    """
+    missing = object()
+    previous = getattr(_local, 'timeout', missing)
+    _local.timeout = timeout
+    try:
+        yield
+    finally:
+        if previous is missing:
+            del _local.timeout
+        else:
+            _local.timeout = previous
+
+
+def _reset_client():
+    """Discard the shared client so the next call reconnects."""
+    global _client
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.api.close()
+        _client = None
+
+
+def reconnect(func):
+    """Retry a docker operation once with a new client if the
+    connection to the daemon fails, for example after a restart.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except ConnectionError:
+            log.warning('Lost connection to docker daemon, reconnecting.')
+            _reset_client()
+            return func(*args, **kwargs)
+    return wrapper
 
 
 def replace_basedir(base, files):
@@ -63,6 +266,7 @@ def apply_base(value):
     return os.path.basename(value)
 
 
+@reconnect
 def image_exists(name):
     # type: (str) -> bool
     """Check if a docker image exists."""
@@ -74,6 +278,7 @@ def image_exists(name):
     return True
 
 
+@reconnect
 def images():
     # type: () -> List[str]
     """Get the docker image list."""
@@ -84,6 +289,7 @@ def images():
     return results
 
 
+@reconnect
 def containers(include_stopped=False):
     # type: (bool) -> List[str]
     """Get the container list"""
@@ -96,25 +302,33 @@ def containers(include_stopped=False):
     return results
 
 
-def run(image,                     # type: str
-        command,                   # type: List[str]
-        source_dir,                # type: str
-        env=None,                  # type: Dict[str, str]
-        timeout=300,               # type: Optional[int]
-        name=None,                 # type: Optional[str]
-        docker_base=None,          # type: Optional[str]
-        workdir=None,              # type: Optional[str]
-        include_error=True,        # type: bool
-        run_as_current_user=False  # type: bool
+def run(image,                      # type: str
+        command,                    # type: List[str]
+        source_dir,                 # type: str
+        env=None,                   # type: Dict[str, str]
+        timeout=300,                # type: Optional[int]
+        name=None,                  # type: Optional[str]
+        docker_base=None,           # type: Optional[str]
+        workdir=None,               # type: Optional[str]
+        include_error=True,         # type: bool
+        run_as_current_user=False,  # type: bool
+        stream=False,               # type: bool
+        cache=None                  # type: Optional[Tuple[str, str]]
         ):
-    # type: (...) -> str
+    # type: (...) -> Union[str, ContainerOutput]
     """Execute tool commands in docker containers.
 
     All output from the container will be treated as tool output
     to be parsed by the tool adapter.
 
     The source_dir will be mounted at `/src` in the container
-    for tool execution.
+    for tool execution. When `cache` is a (volume, path) tuple
+    the named volume is mounted at path for tool caches.
+
+    Output is returned as a string. When `stream` is set a
+    ContainerOutput is returned instead, that can be iterated
+    over to parse the output line by line, and should be closed
+    when parsing is complete.
     """
     if not docker_base:
         docker_base = DOCKER_BASE
@@ -129,6 +343,10 @@ def run(image,                     # type: str
         'detach': True,
     }
 
+    if cache is not None:
+        volume, path = cache
+        run_args['volumes'][volume] = {'bind': path, 'mode': 'rw'}
+
     if name is not None:
         run_args['name'] = name
 
@@ -143,33 +361,465 @@ def run(image,                     # type: str
 
     # Only log the first 15 parameters.
     buildlog.info('Running container: %s', u' '.join(run_args['command'][0:15]))
+
+    output = ContainerOutput(_max_output)
+    with metrics.span('container', image=image):
+        # Named containers are committed into images so they
+        # need to be created for each run.
+        try:
+            if _pool is not None and name is None:
+                _pool.run(run_args, source_dir, docker_base, timeout, output,
+                          cache)
+            else:
+                _run_container(run_args, timeout, output, remove=name is None)
+        except Exception:
+            output.close()
+            raise
+        metrics.record_container(output.size)
+
+    if output.truncated:
+        buildlog.warning('Output of %s was truncated to %s bytes',
+                         image, output.size)
+        _truncated().append(image)
+    if stream:
+        return output
+    try:
+        return output.read()
+    finally:
+        output.close()
+
+
+def _truncated():
+    if not hasattr(_local, 'truncated'):
+        _local.truncated = []
+    return _local.truncated
+
+
+def take_truncated():
+    """Get the images with truncated output run in the current thread
+    since the last call.
+    """
+    truncated = _truncated()
+    _local.truncated = []
+    return truncated
+
+
+class ContainerOutput(object):
+    """Output read from a container.
+
+    Output is streamed into temporary files that are moved to
+    disk once they exceed SPOOL_SIZE. Output after the first
+    `max_size` bytes is discarded and `truncated` is set.
+
+    Iterating yields decoded lines without line endings, so
+    tool output can be parsed without reading it into memory.
+    """
+    SPOOL_SIZE = 1024 * 1024
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self.size = 0
+        self.truncated = False
+        # stderr is kept separately so it can precede stdout.
+        self._stderr = SpooledTemporaryFile(self.SPOOL_SIZE)
+        self._stdout = SpooledTemporaryFile(self.SPOOL_SIZE)
+
+    def write(self, data, stderr=False):
+        """Add output. Returns False once the size limit is reached."""
+        if self.truncated:
+            return False
+        if isinstance(data, str):
+            data = data.encode('utf8')
+        if self.max_size is not None and self.size + len(data) > self.max_size:
+            data = data[:self.max_size - self.size]
+            self.truncated = True
+        target = self._stderr if stderr else self._stdout
+        target.write(data)
+        self.size += len(data)
+        return not self.truncated
+
+    def read(self):
+        """Read all of the output as a string."""
+        data = b''
+        for spool in (self._stderr, self._stdout):
+            spool.seek(0)
+            data += spool.read()
+        return data.decode('utf8', 'replace')
+
+    def __iter__(self):
+        for spool in (self._stderr, self._stdout):
+            spool.seek(0)
+            for line in spool:
+                yield line.decode('utf8', 'replace').rstrip('\n')
+
+    def __len__(self):
+        return self.size
+
+    def __str__(self):
+        return self.read()
+
+    def close(self):
+        self._stderr.close()
+        self._stdout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _run_container(run_args, timeout, output, remove=True):
+    """Create a container, wait for it to complete and
+    stream its logs into `output`.
+    """
     client = _get_client()
     try:
         container = client.containers.run(**run_args)
     except ImageNotFound:
         err_txt = "Image not found."
         log.exception(err_txt)
-        return err_txt
+        output.write(err_txt)
+        return
     except APIError:
         log.exception("API Error running container.")
-        return "API Error Running Container."
+        output.write("API Error Running Container.")
+        return
 
     try:
         container.wait(timeout=timeout)
-        output = b''
-        if include_error:
-            output += container.logs(stdout=False, stderr=True)
-        output += container.logs(stdout=True, stderr=False)
+        if run_args['stderr']:
+            _read_logs(container, output, stderr=True)
+        _read_logs(container, output, stderr=False)
     except (APIError, ReadTimeout, ConnectionError) as e:
-        log.error("%s container timed out error=%s.", image, e)
+        log.error("%s container timed out error=%s.", run_args['image'], e)
         raise TimeoutError(str(e))
     finally:
-        if name is None:
+        if remove:
             container.remove(v=True, force=True)
 
-    return output.decode('utf8')
 
+def _read_logs(container, output, stderr=False):
+    logs = container.logs(stdout=not stderr, stderr=stderr, stream=True)
+    for chunk in logs:
+        if not output.write(chunk, stderr=stderr):
+            break
+
+
+class PooledContainer(object):
+    """A long lived container in a ContainerPool"""
+
+    def __init__(self, key, container):
+        self.key = key
+        self.container = container
+        self.uses = 0
+        self.last_used = time.time()
 
+
+class ContainerPool(object):
+    """Pool of long lived containers that run tool commands with exec.
+
+    Containers are kept per image and mounted source directory. They
+    are health checked before use, removed after `max_uses` commands
+    and removed after being idle for `idle_timeout` seconds. When all
+    `max_size` containers for a key are busy a one-off container is used.
+
+    Each review clones into its own source directory, and its containers
+    are drained when the review completes. Containers are only reused by
+    the tools of one review, which saves starting a container for each
+    tool run but not the startup of tools within the container.
+    """
+
+    # Keeps containers running so commands can be exec'd into them.
+    KEEPALIVE = ['tail', '-f', '/dev/null']
+
+    def __init__(self, max_size=2, max_uses=50, idle_timeout=300):
+        self.max_size = int(max_size)
+        self.max_uses = int(max_uses)
+        self.idle_timeout = int(idle_timeout)
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._sizes = {}
+        self._pid = os.getpid()
+
+    def run(self, run_args, source_dir, docker_base, timeout, output,
+            cache=None):
+        """Run the command in `run_args` in a pooled container.
+
+        Output is streamed into `output` in the same way as `run()`.
+        `timeout` limits both each read and the total running time
+        of the command. The total is checked as output arrives.
+        """
+        key = (run_args['image'], source_dir, docker_base, cache)
+        try:
+            pooled = self.acquire(key)
+        except ImageNotFound:
+            err_txt = "Image not found."
+            log.exception(err_txt)
+            output.write(err_txt)
+            return
+        except APIError:
+            log.exception("API Error running container.")
+            output.write("API Error Running Container.")
+            return
+
+        if pooled is None:
+            log.debug('Container pool for %s is full.', run_args['image'])
+            return _run_container(run_args, timeout, output, remove=True)
+
+        healthy = True
+        exec_args = {
+            'stdout': True,
+            'stderr': run_args['stderr'],
+            'environment': run_args['environment'],
+            'workdir': run_args.get('working_dir'),
+            'user': str(run_args.get('user', '')),
+        }
+        deadline = time.time() + timeout if timeout else None
+        api = _get_client().api
+        try:
+            # Use the run timeout as exec output is
+            # read while the command runs.
+            with _request_timeout(timeout):
+                exec_id = api.exec_create(
+                    pooled.container.id,
+                    run_args['command'],
+                    **exec_args)['Id']
+                frames = api.exec_start(exec_id, stream=True, demux=True)
+                for stdout, stderr in frames:
+                    if stderr:
+                        output.write(stderr, stderr=True)
+                    if stdout:
+                        output.write(stdout)
+                    if output.truncated:
+                        # The command may still be running.
+                        healthy = False
+                        break
+                    if deadline is not None and time.time() > deadline:
+                        raise ReadTimeout(
+                            'Command did not complete in {}s'.format(timeout))
+        except (APIError, ReadTimeout, ConnectionError) as e:
+            healthy = False
+            log.error("%s container timed out error=%s.", run_args['image'], e)
+            raise TimeoutError(str(e))
+        finally:
+            self.release(pooled, healthy)
+
+    def acquire(self, key):
+        """Get a healthy idle container for `key` or start a new one.
+
+        Returns None when the pool for `key` is full.
+        """
+        self._check_fork()
+        self.reap()
+        while True:
+            with self._lock:
+                idle = self._idle.get(key, [])
+                pooled = idle.pop() if idle else None
+                if pooled is None:
+                    if self._sizes.get(key, 0) >= self.max_size:
+                        return None
+                    self._sizes[key] = self._sizes.get(key, 0) + 1
+                    break
+            if self._is_healthy(pooled):
+                return pooled
+            self._remove(pooled)
+
+        try:
+            return PooledContainer(key, self._start(key))
+        except Exception:
+            with self._lock:
+                self._sizes[key] -= 1
+            raise
+
+    def release(self, pooled, healthy=True):
+        """Return a container to the pool.
+
+        Unhealthy and worn out containers are removed.
+        """
+        pooled.uses += 1
+        pooled.last_used = time.time()
+        if not healthy or pooled.uses >= self.max_uses:
+            self._remove(pooled)
+            return
+        with self._lock:
+            self._idle.setdefault(pooled.key, []).append(pooled)
+
+    def reap(self):
+        """Remove containers that have been idle for too long."""
+        cutoff = time.time() - self.idle_timeout
+        self._remove_idle(lambda pooled: pooled.last_used < cutoff)
+
+    def drain(self, source_dir=None):
+        """Remove idle containers, optionally only those for `source_dir`."""
+        if source_dir is None:
+            self._remove_idle(lambda pooled: True)
+        else:
+            self._remove_idle(lambda pooled: pooled.key[1] == source_dir)
+
+    def _remove_idle(self, predicate):
+        expired = []
+        with self._lock:
+            for key, idle in self._idle.items():
+                expired += [pooled for pooled in idle if predicate(pooled)]
+                self._idle[key] = [pooled for pooled in idle
+                                   if not predicate(pooled)]
+        for pooled in expired:
+            self._remove(pooled)
+
+    def _check_fork(self):
+        """Forget containers created by a parent process."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            self._idle = {}
+            self._sizes = {}
+            self._pid = os.getpid()
+
+    def _start(self, key):
+        image, source_dir, docker_base, cache = key
+        log.info('Starting pooled container for %s', image)
+        volumes = {source_dir: {'bind': docker_base, 'mode': 'rw'}}
+        if cache is not None:
+            volume, path = cache
+            volumes[volume] = {'bind': path, 'mode': 'rw'}
+        client = _get_client()
+        return client.containers.run(
+            image=image,
+            entrypoint=self.KEEPALIVE,
+            volumes=volumes,
+            detach=True)
+
+    def _is_healthy(self, pooled):
+        try:
+            pooled.container.reload()
+            return pooled.container.status == 'running'
+        except (APIError, NotFound, ReadTimeout, ConnectionError):
+            return False
+
+    def _remove(self, pooled):
+        with self._lock:
+            self._sizes[pooled.key] = max(0, self._sizes.get(pooled.key, 1) - 1)
+        try:
+            pooled.container.remove(v=True, force=True)
+        except (APIError, NotFound, ReadTimeout, ConnectionError):
+            log.warning('Could not remove pooled container %s', pooled.container.id)
+
+
+class CacheVolumes(object):
+    """Named volumes that keep tool caches between reviews.
+
+    Volume use is recorded in a sqlite database at `path` shared
+    by the workers on a host. When the volumes use more than
+    `max_size` bytes the least recently used are removed.
+    """
+
+    DEFAULT_SIZE = 5 * 1024 ** 3
+
+    # Reading volume sizes is slow, so eviction is
+    # checked at most once per interval.
+    EVICT_INTERVAL = 300
+
+    def __init__(self, path, max_size=DEFAULT_SIZE):
+        self.path = path
+        self.max_size = int(max_size)
+        self._last_evict = 0
+        self._setup()
+
+    def _setup(self):
+        with self._connect() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS volumes ('
+                'name TEXT PRIMARY KEY, '
+                'accessed REAL NOT NULL)')
+
+    def _connect(self):
+        return connect(self.path)
+
+    def volume(self, key):
+        """Get the volume name for `key` and mark it as used."""
+        data = u'\n'.join(str(part) for part in key).encode('utf8')
+        name = CACHE_VOLUME_PREFIX + hashlib.sha1(data).hexdigest()[:20]
+        try:
+            with self._connect() as db:
+                db.execute(
+                    'INSERT OR REPLACE INTO volumes (name, accessed) '
+                    'VALUES (?, ?)', (name, time.time()))
+        except sqlite3.Error as e:
+            log.warning('Could not record cache volume. error=%s', e)
+        return name
+
+    def evict(self, force=False):
+        """Remove the least recently used volumes until
+        the volumes fit in `max_size`.
+
+        Volumes used by running containers are kept.
+        """
+        now = time.time()
+        if not force and now - self._last_evict < self.EVICT_INTERVAL:
+            return
+        self._last_evict = now
+        try:
+            with self._connect() as db:
+                rows = db.execute(
+                    'SELECT name FROM volumes ORDER BY accessed').fetchall()
+        except sqlite3.Error as e:
+            log.warning('Could not read cache volumes. error=%s', e)
+            return
+
+        usage = self._usage()
+        total = sum(size for size, _ in usage.values())
+        removed = []
+        for name, in rows:
+            if name not in usage:
+                # Never created or already removed.
+                removed.append(name)
+                continue
+            if total <= self.max_size:
+                break
+            size, refs = usage[name]
+            if refs or not self._remove(name):
+                continue
+            log.info('Removed cache volume %s of %s bytes', name, size)
+            total -= size
+            removed.append(name)
+        if not removed:
+            return
+        try:
+            with self._connect() as db:
+                db.executemany(
+                    'DELETE FROM volumes WHERE name = ?',
+                    [(name,) for name in removed])
+        except sqlite3.Error as e:
+            log.warning('Could not forget cache volumes. error=%s', e)
+
+    @reconnect
+    def _usage(self):
+        """Get the (size, containers using) of each cache volume."""
+        client = _get_client()
+        usage = {}
+        for volume in client.df().get('Volumes') or []:
+            name = volume.get('Name', '')
+            if not name.startswith(CACHE_VOLUME_PREFIX):
+                continue
+            data = volume.get('UsageData') or {}
+            usage[name] = (max(0, data.get('Size', 0)),
+                           max(0, data.get('RefCount', 0)))
+        return usage
+
+    def _remove(self, name):
+        client = _get_client()
+        try:
+            client.volumes.get(name).remove()
+        except NotFound:
+            pass
+        except (APIError, ConnectionError) as e:
+            log.warning('Could not remove cache volume %s. error=%s', name, e)
+            return False
+        return True
+
+
+@reconnect
 def rm_container(name):
     # type: (str) -> None
     """Remove a container with the provided name."""
@@ -182,6 +832,7 @@ def rm_container(name):
         raise ValueError("Unable to remove container.")
 
 
+@reconnect
 def rm_image(name):
     # type: (str) -> None
     """Remove the named image with the provided name."""
@@ -197,11 +848,12 @@ def rm_image(name):
 def commit(name, timeout=120):
     # type: (str) -> None
     """Commit a container state into a new images."""
-    client = _get_client(timeout=timeout)
+    client = _get_client()
     log.info('Commiting new image for %s', name)
     try:
-        container = client.containers.get(name)
-        container.commit(repository=name)
+        with _request_timeout(timeout):
+            container = client.containers.get(name)
+            container.commit(repository=name)
     except (NotFound, APIError):
         log.exception("Exception committing container.")
         raise ValueError("Could not commit container: {0}".format(name))
@@ -55,9 +55,9 @@ def run_fixers(tools, base_path, files):
     for tool in tools:
         if tool.has_fixer():
             tool.execute_fixer(docker_files)
-    diff = git.diff(base_path, files)
-    if diff:
-        return parse_diff(diff)
+    diff = parse_diff(git.diff_lines(base_path, files))
+    if len(diff):
+        return diff
     return []
 
 
@@ -1,13 +1,27 @@
+import fcntl
+import io
 import os
 import logging
 import shutil
 import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
 from functools import wraps
 from urllib.parse import urlparse, urlunparse
 
+import lintreview.metrics as metrics
+
 log = logging.getLogger(__name__)
 buildlog = logging.getLogger('buildlog')
 
+# Seconds between checks of the total mirror size.
+MIRROR_PRUNE_INTERVAL = 300
+
+# Refs kept in mirrors. Pull request refs are left out as busy
+# repositories have far more of them than clones can reuse.
+MIRROR_REFSPECS = ['+refs/heads/*:refs/heads/*', '+refs/tags/*:refs/tags/*']
+
 
 def log_io_error(func):
     @wraps(func)
@@ -33,22 +47,32 @@ def get_repo_path(user, repo, number, settings):
     return os.path.realpath(path)
 
 
-def authenticated_clone(config, url, path):
-    # Add auth to url
+def authenticated_url(config, url):
+    """Add the oauth token to a clone url"""
     parsed_url = urlparse(url)
     user = config['GITHUB_OAUTH_TOKEN']
     password = 'x-oauth-basic'
-    url = urlunparse((
+    return urlunparse((
         parsed_url[0], (u'{}:{}@{}'.format(user, password, parsed_url[1]))
     ) + parsed_url[2:])
-    clone(url, path)
+
+
+def authenticated_clone(config, url, path):
+    clone(authenticated_url(config, url), path)
 
 
 @log_io_error
-def clone(url, path):
+def clone(url, path, reference=None):
     """Clone a repository from `url` into `path`
+
+    If `reference` is provided, objects will be copied from the
+    repository at that path instead of being downloaded. The clone
+    doesn't depend on the reference once it is complete.
     """
-    command = ['git', 'clone', url, path]
+    command = ['git', 'clone']
+    if reference:
+        command += ['--reference', reference, '--dissociate']
+    command += [url, path]
     return_code, _ = _process(command)
     if return_code:
         raise IOError(u"Unable to clone repository into '{}'".format(path))
@@ -66,20 +90,217 @@ def fetch(path, remote):
     return True
 
 
-def clone_or_update(config, url, path, head):
+@metrics.timed('clone')
+def clone_or_update(config, url, path, head, paths=None):
     """Clone a new repository and checkout commit,
     or update an existing clone to the new head
+
+    When GIT_SPARSE_CHECKOUT is enabled and `paths` are provided
+    only `paths` are checked out from a shallow, partial clone.
+    Otherwise when GIT_MIRROR_PATH is configured, a local mirror of the
+    repository is updated and used as a reference for the clone.
     """
     buildlog.info("Cloning repository '%s' into '%s'", url, path)
+    clone_url = url
     if 'GITHUB_OAUTH_TOKEN' in config:
-        authenticated_clone(config, url, path)
+        clone_url = authenticated_url(config, url)
     else:
         buildlog.warn('No github oauth token present. Using public clone.')
-        clone(url, path)
+
+    mirror_root = config.get('GIT_MIRROR_PATH')
+    if paths is not None and config.get('GIT_SPARSE_CHECKOUT'):
+        buildlog.info('Using sparse checkout of %d paths', len(paths))
+        sparse_clone(clone_url, path, head, paths)
+    elif mirror_root:
+        clone_from_mirror(mirror_root, url, clone_url, path)
+        if _prune_due(mirror_root):
+            prune_mirrors(mirror_root, config.get('GIT_MIRROR_MAX_SIZE'))
+    else:
+        clone(clone_url, path)
     buildlog.info("Checking out '%s'", head)
     checkout(path, head)
 
 
+@log_io_error
+def sparse_clone(url, path, ref, paths):
+    """Create a shallow clone of `ref` that only contains `paths`.
+
+    `paths` are sparse-checkout patterns. File contents are
+    only downloaded for paths matching the patterns.
+    """
+    return_code, _ = _process(['git', 'init', '-q', path])
+    if return_code:
+        raise IOError(u"Unable to initialize '{}'".format(path))
+
+    commands = [
+        ['git', 'remote', 'add', 'origin', url],
+        ['git', 'config', 'core.sparseCheckout', 'true'],
+    ]
+    for command in commands:
+        return_code, _ = _process(command, chdir=path)
+        if return_code:
+            raise IOError(u"Unable to configure '{}'".format(path))
+
+    # Keep files in the repository root, and skip other directories
+    # unless they are matched by `paths`.
+    patterns = ['/*', '!/*/'] + list(paths)
+    sparse_file = os.path.join(path, '.git', 'info', 'sparse-checkout')
+    os.makedirs(os.path.dirname(sparse_file), exist_ok=True)
+    with open(sparse_file, 'w') as f:
+        f.write('\n'.join(patterns) + '\n')
+
+    command = ['git', 'fetch', '--depth=1', '--filter=blob:none',
+               'origin', ref]
+    return_code, _ = _process(command, chdir=path)
+    if return_code:
+        raise IOError(u"Unable to fetch '{}' from '{}'".format(ref, url))
+    return True
+
+
+def mirror_path(root, url):
+    """Get the path of the local mirror for a repository url.
+    """
+    parsed_url = urlparse(url)
+    path = os.path.normpath('/' + parsed_url.path).lstrip('/')
+    name = os.path.join(parsed_url.hostname or '', path)
+    if not name.endswith('.git'):
+        name += '.git'
+    return os.path.join(root, name)
+
+
+@contextmanager
+def _lock(path, exclusive=True, blocking=True):
+    """Hold a file lock shared between processes.
+
+    Yields False if the lock could not be acquired without blocking.
+    """
+    with open(path + '.lock', 'a') as lockfile:
+        mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        if not blocking:
+            mode |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(lockfile, mode)
+        except (IOError, OSError):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+
+def update_mirror(root, url, clone_url):
+    """Create or update the bare mirror of a repository.
+
+    Returns the path to the mirror. The `clone_url` can contain
+    credentials, so it is only used for fetching and never stored
+    in the mirror configuration.
+    """
+    mirror = mirror_path(root, url)
+    os.makedirs(os.path.dirname(mirror), exist_ok=True)
+    with _lock(mirror):
+        if os.path.isdir(mirror):
+            buildlog.info("Updating mirror '%s'", mirror)
+        else:
+            buildlog.info("Creating mirror '%s'", mirror)
+            return_code, _ = _process(['git', 'init', '--bare', '-q', mirror])
+            if return_code:
+                raise IOError(u"Unable to create mirror '{}'".format(mirror))
+        # Replaces credentials stored by older versions.
+        _process(['git', 'config', 'remote.origin.url', url], chdir=mirror)
+        command = ['git', 'fetch', '--prune', clone_url] + MIRROR_REFSPECS
+        return_code, _ = _process(command, chdir=mirror)
+        if return_code:
+            raise IOError(u"Unable to update mirror '{}'".format(mirror))
+        # Track usage for pruning.
+        os.utime(mirror + '.lock', None)
+    return mirror
+
+
+def clone_from_mirror(root, url, clone_url, path):
+    """Clone a repository using a local mirror as a reference.
+
+    Falls back to a regular clone if the mirror can't be updated.
+    """
+    try:
+        mirror = update_mirror(root, url, clone_url)
+    except (IOError, OSError) as e:
+        log.warning('Could not update mirror for %s, error=%s', url, e)
+        return clone(clone_url, path)
+    # Hold a shared lock so the mirror isn't pruned while cloning.
+    # The clone is dissociated so it can outlive the mirror.
+    with _lock(mirror, exclusive=False):
+        return clone(clone_url, path, reference=mirror)
+
+
+def _prune_due(root):
+    """Check whether mirrors should be pruned.
+
+    Measuring mirrors reads every file in them, so mirrors are
+    pruned at most once per MIRROR_PRUNE_INTERVAL by all workers.
+    """
+    marker = os.path.join(root, '.pruned')
+    try:
+        if time.time() - os.path.getmtime(marker) < MIRROR_PRUNE_INTERVAL:
+            return False
+    except OSError:
+        pass
+    try:
+        with open(marker, 'a'):
+            os.utime(marker, None)
+    except OSError as e:
+        log.warning('Could not record mirror pruning. error=%s', e)
+    return True
+
+
+def prune_mirrors(root, max_size):
+    """Remove the least recently used mirrors until the
+    mirrors use less than `max_size` bytes.
+
+    Mirrors that are being updated or cloned from are skipped.
+    """
+    if not max_size:
+        return
+    mirrors = []
+    for dirpath, dirnames, _ in os.walk(root):
+        for name in list(dirnames):
+            if name.endswith('.git'):
+                dirnames.remove(name)
+                mirrors.append(os.path.join(dirpath, name))
+
+    sizes = {mirror: _disk_usage(mirror) for mirror in mirrors}
+    total = sum(sizes.values())
+    if total <= max_size:
+        return
+
+    def last_used(mirror):
+        try:
+            return os.path.getmtime(mirror + '.lock')
+        except OSError:
+            return 0
+
+    for mirror in sorted(mirrors, key=last_used):
+        if total <= max_size:
+            break
+        with _lock(mirror, blocking=False) as locked:
+            if not locked:
+                continue
+            log.info("Pruning mirror '%s'", mirror)
+            shutil.rmtree(mirror, True)
+            total -= sizes[mirror]
+
+
+def _disk_usage(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
 @log_io_error
 def checkout(path, ref):
     """Check out `ref` in the repo located on `path`
@@ -108,6 +329,71 @@ def diff(path, files=None):
     return output
 
 
+@log_io_error
+def changed_files(path, base, head):
+    """Get the names of files changed between two commits.
+    """
+    command = ['git', 'diff', '--name-only', '--no-renames', base, head]
+    return_code, output = _process(command, chdir=path)
+    if return_code:
+        raise IOError(u"Unable to compare '{}' and '{}'".format(base, head))
+    return [line for line in output.splitlines() if line]
+
+
+def diff_lines(path, files=None):
+    """Stream the diff of the unstaged changes line by line.
+
+    Unlike diff() the output is never held in memory all at once.
+    The lines can be given to lintreview.diff.parse_diff
+    """
+    command = ['git', 'diff', '--patience']
+    if files:
+        command.extend(files)
+    return _stream_lines(command, path)
+
+
+def diff_range_lines(path, base, head):
+    """Stream the diff of the changes made on `head` since
+    it branched from `base`, line by line.
+
+    The diff is made the way GitHub makes pull request diffs
+    so that line positions match the ones GitHub uses. Raises
+    IOError when either commit is missing from the repository.
+    """
+    command = [
+        'git', '-c', 'core.quotepath=off',
+        'diff', '--no-color', '--no-ext-diff', '--diff-algorithm=myers',
+        '--find-renames', '--src-prefix=a/', '--dst-prefix=b/',
+        u'{}...{}'.format(base, head),
+    ]
+    return _stream_lines(command, path)
+
+
+def _stream_lines(command, path):
+    log.debug('Running %s', command)
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(
+            command,
+            cwd=path,
+            stdout=subprocess.PIPE,
+            stderr=errors,
+            shell=False)
+        try:
+            output = io.TextIOWrapper(
+                process.stdout, encoding='utf-8', errors='ignore', newline='')
+            for line in output:
+                yield line
+        finally:
+            process.stdout.close()
+            return_code = process.wait()
+        if return_code:
+            errors.seek(0)
+            error = errors.read().decode('utf-8', 'ignore')
+            log.error('STDERR output: %s', error)
+            buildlog.info(u"Unable to create diff '{}'".format(error))
+            raise IOError(u"Unable to create diff '{}'".format(error))
+
+
 @log_io_error
 def apply_cached(path, patch):
     """Apply a patch to the index.
@@ -253,16 +539,16 @@ def exists(path):
 
 def _process(command, input_val=None, chdir=False):
     """Helper method for running processes related to git.
-    """
-    cwd = os.getcwd()
-    if chdir:
-        log.debug('Changing directories to %s', chdir)
-        os.chdir(chdir)
 
-    log.debug('Running %s', command)
+    When `chdir` is set the command is run in that directory.
+    The working directory of this process is left unchanged,
+    as it is shared by all threads.
+    """
+    log.debug('Running %s in %s', command, chdir or os.getcwd())
 
     process = subprocess.Popen(
         command,
+        cwd=chdir or None,
         stdin=subprocess.PIPE,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
@@ -272,8 +558,6 @@ def _process(command, input_val=None, chdir=False):
     output, error = process.communicate(input=input_val)
     return_code = process.returncode
 
-    if chdir:
-        os.chdir(cwd)
     if return_code > 0:
         log.error('STDERR output: %s', error)
 
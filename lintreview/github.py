@@ -4,6 +4,9 @@ import github3.checks
 import requests
 from requests.packages.urllib3.util.retry import Retry
 
+from lintreview.httpcache import CachingAdapter, get_http_cache
+from lintreview.ratelimit import RateLimitAdapter, get_rate_limit_store
+
 log = logging.getLogger(__name__)
 
 GITHUB_BASE_URL = 'https://api.github.com/'
@@ -19,7 +22,11 @@ def get_client(config):
         raise KeyError('Missing GITHUB_OAUTH_TOKEN in application config. '
                        'Update your settings.py file.')
 
-    session = get_session(config.get('GITHUB_CLIENT_RETRY_OPTIONS', None))
+    session = get_session(
+        config.get('GITHUB_CLIENT_RETRY_OPTIONS', None),
+        get_rate_limit_store(config),
+        config.get('GITHUB_RATE_LIMIT_MAX_WAIT', 60),
+        get_http_cache(config))
 
     if config.get('GITHUB_URL', GITHUB_BASE_URL) != GITHUB_BASE_URL:
         client = github3.GitHubEnterprise(
@@ -33,12 +40,27 @@ def get_client(config):
     return client
 
 
-def get_session(retry_options=None):
+def get_session(retry_options=None, rate_limit_store=None, max_wait=60,
+                http_cache=None):
+    """Create a session for the GitHub API.
+
+    When a `rate_limit_store` is provided requests are paced
+    to stay within the API rate limits. When an `http_cache` is
+    provided GET requests are made conditional on cached responses.
+    """
     if retry_options is None or not isinstance(retry_options, dict):
         retry_options = {}
     session = github3.session.GitHubSession()
-    retry_adapter = requests.adapters.HTTPAdapter(
-        max_retries=Retry(**retry_options))
+    if rate_limit_store is not None:
+        retry_adapter = RateLimitAdapter(
+            rate_limit_store,
+            max_wait=max_wait,
+            max_retries=Retry(**retry_options))
+    else:
+        retry_adapter = requests.adapters.HTTPAdapter(
+            max_retries=Retry(**retry_options))
+    if http_cache is not None:
+        retry_adapter = CachingAdapter(http_cache, retry_adapter)
     session.mount('http://', retry_adapter)
     session.mount('https://', retry_adapter)
     return session
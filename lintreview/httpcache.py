@@ -0,0 +1,129 @@
+import hashlib
+import logging
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from lintreview.cache import ResultCache
+
+log = logging.getLogger(__name__)
+
+# Headers that don't apply to cached bodies as
+# requests has already decoded the content.
+SKIP_HEADERS = ('content-encoding', 'transfer-encoding', 'content-length')
+
+
+def get_http_cache(config):
+    """Get the GitHub response cache if it is enabled in the config.
+    """
+    path = config.get('GITHUB_CACHE_PATH')
+    if not path:
+        return None
+    max_size = config.get('GITHUB_CACHE_SIZE', ResultCache.DEFAULT_SIZE)
+    return ResultCache(path, max_size)
+
+
+class CachingAdapter(requests.adapters.BaseAdapter):
+    """Adapter that makes conditional GET requests.
+
+    Responses with an ETag or Last-Modified header are stored in
+    `cache`, a lintreview.cache.ResultCache. Later requests for the
+    same URL send If-None-Match and If-Modified-Since headers, and
+    304 Not Modified responses are replaced with the cached response.
+    Cached bodies are stored unencrypted, so the cache should only be
+    readable by lintreview.
+
+    Requests are sent with the wrapped `adapter`.
+    """
+
+    def __init__(self, cache, adapter):
+        super(CachingAdapter, self).__init__()
+        self.cache = cache
+        self.adapter = adapter
+
+    @property
+    def max_retries(self):
+        return self.adapter.max_retries
+
+    def send(self, request, **kwargs):
+        if request.method != 'GET' or kwargs.get('stream'):
+            return self.adapter.send(request, **kwargs)
+
+        key = _cache_key(request)
+        entry = self.cache.get(key)
+        if entry:
+            if entry.get('etag'):
+                request.headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                request.headers['If-Modified-Since'] = entry['last_modified']
+
+        response = self.adapter.send(request, **kwargs)
+        if response.status_code == 304 and entry:
+            log.debug('Using cached response for %s', request.url)
+            return _cached_response(response, entry)
+        if response.status_code == 200:
+            self._store(key, response)
+        return response
+
+    def _store(self, key, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        try:
+            body = response.content.decode('utf8')
+        except UnicodeDecodeError:
+            return
+        headers = dict(
+            (name, value) for name, value in response.headers.items()
+            if name.lower() not in SKIP_HEADERS)
+        self.cache.set(key, {
+            'etag': etag,
+            'last_modified': last_modified,
+            'headers': headers,
+            'encoding': response.encoding,
+            'body': body,
+        })
+
+    def close(self):
+        self.adapter.close()
+
+
+def _cache_key(request):
+    """Get the cache key for a request.
+
+    Responses are cached per credential, using a digest of the
+    Authorization header so tokens aren't written to the cache.
+    """
+    headers = request.headers
+    parts = [
+        _digest(headers.get('Authorization', '')),
+        headers.get('Accept', ''),
+        request.url,
+    ]
+    return 'github:' + _digest(u'\n'.join(parts))
+
+
+def _digest(value):
+    if not isinstance(value, bytes):
+        value = str(value).encode('utf8')
+    return hashlib.sha256(value).hexdigest()
+
+
+def _cached_response(not_modified, entry):
+    """Build a response from a cached entry and the 304 response
+    that validated it.
+    """
+    response = not_modified
+    headers = CaseInsensitiveDict(entry['headers'])
+    for name, value in not_modified.headers.items():
+        if name.lower() not in SKIP_HEADERS:
+            headers[name] = value
+    body = entry['body'].encode('utf8')
+    headers['Content-Length'] = str(len(body))
+    response.status_code = 200
+    response.reason = 'OK'
+    response.headers = headers
+    response.encoding = entry.get('encoding')
+    response._content = body
+    return response
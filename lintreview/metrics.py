@@ -0,0 +1,297 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from lintreview.cache import connect
+
+log = logging.getLogger(__name__)
+buildlog = logging.getLogger('buildlog')
+
+# Upper bounds in seconds of the stage duration histogram buckets.
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = 'lintreview_stage_seconds'
+STAGE_CONTAINERS = 'lintreview_stage_containers_total'
+STAGE_OUTPUT_BYTES = 'lintreview_stage_output_bytes_total'
+DROPPED_PROBLEMS = 'lintreview_dropped_problems_total'
+
+HELP = {
+    STAGE_SECONDS: 'Wall time spent in each review stage.',
+    STAGE_CONTAINERS: 'Containers run during each review stage.',
+    STAGE_OUTPUT_BYTES: 'Bytes of tool output read during each review stage.',
+    DROPPED_PROBLEMS: 'Problems on unchanged lines dropped for each tool.',
+}
+
+_local = threading.local()
+
+
+class Registry(object):
+    """In process store of histograms and counters.
+
+    Metrics are keyed by name and a tuple of sorted label pairs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, value, labels=()):
+        """Add an observation to a histogram"""
+        with self._lock:
+            key = (name, labels)
+            if key not in self.histograms:
+                self.histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+            histogram = self.histograms[key]
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def inc(self, name, value=1, labels=()):
+        """Increment a counter"""
+        with self._lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def merge(self, other):
+        """Add the values in another registry into this one"""
+        with self._lock:
+            for key, (buckets, total, count) in other.histograms.items():
+                if key not in self.histograms:
+                    self.histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+                histogram = self.histograms[key]
+                histogram[0] = [a + b for a, b in zip(histogram[0], buckets)]
+                histogram[1] += total
+                histogram[2] += count
+            for key, value in other.counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def take(self):
+        """Remove and return the collected values as a new Registry"""
+        taken = Registry()
+        with self._lock:
+            taken.histograms, self.histograms = self.histograms, {}
+            taken.counters, self.counters = self.counters, {}
+        return taken
+
+    def render(self):
+        """Render the metrics in the prometheus text format"""
+        lines = []
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+
+        seen = set()
+        for (name, labels), (buckets, total, count) in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append('# HELP {} {}'.format(name, HELP.get(name, name)))
+                lines.append('# TYPE {} histogram'.format(name))
+            for bound, value in zip(BUCKETS, buckets):
+                bucket_labels = labels + (('le', str(bound)),)
+                lines.append('{}_bucket{} {}'.format(
+                    name, _format_labels(bucket_labels), value))
+            lines.append('{}_bucket{} {}'.format(
+                name, _format_labels(labels + (('le', '+Inf'),)), count))
+            lines.append('{}_sum{} {}'.format(
+                name, _format_labels(labels), total))
+            lines.append('{}_count{} {}'.format(
+                name, _format_labels(labels), count))
+
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append('# HELP {} {}'.format(name, HELP.get(name, name)))
+                lines.append('# TYPE {} counter'.format(name))
+            lines.append('{}{} {}'.format(name, _format_labels(labels), value))
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\')
+        value = value.replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(u'{}="{}"'.format(key, value))
+    return '{' + ','.join(pairs) + '}'
+
+
+registry = Registry()
+
+# Totals for the review being processed. Workers process
+# one review at a time, so totals are tracked per process.
+_review = None
+_review_lock = threading.Lock()
+
+
+class Span(object):
+    """Timing span for a review stage.
+
+    Containers and output bytes recorded while the span is
+    open in the current thread are attributed to the span.
+    """
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+        self.containers = 0
+        self.output_bytes = 0
+        self.start = None
+        self.elapsed = None
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time a review stage.
+
+    Additional labels, like the tool name, are added to the metrics.
+    """
+    current = Span(stage, tuple(sorted(labels.items())))
+    stack = _stack()
+    stack.append(current)
+    current.start = time.time()
+    try:
+        yield current
+    finally:
+        current.elapsed = time.time() - current.start
+        stack.remove(current)
+        _finish(current)
+
+
+def timed(stage):
+    """Decorator that times a function as a review stage."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_container(output_bytes=0):
+    """Record a container run and the size of its output
+    in the spans open in the current thread.
+    """
+    for current in _stack():
+        current.containers += 1
+        current.output_bytes += output_bytes
+    with _review_lock:
+        if _review is not None:
+            _review['containers'] += 1
+            _review['output_bytes'] += output_bytes
+
+
+def _stack():
+    if not hasattr(_local, 'spans'):
+        _local.spans = []
+    return _local.spans
+
+
+def _finish(current):
+    labels = (('stage', current.stage),) + current.labels
+    registry.observe(STAGE_SECONDS, current.elapsed, labels)
+    if current.containers:
+        registry.inc(STAGE_CONTAINERS, current.containers, labels)
+    if current.output_bytes:
+        registry.inc(STAGE_OUTPUT_BYTES, current.output_bytes, labels)
+    with _review_lock:
+        if _review is not None:
+            stages = _review['stages']
+            stages[current.stage] = stages.get(current.stage, 0) + current.elapsed
+
+
+@contextmanager
+def review(path=None):
+    """Collect the totals for a review.
+
+    When the review is complete the totals are written to the
+    buildlog, and the collected metrics are flushed to the
+    store at `path` so they can be read by the webserver.
+    """
+    global _review
+    totals = {'stages': {}, 'containers': 0, 'output_bytes': 0}
+    with _review_lock:
+        _review = totals
+    try:
+        yield totals
+    finally:
+        with _review_lock:
+            _review = None
+        stages = ', '.join(
+            u'{} {:.2f}s'.format(stage, elapsed)
+            for stage, elapsed in sorted(totals['stages'].items()))
+        buildlog.info('Review totals: %s, %d containers, %d bytes of output',
+                      stages or 'no stages',
+                      totals['containers'],
+                      totals['output_bytes'])
+        if path:
+            flush(path)
+
+
+def flush(path):
+    """Add the metrics collected in this process to the store at `path`"""
+    taken = registry.take()
+    if not taken.histograms and not taken.counters:
+        return
+    try:
+        with connect(path) as db:
+            _setup(db)
+            stored = _load(db)
+            stored.merge(taken)
+            db.execute('DELETE FROM metrics')
+            rows = [
+                (name, json.dumps(labels), 'histogram', json.dumps(value))
+                for (name, labels), value in stored.histograms.items()
+            ]
+            rows.extend(
+                (name, json.dumps(labels), 'counter', json.dumps(value))
+                for (name, labels), value in stored.counters.items())
+            db.executemany(
+                'INSERT INTO metrics (name, labels, kind, value) '
+                'VALUES (?, ?, ?, ?)', rows)
+    except sqlite3.Error as e:
+        log.warning('Could not write metrics. error=%s', e)
+        # Keep the values for the next flush.
+        registry.merge(taken)
+
+
+def load(path):
+    """Load the metrics in the store at `path` into a new Registry"""
+    try:
+        with connect(path) as db:
+            _setup(db)
+            return _load(db)
+    except sqlite3.Error as e:
+        log.warning('Could not read metrics. error=%s', e)
+        return Registry()
+
+
+def _setup(db):
+    db.execute(
+        'CREATE TABLE IF NOT EXISTS metrics ('
+        'name TEXT NOT NULL, '
+        'labels TEXT NOT NULL, '
+        'kind TEXT NOT NULL, '
+        'value TEXT NOT NULL, '
+        'PRIMARY KEY (name, labels))')
+
+
+def _load(db):
+    stored = Registry()
+    rows = db.execute('SELECT name, labels, kind, value FROM metrics')
+    for name, labels, kind, value in rows:
+        key = (name, tuple(tuple(pair) for pair in json.loads(labels)))
+        if kind == 'histogram':
+            stored.histograms[key] = json.loads(value)
+        else:
+            stored.counters[key] = json.loads(value)
+    return stored
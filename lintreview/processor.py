@@ -1,11 +1,17 @@
+import fnmatch
 import logging
+import os
 
 import lintreview.git as git
 import lintreview.fixers as fixers
+import lintreview.metrics as metrics
 import lintreview.tools as tools
-from lintreview.diff import DiffCollection, parse_diff
+from lintreview.cache import get_result_cache
+from lintreview.diff import DiffCollection, ParseError, parse_diff
 from lintreview.fixers.error import ConfigurationError, WorkflowError
-from lintreview.review import Problems, Review, IssueComment, InfoComment
+from lintreview.review import (
+    Problems, Review, Comment, IssueComment, InfoComment
+)
 
 log = logging.getLogger(__name__)
 buildlog = logging.getLogger('buildlog')
@@ -19,24 +25,74 @@ class Processor(object):
     _changes = None
     _review = None
     _config = None
+    _state = None
+    _results = None
     problems = None
 
-    def __init__(self, repository, pull_request, target_path, config):
+    def __init__(self, repository, pull_request, target_path, config,
+                 state=None):
         self._config = config
         self._repository = repository
         self._pull_request = pull_request
         self._target_path = target_path
+        self._state = state
         # TODO move problems into the Review
         # so that it is more self contained.
-        self.problems = Problems()
+        self.problems = Problems(
+            filter_changes=config.filter_unchanged_lines())
         self._review = Review(repository, pull_request, config)
 
+    @metrics.timed('load_changes')
     def load_changes(self):
-        log.debug('Loading pull request patches from github.')
-        files = self._pull_request.files()
-        self._changes = DiffCollection(files)
+        changes = None
+        if self._config.local_diff() and git.exists(self._target_path):
+            changes = self.local_changes()
+        if changes is None:
+            log.debug('Loading pull request patches from github.')
+            files = self._pull_request.files()
+            changes = DiffCollection(files)
+        self._changes = changes
         self.problems.set_changes(self._changes)
 
+    def local_changes(self):
+        """
+        Get the pull request changes by diffing the cloned repository.
+
+        Returns None when the diff can't be made, for example
+        when the base commit is not in the clone.
+        """
+        log.debug('Loading pull request patches from the local clone.')
+        try:
+            return parse_diff(git.diff_range_lines(
+                self._target_path,
+                self._pull_request.base,
+                self._pull_request.head))
+        except (IOError, ParseError) as e:
+            log.warning('Could not diff pull request locally, '
+                        'using the GitHub API. error=%s', e)
+            return None
+
+    def checkout_paths(self):
+        """
+        Get the sparse checkout patterns needed to review
+        the loaded changes.
+
+        Returns None when the whole repository is required.
+        """
+        if self._changes is None:
+            raise RuntimeError('No loaded changes, cannot get paths. '
+                               'Try calling load_changes first.')
+        config = self._config
+        files = self._changes.get_files(
+            ignore_patterns=config.ignore_patterns()
+        )
+        try:
+            tool_list = tools.factory(config, Problems(), self._target_path)
+        except Exception:
+            # Let run_tools() report the failure.
+            return None
+        return tools.checkout_paths(tool_list, files)
+
     def execute(self):
         """
         Run the review and return the completed review.
@@ -82,10 +138,114 @@ class Processor(object):
             self.problems.add(IssueComment(msg.format(str(e))))
             return
 
+        # Find the files to lint before fixers run so that fixers
+        # can't rewrite files whose previous results are reused.
+        incremental = self._state and config.incremental_review()
+        files_to_lint, previous = files_to_check, {}
+        if incremental:
+            files_to_lint, previous = self.incremental_files(
+                tool_list, files_to_check)
+
         if config.fixers_enabled():
-            self.apply_fixers(tool_list, files_to_check)
+            self.apply_fixers(tool_list, files_to_lint)
 
-        tools.run(tool_list, files_to_check, commits_to_check)
+        tools.run(tool_list,
+                  files_to_lint,
+                  commits_to_check,
+                  workers=config.tool_workers(),
+                  cache=get_result_cache(config))
+
+        for filename, problems in previous.items():
+            for line, body in problems:
+                self.problems.add(filename, line, body)
+
+        if incremental:
+            self._results = self._collect_results(files_to_check)
+
+    def incremental_files(self, tool_list, files):
+        """Find the files that changed since the last review.
+
+        Returns a tuple of the files to lint, and a dict of
+        the problems found in the last review for the other files.
+        When the last review can't be used all files are returned.
+        """
+        repository = self._repository
+        last = self._state.last_review(
+            repository.user,
+            repository.repo_name,
+            self._pull_request.number)
+        if not last:
+            return files, {}
+
+        head, config_digest, results = last
+        if config_digest != self._config.digest():
+            log.info('Review configuration changed, reviewing all files.')
+            return files, {}
+        if any(tool.whole_project for tool in tool_list):
+            return files, {}
+        try:
+            changed = set(git.changed_files(
+                self._target_path, head, self._pull_request.head))
+        except IOError:
+            log.info('Could not compare with %s, reviewing all files.', head)
+            return files, {}
+
+        patterns = []
+        for tool in tool_list:
+            patterns.extend(tool.checkout_paths())
+        for filename in changed:
+            if self._matches_config(filename, patterns):
+                log.info('%s changed, reviewing all files.', filename)
+                return files, {}
+
+        lint = [f for f in files if f in changed or f not in results]
+        previous = dict((f, results[f]) for f in files if f not in changed
+                        and f in results)
+        buildlog.info('Incremental review of %d files changed since %s',
+                      len(lint), head)
+        return lint, previous
+
+    def _matches_config(self, filename, patterns):
+        basename = os.path.basename(filename)
+        for pattern in patterns:
+            if pattern.startswith('/'):
+                if fnmatch.fnmatch('/' + filename, pattern):
+                    return True
+            elif fnmatch.fnmatch(basename, pattern):
+                return True
+        return False
+
+    def _collect_results(self, files):
+        """Get the problems for each file, or None when
+        there are problems that can't be attributed to files.
+
+        General comments like tool timeouts or configuration
+        errors mean files could be missing problems, so their
+        results can't be reused.
+        """
+        results = dict((f, []) for f in files)
+        for problem in self.problems:
+            if not isinstance(problem, Comment):
+                log.info('Not recording review with unattributed problems.')
+                return None
+            if problem.filename in results:
+                results[problem.filename].append(
+                    [problem.line, problem.body])
+        return results
+
+    def record_review(self):
+        """Save the results of an incremental review
+        so the next review can reuse them.
+        """
+        if self._state is None or self._results is None:
+            return
+        self._state.record_review(
+            self._repository.user,
+            self._repository.repo_name,
+            self._pull_request.number,
+            self._pull_request.head,
+            self._config.digest(),
+            self._results)
 
     def apply_fixers(self, tool_list, files_to_check):
         fixer_context = fixers.create_context(
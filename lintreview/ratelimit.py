@@ -0,0 +1,180 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+from lintreview.cache import connect
+
+log = logging.getLogger(__name__)
+
+# Request priorities. Publishing reviews is urgent, while
+# labels and OK comments can wait for the rate limit to recover.
+PRIORITY_HIGH = 'high'
+PRIORITY_NORMAL = 'normal'
+PRIORITY_LOW = 'low'
+
+# The fraction of the rate limit held back from each priority.
+RESERVE = {
+    PRIORITY_HIGH: 0.0,
+    PRIORITY_NORMAL: 0.1,
+    PRIORITY_LOW: 0.25,
+}
+
+# Requests are paced once less than this fraction of the
+# rate limit remains.
+PACE_BELOW = 0.5
+
+_local = threading.local()
+
+
+@contextmanager
+def priority(level):
+    """Set the priority of GitHub API requests made in the
+    current thread.
+    """
+    previous = current_priority()
+    _local.priority = level
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def current_priority():
+    return getattr(_local, 'priority', PRIORITY_NORMAL)
+
+
+def pacing_delay(remaining, limit, reset, level, now=None):
+    """Get the seconds to wait before making a request.
+
+    Requests of each priority may use the remaining requests above
+    their reserve. Once less than PACE_BELOW of the limit remains,
+    requests are spread out evenly until the rate limit resets.
+    When a priority has no requests left, it waits for the reset.
+    """
+    if now is None:
+        now = time.time()
+    until_reset = max(0.0, reset - now)
+    available = remaining - int(limit * RESERVE.get(level, 0))
+    if available <= 0:
+        return until_reset
+    if remaining >= limit * PACE_BELOW:
+        return 0.0
+    return until_reset / available
+
+
+def get_rate_limit_store(config):
+    """Get the rate limit store if it is enabled in the config.
+    """
+    path = config.get('GITHUB_RATE_LIMIT_PATH')
+    if not path:
+        return None
+    return RateLimitStore(path)
+
+
+class RateLimitStore(object):
+    """Persistent store of GitHub API rate limits.
+
+    The store is shared by all workers on a host so that they
+    can pace their requests together.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._setup()
+
+    def _setup(self):
+        with self._connect() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS limits ('
+                'key TEXT PRIMARY KEY, '
+                'remaining INTEGER NOT NULL, '
+                'lim INTEGER NOT NULL, '
+                'reset REAL NOT NULL)')
+
+    def _connect(self):
+        return connect(self.path)
+
+    def get(self, key):
+        """Get the (remaining, limit, reset) for a key.
+
+        Returns None when the limit is unknown or has been reset.
+        """
+        try:
+            with self._connect() as db:
+                row = db.execute(
+                    'SELECT remaining, lim, reset FROM limits WHERE key = ?',
+                    (key,)).fetchone()
+        except sqlite3.Error as e:
+            log.warning('Could not read rate limit. error=%s', e)
+            return None
+        if row is None or row[2] <= time.time():
+            return None
+        return row
+
+    def update(self, key, remaining, limit, reset):
+        """Record the rate limit returned in a response.
+        """
+        try:
+            with self._connect() as db:
+                db.execute(
+                    'INSERT OR REPLACE INTO limits '
+                    '(key, remaining, lim, reset) VALUES (?, ?, ?, ?)',
+                    (key, remaining, limit, reset))
+        except sqlite3.Error as e:
+            log.warning('Could not record rate limit. error=%s', e)
+
+
+class RateLimitAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter that paces requests using the rate limits
+    GitHub returns, based on the priority of the current thread.
+
+    Rate limits are tracked per credential. Waits are capped
+    at `max_wait` seconds.
+    """
+
+    def __init__(self, store, max_wait=60, **kwargs):
+        self.store = store
+        self.max_wait = max_wait
+        super(RateLimitAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        key = _limit_key(request)
+        self._wait(key)
+        response = super(RateLimitAdapter, self).send(request, **kwargs)
+        self._record(key, response)
+        return response
+
+    def _wait(self, key):
+        state = self.store.get(key)
+        if state is None:
+            return
+        remaining, limit, reset = state
+        level = current_priority()
+        delay = min(self.max_wait, pacing_delay(remaining, limit, reset, level))
+        if delay <= 0:
+            return
+        log.info('Waiting %.2fs for %s priority GitHub request, '
+                 '%s of %s requests remaining', delay, level, remaining, limit)
+        time.sleep(delay)
+
+    def _record(self, key, response):
+        headers = response.headers
+        try:
+            remaining = int(headers['X-RateLimit-Remaining'])
+            limit = int(headers['X-RateLimit-Limit'])
+            reset = float(headers['X-RateLimit-Reset'])
+        except (KeyError, TypeError, ValueError):
+            return
+        self.store.update(key, remaining, limit, reset)
+
+
+def _limit_key(request):
+    credential = request.headers.get('Authorization', 'anonymous')
+    if isinstance(credential, str):
+        credential = credential.encode('utf8')
+    return hashlib.sha1(credential).hexdigest()
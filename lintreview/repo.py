@@ -1,9 +1,18 @@
 import lintreview.github as github
 import logging
 import json
+from collections import namedtuple
 
 log = logging.getLogger(__name__)
 
+# Snapshot of the pull request data used during a review.
+PullRequestData = namedtuple(
+    'PullRequestData',
+    ('number', 'display_name', 'head', 'base', 'clone_url',
+     'target_branch', 'head_branch', 'from_private_fork',
+     'maintainer_can_modify')
+)
+
 
 class GithubRepository(object):
     """Abstracting wrapper for the
@@ -72,16 +81,69 @@ class GithubPullRequest(object):
     """Abstract the underlying github models.
     This makes other code simpler, and enables
     the ability to add other hosting services later.
+
+    The pull request data is read once into a PullRequestData
+    record. Use refresh() to reload it from GitHub.
     """
 
     def __init__(self, pull_request):
         self.pull = pull_request
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self._snapshot(self.pull.as_dict())
+        return self._data
+
+    def refresh(self):
+        """Reload the pull request from GitHub."""
+        self.pull = self.pull.refresh()
+        self._data = None
+        return self.data
+
+    def _snapshot(self, data):
+        head = data['head']
+        base = data['base']
+        # The head repo is null when the fork has been deleted.
+        head_repo = head.get('repo')
+        same_repo = (head_repo is not None and
+                     base['repo']['full_name'] == head_repo['full_name'])
+
+        # Private head repo or forked head counts
+        from_private_fork = False
+        if head_repo is not None and not same_repo:
+            from_private_fork = head_repo['private'] and head_repo['fork']
+
+        # If the pull is from a private or deleted fork we read from
+        # the base repository to get around permission issues where
+        # github applications don't have access to forked repositories.
+        if from_private_fork or head_repo is None:
+            clone_url = base['repo']['clone_url']
+            head_branch = u'refs/pull/{}/head'.format(data['number'])
+        else:
+            clone_url = head_repo['clone_url']
+            head_branch = head['ref']
+
+        # Maintainers can always edit pulls from the head repo.
+        maintainer_can_modify = same_repo or data['maintainer_can_modify']
+
+        name_repo = head_repo or base['repo']
+        return PullRequestData(
+            number=data['number'],
+            display_name=u'%s/pull/%s' % (name_repo['full_name'],
+                                          data['number']),
+            head=head['sha'],
+            base=base['sha'],
+            clone_url=clone_url,
+            target_branch=base['ref'],
+            head_branch=head_branch,
+            from_private_fork=from_private_fork,
+            maintainer_can_modify=maintainer_can_modify)
 
     @property
     def display_name(self):
-        data = self.pull.as_dict()
-        return u'%s/pull/%s' % (data['head']['repo']['full_name'],
-                                data['number'])
+        return self.data.display_name
 
     @property
     def number(self):
@@ -89,13 +151,11 @@ class GithubPullRequest(object):
 
     @property
     def head(self):
-        data = self.pull.as_dict()
-        return data['head']['sha']
+        return self.data.head
 
     @property
     def base(self):
-        data = self.pull.as_dict()
-        return data['base']['sha']
+        return self.data.base
 
     @property
     def clone_url(self):
@@ -106,15 +166,11 @@ class GithubPullRequest(object):
         issues where github applications don't have access
         to forked repositories.
         """
-        data = self.pull.as_dict()
-        if self.from_private_fork:
-            return data['base']['repo']['clone_url']
-        return data['head']['repo']['clone_url']
+        return self.data.clone_url
 
     @property
     def target_branch(self):
-        data = self.pull.as_dict()
-        return data['base']['ref']
+        return self.data.target_branch
 
     @property
     def head_branch(self):
@@ -124,22 +180,11 @@ class GithubPullRequest(object):
         head branch will be pull ref so we can read it
         from the base repo.
         """
-        data = self.pull.as_dict()
-        if self.from_private_fork:
-            return u'refs/pull/{}/head'.format(self.number)
-        return data['head']['ref']
+        return self.data.head_branch
 
     @property
     def from_private_fork(self):
-        data = self.pull.as_dict()
-        head = data['head']['repo']
-        base = data['base']['repo']
-
-        # If the base and head are the same its not a fork
-        if base['full_name'] == head['full_name']:
-            return False
-        # Private head repo or forked head counts
-        return head['private'] and head['fork']
+        return self.data.from_private_fork
 
     @property
     def maintainer_can_modify(self):
@@ -148,11 +193,7 @@ class GithubPullRequest(object):
 
         Maintainers can always edit pulls from the head repo.
         """
-        data = self.pull.as_dict()
-        if data['base']['repo']['full_name'] == \
-                data['head']['repo']['full_name']:
-            return True
-        return data['maintainer_can_modify']
+        return self.data.maintainer_can_modify
 
     def commits(self):
         return self.pull.commits()
@@ -1,10 +1,29 @@
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
+import threading
+import time
+
+from github3.exceptions import TransportError
+from requests.exceptions import ConnectTimeout
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+import lintreview.metrics as metrics
+import lintreview.ratelimit as ratelimit
 
 LEVEL_INFO = 'info'
 LEVEL_ERROR = 'error'
 
+# GitHub only accepts 50 checkrun annotations per request.
+CHECKRUN_CHUNK_SIZE = 50
+
+# The number of attempts made to publish each checkrun chunk,
+# and the seconds to wait before the first retry. The wait
+# doubles after each failed attempt.
+CHECKRUN_ATTEMPTS = 3
+CHECKRUN_BACKOFF = 1.0
+
 log = logging.getLogger(__name__)
 buildlog = logging.getLogger('buildlog')
 
@@ -163,6 +182,7 @@ class Review(object):
     def comments(self, filename):
         return self._comments.all(filename)
 
+    @metrics.timed('publish')
     def publish(self, problems, check_run_id=None, logs=None):
         """
         Publish the review.
@@ -174,10 +194,11 @@ class Review(object):
         to update the result description with the logs.
         """
         problems.limit_to_changes()
-        if check_run_id:
-            self._publish_checkrun(problems, check_run_id, logs)
-        else:
-            self._publish_review(problems, self._pull.head)
+        with ratelimit.priority(ratelimit.PRIORITY_HIGH):
+            if check_run_id:
+                self._publish_checkrun(problems, check_run_id, logs)
+            else:
+                self._publish_review(problems, self._pull.head)
 
     def _publish_checkrun(self, problems, check_run_id, logs):
         """Publish the review as a checkrun
@@ -205,11 +226,11 @@ class Review(object):
                 if isinstance(comment, Comment)
             ]
 
-        # GitHub only accepts 50 annotations per request so we
+        # GitHub limits the annotations per request so we
         # need to chunk it up.
         annotation_payloads = [
             build_annotations(chunk)
-            for chunk in problems.iter_chunks(50)
+            for chunk in problems.iter_chunks(CHECKRUN_CHUNK_SIZE)
         ]
         summary = [
             comment.body
@@ -248,12 +269,58 @@ class Review(object):
 
         # Some reviews have no comments and should be marked as success.
         if not (summary or annotation_payloads):
-            review = self._build_checkrun(0, annotation_payloads, check_data)
-            self._repo.update_checkrun(check_run_id, review)
+            annotation_payloads = [[]]
+
+        reviews = [
+            self._build_checkrun(i, chunk, check_data)
+            for i, chunk in enumerate(annotation_payloads)
+        ]
+        if not reviews:
+            return
+
+        # The first chunk sets the conclusion, the remaining chunks
+        # only append annotations and can be sent concurrently.
+        level = ratelimit.current_priority()
+        self._update_checkrun(check_run_id, reviews[0], level)
+        remaining = reviews[1:]
+        workers = min(self.config.checkrun_workers(), len(remaining))
+        if workers <= 1:
+            for review in remaining:
+                self._update_checkrun(check_run_id, review, level)
+            return
+
+        log.debug('Publishing %d checkrun chunks with %d workers',
+                  len(remaining), workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    self._update_checkrun, check_run_id, review, level)
+                for review in remaining
+            ]
+            for future in futures:
+                future.result()
 
-        for i, chunk in enumerate(annotation_payloads):
-            review = self._build_checkrun(i, chunk, check_data)
-            self._repo.update_checkrun(check_run_id, review)
+    def _update_checkrun(self, check_run_id, review, level):
+        """Send a checkrun update with the request priority `level`.
+
+        Each update appends annotations, so a request is only retried
+        when the connection to GitHub couldn't be opened. Server errors
+        and timeouts are not retried as GitHub may have applied the
+        update, and retrying would duplicate annotations.
+        """
+        delay = CHECKRUN_BACKOFF
+        with ratelimit.priority(level):
+            for attempt in range(1, CHECKRUN_ATTEMPTS + 1):
+                try:
+                    return self._repo.update_checkrun(check_run_id, review)
+                except TransportError as e:
+                    if (attempt == CHECKRUN_ATTEMPTS or
+                            not _not_connected(e.exception)):
+                        raise
+                    log.warning('Could not update checkrun=%s, retrying '
+                                'in %ss. error=%s', check_run_id, delay, e)
+                    time.sleep(delay)
+                    delay *= 2
 
     def _build_checkrun(self, index, comments, check_data):
         """Because github3.py doesn't support creating checkruns
@@ -302,8 +369,7 @@ class Review(object):
         # Remove comments we made in the past, so that we only
         # post previously un-reported issues. We assume that comments
         # that with the same line and body are from us.
-        for comment in existing_comments:
-            problems.remove(comment)
+        problems.difference(existing_comments)
         new_problem_count = len(problems)
 
         threshold = self.config.summary_threshold()
@@ -398,7 +464,8 @@ class Review(object):
     def _remove_ok_label(self):
         label = self.config.passed_review_label()
         if label:
-            IssueLabel(label).remove(self._pull)
+            with ratelimit.priority(ratelimit.PRIORITY_LOW):
+                IssueLabel(label).remove(self._pull)
 
     def _publish_ok_label(self):
         """Optionally publish the OK_LABEL if it is enabled.
@@ -406,14 +473,16 @@ class Review(object):
         label = self.config.passed_review_label()
         if label:
             issue_label = IssueLabel(label)
-            issue_label.publish(self._repo, self._pull)
+            with ratelimit.priority(ratelimit.PRIORITY_LOW):
+                issue_label.publish(self._repo, self._pull)
 
     def _publish_ok_comment(self):
         """Optionally publish the OK_COMMENT if it is enabled.
         """
         comment = self.config.get('OK_COMMENT', False)
         if comment:
-            self._pull.create_comment(comment)
+            with ratelimit.priority(ratelimit.PRIORITY_LOW):
+                self._pull.create_comment(comment)
 
     def _publish_empty_comment(self):
         log.info('Publishing empty comment.')
@@ -438,17 +507,48 @@ class Review(object):
         self._pull.create_comment(body)
 
 
+def _match_key(comment):
+    """Get the values used to compare comments for equality"""
+    return (getattr(comment, 'filename', None),
+            getattr(comment, 'position', None),
+            comment.body)
+
+
+def _not_connected(error):
+    """Check whether a requests error happened before
+    a connection was made, meaning nothing was sent.
+    """
+    if isinstance(error, ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    return (isinstance(reason, MaxRetryError) and
+            isinstance(reason.reason, NewConnectionError))
+
+
 class Problems(object):
     """Collection class for holding all the problems found
     during automated review.
 
     Used by tool objects to collect problems, and by
     the Review objects to publish results.
+
+    Problems can be shared by tools running in concurrent
+    threads. Mutations are serialized with a lock.
+
+    When `filter_changes` is set, line comments on lines that
+    were not changed are dropped as they are added, instead of
+    when the review is published.
     """
 
-    def __init__(self, changes=None):
+    def __init__(self, changes=None, filter_changes=False):
         self._items = OrderedDict()
         self._changes = changes
+        self._filter_changes = filter_changes
+        self._lock = threading.RLock()
+        # Index of (filename, position, body) to item keys.
+        # Built when comments are removed.
+        self._index = None
+        self._local = threading.local()
 
     def set_changes(self, changes):
         self._changes = changes
@@ -481,11 +581,22 @@ class Problems(object):
         and the line numbers diff offset will be fetched from there.
         """
         if isinstance(filename, BaseComment):
-            self._items[filename.key()] = filename
+            with self._lock:
+                key = filename.key()
+                if key not in self._items:
+                    self._count_added()
+                self._items[key] = filename
+                self._index = None
             return
 
         if line == 0:
             line = Comment.FIRST_LINE_IN_DIFF
+        if self._filtering():
+            if line == Comment.FIRST_LINE_IN_DIFF:
+                line = self._changes.first_changed_line(filename)
+            if not self._changes.has_line_changed(filename, line):
+                self._count_dropped(1)
+                return
         if not position:
             position = self.line_to_position(filename, line)
 
@@ -495,12 +606,106 @@ class Problems(object):
             position=position,
             body=body)
         key = error.key()
-        if key not in self._items:
-            log.debug("Adding new line comment '%s'", error)
-            self._items[key] = error
-        else:
-            log.debug("Updating existing line comment with '%s'", error)
-            self._items[key].append_body(error.body)
+        with self._lock:
+            self._index = None
+            if key not in self._items:
+                log.debug("Adding new line comment '%s'", error)
+                self._items[key] = error
+                self._count_added()
+            else:
+                log.debug("Updating existing line comment with '%s'", error)
+                self._items[key].append_body(error.body)
+
+    def add_batch(self, records):
+        """Add problems from an iterable of (filename, line, body) tuples.
+
+        Records are grouped by filename so each file's diff positions
+        are resolved together, and are then added in a single pass
+        in their original order. The result is the same as calling
+        add() for each record, except that nothing is added when
+        reading `records` raises an error.
+        """
+        grouped = OrderedDict()
+        for index, (filename, line, body) in enumerate(records):
+            if line == 0:
+                line = Comment.FIRST_LINE_IN_DIFF
+            grouped.setdefault(filename, []).append((line, body, index))
+
+        errors = []
+        filtering = self._filtering()
+        for filename, entries in grouped.items():
+            if filtering:
+                entries = self._filter_entries(filename, entries)
+            positions = self._line_positions(
+                filename, set(entry[0] for entry in entries))
+            errors.extend(
+                (index, Comment(filename=filename,
+                                line=line,
+                                position=positions[line],
+                                body=body))
+                for line, body, index in entries)
+        errors.sort(key=lambda item: item[0])
+
+        added = 0
+        with self._lock:
+            self._index = None
+            items = self._items
+            for _, error in errors:
+                key = error.key()
+                existing = items.get(key)
+                if existing is None:
+                    items[key] = error
+                    added += 1
+                else:
+                    existing.append_body(error.body)
+            self._local.added = self.added_in_thread() + added
+        log.debug("Added %s new line comments from %s records",
+                  added, len(errors))
+
+    def _filtering(self):
+        return self._filter_changes and self._changes is not None
+
+    def _filter_entries(self, filename, entries):
+        changes = self._changes
+        first_line = None
+        if any(entry[0] == Comment.FIRST_LINE_IN_DIFF for entry in entries):
+            first_line = changes.first_changed_line(filename)
+        changed = {}
+        kept = []
+        for line, body, index in entries:
+            if line == Comment.FIRST_LINE_IN_DIFF:
+                line = first_line
+            if line not in changed:
+                changed[line] = changes.has_line_changed(filename, line)
+            if changed[line]:
+                kept.append((line, body, index))
+        if len(kept) < len(entries):
+            self._count_dropped(len(entries) - len(kept))
+        return kept
+
+    def _count_dropped(self, count):
+        self._local.dropped = self.dropped_in_thread() + count
+
+    def dropped_in_thread(self):
+        """Get the number of problems on unchanged lines dropped
+        in the current thread when filtering changes.
+        """
+        return getattr(self._local, 'dropped', 0)
+
+    def _line_positions(self, filename, lines):
+        if not self._changes:
+            return dict((line, line) for line in lines)
+        return self._changes.line_positions(filename, lines)
+
+    def _count_added(self):
+        self._local.added = self.added_in_thread() + 1
+
+    def added_in_thread(self):
+        """Get the number of problems added by the current thread.
+
+        Used to report per tool totals when tools run concurrently.
+        """
+        return getattr(self._local, 'added', 0)
 
     def add_many(self, problems):
         """Add multiple problems to the review.
@@ -525,23 +730,44 @@ class Problems(object):
                 return True
             return False
 
-        items = OrderedDict()
-        for error in self:
-            if sieve(error):
-                items[error.key()] = error
-        self._items = items
+        with self._lock:
+            items = OrderedDict()
+            for error in self:
+                if sieve(error):
+                    items[error.key()] = error
+            self._items = items
+            self._index = None
 
     def remove(self, comment):
         """Remove a problem from the list based on the filename
         position and comment.
         """
-        found = False
-        for i, item in self._items.items():
-            if item == comment:
-                found = i
-                break
-        if found is not False:
-            del self._items[found]
+        with self._lock:
+            self._remove(comment, self._get_index())
+
+    def difference(self, existing):
+        """Remove all the problems matching comments in `existing`
+
+        Used to drop problems that have already been published.
+        """
+        with self._lock:
+            index = self._get_index()
+            for comment in existing:
+                self._remove(comment, index)
+
+    def _get_index(self):
+        if self._index is None:
+            index = {}
+            for key, item in self._items.items():
+                index.setdefault(_match_key(item), []).append(key)
+            self._index = index
+        return self._index
+
+    def _remove(self, comment, index):
+        keys = index.get(_match_key(comment))
+        if not keys:
+            return
+        del self._items[keys.pop(0)]
 
     def error_count(self):
         return len([e for e in self._items.values() if e.level == LEVEL_ERROR])
@@ -558,5 +784,5 @@ class Problems(object):
         return len(self._items.values())
 
     def __iter__(self):
-        for item in self._items.values():
+        for item in list(self._items.values()):
             yield item
@@ -0,0 +1,130 @@
+import json
+import logging
+import sqlite3
+import time
+
+from lintreview.cache import connect
+
+log = logging.getLogger(__name__)
+
+
+class Superseded(Exception):
+    """Raised when a newer commit has been pushed to a pull request
+    that is being reviewed.
+    """
+    pass
+
+
+def get_state_store(config):
+    """Get the pull request state store if it is enabled in the config.
+    """
+    path = config.get('STATE_PATH')
+    if not path:
+        return None
+    return StateStore(path)
+
+
+class StateStore(object):
+    """Persistent store of pull request review state.
+
+    The store is shared by the webserver and celery workers, and is
+    used to skip reviews of commits that have been replaced by
+    newer pushes, and to remember the results of the last review
+    for incremental reviews.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._setup()
+
+    def _setup(self):
+        with self._connect() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS heads ('
+                'key TEXT PRIMARY KEY, '
+                'head TEXT NOT NULL, '
+                'updated REAL NOT NULL)')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS reviews ('
+                'key TEXT PRIMARY KEY, '
+                'head TEXT NOT NULL, '
+                'config TEXT NOT NULL, '
+                'files TEXT NOT NULL, '
+                'updated REAL NOT NULL)')
+
+    def _connect(self):
+        return connect(self.path)
+
+    def _key(self, user, repo, number):
+        return u'{}/{}/{}'.format(user, repo, number)
+
+    def record_head(self, user, repo, number, head):
+        """Record `head` as the newest commit for a pull request.
+        """
+        try:
+            with self._connect() as db:
+                db.execute(
+                    'INSERT OR REPLACE INTO heads (key, head, updated) '
+                    'VALUES (?, ?, ?)',
+                    (self._key(user, repo, number), head, time.time()))
+        except sqlite3.Error as e:
+            log.warning('Could not record pull request head. error=%s', e)
+
+    def latest_head(self, user, repo, number):
+        """Get the newest commit recorded for a pull request.
+        """
+        try:
+            with self._connect() as db:
+                row = db.execute(
+                    'SELECT head FROM heads WHERE key = ?',
+                    (self._key(user, repo, number),)).fetchone()
+        except sqlite3.Error as e:
+            log.warning('Could not read pull request head. error=%s', e)
+            return None
+        if row is None:
+            return None
+        return row[0]
+
+    def check_current(self, user, repo, number, head):
+        """Raise Superseded if a newer commit than `head`
+        has been recorded for a pull request.
+        """
+        latest = self.latest_head(user, repo, number)
+        if latest and head and latest != head:
+            raise Superseded(
+                u'{} in {}/{}/{} has been superseded by {}'.format(
+                    head, user, repo, number, latest))
+
+    def record_review(self, user, repo, number, head, config, files):
+        """Record the results of a completed review.
+
+        `config` is a digest of the review configuration and `files`
+        is a dict of filename to a list of (line, body) problems.
+        """
+        try:
+            with self._connect() as db:
+                db.execute(
+                    'INSERT OR REPLACE INTO reviews '
+                    '(key, head, config, files, updated) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (self._key(user, repo, number), head, config,
+                     json.dumps(files), time.time()))
+        except sqlite3.Error as e:
+            log.warning('Could not record review. error=%s', e)
+
+    def last_review(self, user, repo, number):
+        """Get the results of the last completed review.
+
+        Returns a tuple of (head, config, files) or None.
+        """
+        try:
+            with self._connect() as db:
+                row = db.execute(
+                    'SELECT head, config, files FROM reviews WHERE key = ?',
+                    (self._key(user, repo, number),)).fetchone()
+            if row is None:
+                return None
+            return row[0], row[1], json.loads(row[2])
+        except (sqlite3.Error, ValueError) as e:
+            log.warning('Could not read review. error=%s', e)
+            return None
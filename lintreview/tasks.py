@@ -1,25 +1,63 @@
+import lintreview.docker as docker
 import lintreview.git as git
+import lintreview.metrics as metrics
+import lintreview.tools as tools
 import logging
 
 from celery import Celery
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from lintreview.config import load_config, build_review_config
 from lintreview.repo import GithubRepository
 from lintreview.processor import Processor
 from lintreview.docker import TimeoutError
+from lintreview.state import get_state_store, Superseded
 
 config = load_config()
 celery = Celery('lintreview.tasks')
 celery.config_from_object(config)
+docker.configure(config)
 
 log = logging.getLogger(__name__)
 
 
+def _prepare(processor, review_config, clone_url, target_path, head):
+    """Load the pull request changes and clone the repository.
+
+    Fetching the changes, cloning and checking the linter images
+    are independent so they are run concurrently. Sparse
+    checkouts need the changes before the clone can start, while
+    local diffs need the clone before the changes can be read.
+    """
+    def clone(paths=None):
+        git.clone_or_update(config, clone_url, target_path, head, paths)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        images = executor.submit(tools.warm_up, review_config, target_path)
+        if config.get('GIT_SPARSE_CHECKOUT'):
+            processor.load_changes()
+            clone(processor.checkout_paths())
+        elif review_config.local_diff():
+            clone()
+            processor.load_changes()
+        else:
+            changes = executor.submit(processor.load_changes)
+            clone()
+            changes.result()
+        images.result()
+
+
 @celery.task(bind=True, ignore_result=True)
-def process_pull_request(self, user, repo_name, number, lintrc):
+@metrics.review(config.get('METRICS_PATH'))
+@metrics.timed('review')
+def process_pull_request(self, user, repo_name, number, lintrc,
+                         head_sha=None):
     """
     Starts processing a pull request and running the various
     lint tools against it.
+
+    When `head_sha` is provided the review is abandoned
+    as soon as a newer commit is pushed to the pull request.
     """
     log.info('Starting to process lint for %s/%s/%s', user, repo_name, number)
     log.debug("lintrc contents '%s'", lintrc)
@@ -29,16 +67,24 @@ def process_pull_request(self, user, repo_name, number, lintrc):
         log.info('No configured linters, skipping processing.')
         return
 
+    state = get_state_store(config)
+
+    def check_current():
+        if state:
+            state.check_current(user, repo_name, number, head_sha)
+
+    target_path = None
     try:
+        check_current()
         log.info('Loading pull request data from github. user=%s '
                  'repo=%s number=%s', user, repo_name, number)
         repo = GithubRepository(config, user, repo_name)
         pull_request = repo.pull_request(number)
 
-        clone_url = pull_request.clone_url
-
-        pr_head = pull_request.head
-        target_branch = pull_request.target_branch
+        pull_data = pull_request.data
+        clone_url = pull_data.clone_url
+        pr_head = pull_data.head
+        target_branch = pull_data.target_branch
 
         if target_branch in review_config.ignore_branches():
             log.info('Pull request into ignored branch %s, skipping review.',
@@ -47,18 +93,23 @@ def process_pull_request(self, user, repo_name, number, lintrc):
 
         repo.create_status(pr_head, 'pending', 'Lintreview processing')
 
-        # Clone/Update repository
         target_path = git.get_repo_path(user, repo_name, number, config)
-        git.clone_or_update(config, clone_url, target_path, pr_head)
+        processor = Processor(repo, pull_request, target_path, review_config,
+                              state=state)
+        _prepare(processor, review_config, clone_url, target_path, pr_head)
 
-        processor = Processor(repo, pull_request, target_path, review_config)
-        processor.load_changes()
+        check_current()
         review, problems = processor.execute()
+
+        check_current()
         review.publish(problems)
+        processor.record_review()
 
         log.info('Completed lint processing for %s/%s/%s' % (
             user, repo_name, number))
 
+    except Superseded as e:
+        log.info('Skipping review. %s', e)
     except Exception as e:
         log.exception(e)
     except TimeoutError as e:
@@ -68,9 +119,12 @@ def process_pull_request(self, user, repo_name, number, lintrc):
             max_retries=2,  # only give it one more shot
         )
     finally:
-        try:
-            git.destroy(target_path)
-            log.info('Cleaned up pull request %s/%s/%s',
-                     user, repo_name, number)
-        except Exception as e:
-            log.exception(e)
+        if target_path is not None:
+            try:
+                docker.drain_pool(target_path)
+                docker.evict_cache_volumes()
+                git.destroy(target_path)
+                log.info('Cleaned up pull request %s/%s/%s',
+                         user, repo_name, number)
+            except Exception as e:
+                log.exception(e)
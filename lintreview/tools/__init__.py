@@ -1,19 +1,25 @@
+import fnmatch
+import hashlib
+import json
 import logging
 import os
 import re
 import threading
 
 import lintreview.docker as docker
+import lintreview.metrics as metrics
 
 from collections.abc import Iterable
-from lintreview.review import IssueComment
+from concurrent.futures import ThreadPoolExecutor
+from lintreview.review import Comment, IssueComment, Problems
 from xml.etree import ElementTree
 
 log = logging.getLogger(__name__)
 buildlog = logging.getLogger('buildlog')
 
 version_re = re.compile(r'([\d]+[\d.a-z]+)')
-_version_cache = threading.local()
+_version_cache = {}
+_version_lock = threading.Lock()
 
 
 def extract_version(text):
@@ -36,19 +42,67 @@ def _get_tool_version(tool):
     on each review just heats the earth.
     """
     classname = tool.__class__.name
-    if hasattr(_version_cache, classname):
-        return getattr(_version_cache, classname)
+    with _version_lock:
+        if classname in _version_cache:
+            return _version_cache[classname]
     result = tool.version()
-    setattr(_version_cache, classname, result)
+    with _version_lock:
+        _version_cache[classname] = result
     return result
 
 
+class BuildlogCapture(logging.Filter):
+    """
+    Logging filter that buffers buildlog records per thread.
+
+    When tools run concurrently their buildlog output would interleave.
+    Threads that have started a capture have their records held back
+    so they can be replayed in tool order once the tool completes.
+    """
+
+    def __init__(self):
+        super(BuildlogCapture, self).__init__()
+        self._local = threading.local()
+
+    def start(self):
+        self._local.records = []
+        return self._local.records
+
+    def stop(self):
+        self._local.records = None
+
+    def filter(self, record):
+        records = getattr(self._local, 'records', None)
+        if records is None:
+            return True
+        records.append(record)
+        return False
+
+
+_buildlog_capture = BuildlogCapture()
+buildlog.addFilter(_buildlog_capture)
+
+
 class Tool(object):
     """
     Base class for tools
     """
     name = ''
 
+    # Set to True for tools where the results for a file
+    # depend on other files in the repository, like type checkers.
+    whole_project = False
+
+    # Filename patterns for configuration files the tool discovers
+    # on its own. They are used to build result cache keys.
+    config_files = ()
+
+    # Directory in the container where the tool keeps an incremental
+    # cache, and the arguments that enable the cache. When docker
+    # cache volumes are enabled the directory is kept between reviews.
+    cache_dir = None
+    cache_args = ()
+
     def __init__(self, problems, options=None, base_path=None):
         self.problems = problems
         self.base_path = base_path
@@ -69,11 +123,14 @@ class Tool(object):
         """
         return ''
 
-    def execute(self, files):
+    def execute(self, files, cache=None):
         """
         Execute the tool against the files in a
         pull request. Files will be filtered by
         match_file()
+
+        When a result cache is provided, only files without
+        cached results are processed.
         """
         matching_files = [f for f in files if self.match_file(f)]
         num_files = len(matching_files)
@@ -83,12 +140,195 @@ class Tool(object):
             return
 
         buildlog.info('Running %s on %d files', self.name, num_files)
-        log.debug('Processing %s files with %s', matching_files, self.name)
+        with metrics.span('tool', tool=self.name):
+            if cache is not None and not self.whole_project:
+                self._execute_cached(cache, matching_files)
+            else:
+                self._process(matching_files)
+
+    def _process(self, files):
+        log.debug('Processing %s files with %s', files, self.name)
+        docker.take_truncated()
         try:
-            self.process_files(matching_files)
+            self.process_files(files)
         except docker.TimeoutError:
             msg = 'Failed to run %s linter. It timed out during execution.'
             self.problems.add(IssueComment(msg % (self.name)))
+        if docker.take_truncated():
+            msg = (u'The output of the {} linter was too large and was '
+                   u'truncated. Some problems may not have been reported.')
+            self.problems.add(IssueComment(msg.format(self.name)))
+
+    def _execute_cached(self, cache, files):
+        """
+        Replay cached results and process the remaining files.
+
+        Results are cached per file, so problems are collected
+        into a separate Problems instance before being added to
+        the review.
+        """
+        keys = self.cache_keys(files)
+        misses = []
+        for path in files:
+            results = None
+            if keys.get(path):
+                results = cache.get(keys[path])
+            if results is None:
+                misses.append(path)
+                continue
+            filename = docker.strip_base(path)
+            for line, body in results:
+                self.problems.add(filename, line, body)
+
+        hits = len(files) - len(misses)
+        if hits:
+            buildlog.info('Using cached %s results for %d files', self.name, hits)
+        if not misses:
+            return
+
+        problems = self.problems
+        collected = Problems()
+        self.problems = collected
+        try:
+            self._process(misses)
+        finally:
+            self.problems = problems
+
+        results = {docker.strip_base(path): [] for path in misses}
+        cacheable = True
+        for problem in collected:
+            if isinstance(problem, Comment):
+                problems.add(problem.filename, problem.line, problem.body)
+                if problem.filename in results:
+                    results[problem.filename].append((problem.line, problem.body))
+                else:
+                    cacheable = False
+            else:
+                # General comments like configuration errors
+                # can't be attributed to files.
+                problems.add(problem)
+                cacheable = False
+
+        if not cacheable:
+            log.debug('Not caching %s results with unattributed problems', self.name)
+            return
+        for path in misses:
+            if keys.get(path):
+                cache.set(keys[path], results[docker.strip_base(path)])
+
+    def cache_keys(self, files):
+        """
+        Generate result cache keys for each of `files`.
+
+        Keys are built from the path and git blob hash of each file,
+        the tool version, the tool options and any configuration
+        files the tool would read. Files that can't be read
+        have no key.
+        """
+        version = _get_tool_version(self)
+        if not version or not self.base_path:
+            return {}
+        options = json.dumps(self.options, sort_keys=True, default=str)
+        config_digests = {}
+        keys = {}
+        for path in files:
+            filename = docker.strip_base(path)
+            blob = blob_hash(os.path.join(self.base_path, filename))
+            if blob is None:
+                continue
+            key = [
+                self.name,
+                version,
+                options,
+                self._config_digest(os.path.dirname(filename), config_digests),
+                filename,
+                blob,
+            ]
+            keys[path] = hashlib.sha256(json.dumps(key).encode('utf8')).hexdigest()
+        return keys
+
+    def _config_digest(self, dirname, digests):
+        """
+        Hash the configuration files that could apply to
+        files in `dirname`.
+
+        This includes files referenced in the tool options and
+        files matching `config_files` in `dirname` and its parents.
+        """
+        if dirname in digests:
+            return digests[dirname]
+        if dirname:
+            parent = self._config_digest(os.path.dirname(dirname), digests)
+        else:
+            parent = self._option_files_digest()
+
+        digest = hashlib.sha1(parent.encode('utf8'))
+        directory = os.path.join(self.base_path, dirname)
+        try:
+            entries = sorted(os.listdir(directory))
+        except OSError:
+            entries = []
+        for entry in entries:
+            if not any(fnmatch.fnmatch(entry, p) for p in self.config_files):
+                continue
+            digest.update(entry.encode('utf8'))
+            digest.update((blob_hash(os.path.join(directory, entry)) or '').encode('utf8'))
+        digests[dirname] = digest.hexdigest()
+        return digests[dirname]
+
+    def _option_files_digest(self):
+        digest = hashlib.sha1()
+        for value in self.options.values():
+            if not isinstance(value, str):
+                continue
+            for candidate in commalist(value):
+                path = self.apply_base(candidate)
+                if os.path.isfile(path):
+                    digest.update(candidate.encode('utf8'))
+                    digest.update((blob_hash(path) or '').encode('utf8'))
+        return digest.hexdigest()
+
+    def cache_mount(self):
+        """
+        Get the (volume, path) tuple docker.run() uses to mount
+        the tool's cache volume.
+
+        Volumes are kept per repository, tool and tool version.
+        Returns None when the tool has no cache, or cache
+        volumes are not enabled.
+        """
+        if not self.cache_dir or not self.base_path:
+            return None
+        if not docker.cache_enabled():
+            return None
+        # Checkouts are made in WORKSPACE/user/repo/number so
+        # the parent directory identifies the repository.
+        repository = os.path.dirname(os.path.normpath(self.base_path))
+        volume = docker.cache_volume(
+            repository, self.name, _get_tool_version(self))
+        return (volume, self.cache_dir)
+
+    def checkout_paths(self):
+        """
+        Get sparse checkout patterns for the files this tool
+        reads in addition to the files being linted.
+
+        Returns None when the tool needs the whole repository.
+        """
+        if self.whole_project:
+            return None
+        paths = list(self.config_files)
+        for value in self.options.values():
+            if not isinstance(value, str):
+                continue
+            for candidate in commalist(value):
+                if candidate.startswith('./'):
+                    candidate = candidate[2:]
+                if (not candidate or candidate.startswith(('-', '/')) or
+                        '..' in candidate or ' ' in candidate):
+                    continue
+                paths.append('/' + escape_pattern(candidate))
+        return paths
 
     def execute_commits(self, commits):
         """
@@ -114,7 +354,8 @@ class Tool(object):
         if not num_files:
             return
         buildlog.info('Running fixer %s on %d files', self.name, num_files)
-        self.process_fixer(matching_files)
+        with metrics.span('fixer', tool=self.name):
+            self.process_fixer(matching_files)
 
     def has_fixer(self):
         """
@@ -213,7 +454,71 @@ def factory(config, problems, base_path):
     return tools
 
 
-def run(lint_tools, files, commits):
+def warm_up(config, base_path):
+    """
+    Check the docker images of the tools in a
+    lintreview.config.ReviewConfig are available.
+
+    This only needs the review config, and is run while the
+    repository is cloned. Failures are logged, as run() reports
+    problems with loading tools.
+    """
+    try:
+        lint_tools = factory(config, Problems(), base_path)
+    except Exception as e:
+        log.debug('Could not load tools to warm up. error=%s', e)
+        return
+    for tool in lint_tools:
+        try:
+            if not tool.check_dependencies():
+                log.warning('Docker image for %s is not available', tool.name)
+        except Exception as e:
+            log.warning('Could not check dependencies for %s. error=%s',
+                        tool.name, e)
+
+
+def checkout_paths(lint_tools, files):
+    """
+    Get the sparse checkout patterns needed to run `lint_tools`
+    on `files`.
+
+    Returns None when any tool needs the whole repository.
+    """
+    paths = set('/' + escape_pattern(f) for f in files)
+    for tool in lint_tools:
+        tool_paths = tool.checkout_paths()
+        if tool_paths is None:
+            log.debug('%s requires a full checkout', tool.name)
+            return None
+        paths.update(tool_paths)
+    return sorted(paths)
+
+
+def escape_pattern(path):
+    """
+    Escape a path so it is matched literally as a
+    sparse checkout pattern.
+    """
+    return re.sub(r'([\\*?\[!#])', r'\\\1', path)
+
+
+def blob_hash(path):
+    """
+    Get the git blob hash for the file at `path`.
+
+    Returns None if the file cannot be read.
+    """
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+    except (IOError, OSError):
+        return None
+    digest = hashlib.sha1(b'blob %d\0' % len(content))
+    digest.update(content)
+    return digest.hexdigest()
+
+
+def run(lint_tools, files, commits, workers=1, cache=None):
     """
     Create and run tools.
 
@@ -222,18 +527,72 @@ def run(lint_tools, files, commits):
 
     file paths are converted into docker paths as all
     tools run in docker containers.
+
+    When `workers` is greater than 1 tools are run concurrently
+    in a thread pool of that size. The buildlog output of each tool
+    is buffered and emitted in tool order as tools complete.
+
+    The optional `cache` is a lintreview.cache.ResultCache
+    used to skip files that have already been linted.
     """
     files = [docker.apply_base(f) for f in files]
 
     log.info('Running for %d files', len(files))
-    for tool in lint_tools:
-        previous_total = len(tool.problems)
-        version = _get_tool_version(tool)
-        if version:
-            buildlog.info('%s version is: %s', tool.name, version)
-        tool.execute(files)
-        tool.execute_commits(commits)
-        buildlog.info('%s added %s review notes', tool.name, len(tool.problems) - previous_total)
+    if workers <= 1 or len(lint_tools) <= 1:
+        for tool in lint_tools:
+            _run_tool(tool, files, commits, cache)
+        return
+
+    pool_size = min(workers, len(lint_tools))
+    log.info('Running %d tools with %d workers', len(lint_tools), pool_size)
+    with ThreadPoolExecutor(max_workers=pool_size) as executor:
+        futures = [
+            executor.submit(_run_tool_buffered, tool, files, commits, cache)
+            for tool in lint_tools
+        ]
+        for future in futures:
+            records, error = future.result()
+            for record in records:
+                buildlog.handle(record)
+            if error is not None:
+                raise error
+
+
+def _run_tool(tool, files, commits, cache=None):
+    previous_total = tool.problems.added_in_thread()
+    previous_dropped = tool.problems.dropped_in_thread()
+    version = _get_tool_version(tool)
+    if version:
+        buildlog.info('%s version is: %s', tool.name, version)
+    tool.execute(files, cache=cache)
+    tool.execute_commits(commits)
+    buildlog.info('%s added %s review notes',
+                  tool.name,
+                  tool.problems.added_in_thread() - previous_total)
+    dropped = tool.problems.dropped_in_thread() - previous_dropped
+    if dropped:
+        buildlog.info('%s dropped %s problems on unchanged lines',
+                      tool.name, dropped)
+        metrics.registry.inc(
+            metrics.DROPPED_PROBLEMS, dropped, (('tool', tool.name),))
+
+
+def _run_tool_buffered(tool, files, commits, cache=None):
+    """
+    Run a tool in a worker thread, holding back its buildlog output.
+
+    Returns a tuple of the captured log records and the
+    exception raised by the tool if any.
+    """
+    records = _buildlog_capture.start()
+    try:
+        _run_tool(tool, files, commits, cache)
+    except Exception as e:
+        log.exception('%s failed to run', tool.name)
+        return records, e
+    finally:
+        _buildlog_capture.stop()
+    return records, None
 
 
 def process_quickfix(problems, output, filename_converter, columns=3):
@@ -252,6 +611,10 @@ def process_quickfix(problems, output, filename_converter, columns=3):
 
     to be parsed.
     """
+    problems.add_batch(_quickfix_records(output, filename_converter, columns))
+
+
+def _quickfix_records(output, filename_converter, columns):
     for line in output:
         parts = line.split(':', columns)
         if len(parts) < columns:
@@ -263,22 +626,75 @@ def process_quickfix(problems, output, filename_converter, columns=3):
             log.info("Error parsing quickfix output. Dropping message=%s", line)
             continue
         filename = filename_converter(parts[0].strip())
-        problems.add(filename, lineno, message)
+        yield (filename, lineno, message)
 
 
-def _parse_xml(xml):
-    if not xml:
-        # Some tools return "" if no errors are found
-        return
+# Size of the chunks fed to the XML parser.
+XML_CHUNK_SIZE = 64 * 1024
+
+
+def _xml_chunks(xml):
+    """Split XML in a string, bytes, file-like object or
+    iterable of lines into chunks for an incremental parser.
+
+    File-like objects are read in fixed size chunks, as they
+    can hold a report on a single line.
+    """
+    if isinstance(xml, (str, bytes)):
+        for i in range(0, len(xml), XML_CHUNK_SIZE):
+            yield xml[i:i + XML_CHUNK_SIZE]
+    elif hasattr(xml, 'read'):
+        while True:
+            chunk = xml.read(XML_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    elif isinstance(xml, Iterable):
+        for line in xml:
+            newline = b'\n' if isinstance(line, bytes) else '\n'
+            if not line.endswith(newline):
+                line += newline
+            yield line
+
+
+def _iter_xml(xml, tag):
+    """Parse XML incrementally and yield the `tag` elements that
+    are children of the root element as they are completed.
+
+    Elements are cleared once they have been consumed so memory
+    use doesn't grow with the size of the document.
+    If the output is malformed XML an error will be raised.
+    """
+    parser = ElementTree.XMLPullParser(events=('start', 'end'))
+    head = tail = None
+    root = None
+    depth = 0
     try:
-        return ElementTree.fromstring(xml)
-    except Exception:
-        if len(xml) > 8192:
-            head = xml[0:250].encode('utf-8')
-            tail = xml[-250:].encode('utf-8')
-            log.error("Unable to parse XML head=%s, tail=%s", head, tail)
-        else:
-            log.error('Unable to parse XML %s', xml.encode('utf-8'))
+        for chunk in _xml_chunks(xml):
+            if not chunk:
+                continue
+            if head is None:
+                head = chunk[0:250]
+                tail = chunk[0:0]
+            tail = (tail + chunk)[-250:]
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth == 1 and elem.tag == tag:
+                    yield elem
+                    elem.clear()
+                    root.clear()
+        if head is None:
+            # Some tools return "" if no errors are found
+            return
+        parser.close()
+    except ElementTree.ParseError:
+        log.error("Unable to parse XML head=%s, tail=%s", head, tail)
         raise
 
 
@@ -286,12 +702,16 @@ def process_checkstyle(problems, xml, filename_converter):
     """
     Process a checkstyle XML file.
 
-    If the output is not XML or is malformed XML an error will be raised.
+    `xml` can be a string, bytes, a file-like object or an iterable
+    of lines. It is parsed incrementally, one file at a time.
+    If the output is not XML or is malformed XML an error will be raised,
+    and none of the problems in the file will be added.
     """
-    tree = _parse_xml(xml)
-    if tree is None or len(tree) == 0:
-        return
-    for f in tree.findall('file'):
+    problems.add_batch(_checkstyle_records(xml, filename_converter))
+
+
+def _checkstyle_records(xml, filename_converter):
+    for f in _iter_xml(xml, 'file'):
         filename = f.get('name')
         if filename_converter:
             filename = filename_converter(filename)
@@ -312,16 +732,19 @@ def process_checkstyle(problems, xml, filename_converter):
                     "Dropping message=%s line=%s"
                     "Error was %s", message, line, e)
             for line in lines:
-                problems.add(filename, line, message)
+                yield (filename, line, message)
 
 
 def process_pmd(problems, xml, filename_converter):
     """Process a PMD XML file.
+
+    `xml` is parsed incrementally in the same way as process_checkstyle()
     """
-    tree = _parse_xml(xml)
-    if len(tree) == 0:
-        return
-    for f in tree.findall('file'):
+    problems.add_batch(_pmd_records(xml, filename_converter))
+
+
+def _pmd_records(xml, filename_converter):
+    for f in _iter_xml(xml, 'file'):
         filename = f.get('name')
         if filename_converter:
             filename = filename_converter(filename)
@@ -334,12 +757,13 @@ def process_pmd(problems, xml, filename_converter):
                     'See: %s' % err.get('externalInfoUrl') if err.get('externalInfoUrl') else None,
                 ]
                 message = ' '.join(filter(None, message_parts))
-                problems.add(filename, line, message)
             except Exception:
                 log.info(
                     'Could not parse pmd output. '
                     'Dropping violation=%s',
                     ElementTree.tostring(err))
+                continue
+            yield (filename, line, message)
 
 
 def stringify(value):
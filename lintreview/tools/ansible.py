@@ -11,6 +11,7 @@ log = logging.getLogger(__name__)
 class Ansible(Tool):
 
     name = 'ansible'
+    config_files = ('.ansible-lint',)
 
     def version(self):
         output = docker.run('python3', ['ansible-lint', '--version'], self.base_path)
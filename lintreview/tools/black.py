@@ -8,6 +8,7 @@ from lintreview.tools import Tool, extract_version
 class Black(Tool):
 
     name = 'black'
+    config_files = ('pyproject.toml',)
 
     def version(self):
         output = docker.run('python3', ['black', '--version'], self.base_path)
@@ -22,6 +22,7 @@ class Checkstyle(Tool):
     """
 
     name = 'checkstyle'
+    config_files = ('checkstyle*.xml', 'suppressions*.xml')
 
     def version(self):
         output = docker.run('checkstyle', ['checkstyle', '--version'], self.base_path)
@@ -7,6 +7,7 @@ from lintreview.tools import Tool, process_quickfix, extract_version
 class Credo(Tool):
 
     name = 'credo'
+    config_files = ('.credo.exs',)
 
     def version(self):
         output = docker.run('credo', ['mix', 'credo', '--version'], self.base_path)
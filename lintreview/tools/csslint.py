@@ -8,6 +8,7 @@ from lintreview.tools import Tool, stringify, extract_version
 class Csslint(Tool):
 
     name = 'csslint'
+    config_files = ('.csslintrc',)
 
     def version(self):
         output = docker.run('nodejs', ['csslint', '--version'], self.base_path)
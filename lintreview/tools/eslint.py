@@ -13,6 +13,7 @@ buildlog = logging.getLogger('buildlog')
 class Eslint(Tool):
 
     name = 'eslint'
+    config_files = ('.eslintrc*', '.eslintignore', 'package.json')
     custom_image = None
 
     def version(self):
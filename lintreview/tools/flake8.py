@@ -16,6 +16,7 @@ buildlog = logging.getLogger('buildlog')
 class Flake8(Tool):
 
     name = 'flake8'
+    config_files = ('.flake8', 'setup.cfg', 'tox.ini')
     custom_image = None
 
     # see: http://flake8.readthedocs.org/en/latest/config.html
@@ -69,11 +70,12 @@ class Flake8(Tool):
         command = self.make_command(files)
         image = self.get_image_name(files)
 
-        output = docker.run(image, command, source_dir=self.base_path)
+        output = docker.run(image, command, source_dir=self.base_path,
+                            stream=True)
 
         self._cleanup()
-        output = output.split("\n")
-        process_quickfix(self.problems, output, docker.strip_base)
+        with output:
+            process_quickfix(self.problems, output, docker.strip_base)
 
     def make_command(self, files):
         command = ['flake8']
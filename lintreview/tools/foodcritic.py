@@ -6,6 +6,7 @@ from lintreview.tools import Tool, extract_version
 class Foodcritic(Tool):
 
     name = 'foodcritic'
+    config_files = ('.foodcritic',)
 
     def version(self):
         output = docker.run('ruby2', ['foodcritic', '--version'], self.base_path)
@@ -16,6 +16,7 @@ class Golint(Tool):
     """
 
     name = 'golint'
+    whole_project = True
 
     def check_dependencies(self):
         """
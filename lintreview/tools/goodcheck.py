@@ -9,6 +9,7 @@ log = logging.getLogger(__name__)
 class Goodcheck(Tool):
 
     name = 'goodcheck'
+    config_files = ('goodcheck.yml',)
 
     def check_dependencies(self):
         """
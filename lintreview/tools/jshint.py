@@ -7,6 +7,7 @@ import lintreview.docker as docker
 class Jshint(Tool):
 
     name = 'jshint'
+    config_files = ('.jshintrc', '.jshintignore')
 
     def version(self):
         output = docker.run('nodejs', ['jshint', '--version'], self.base_path)
@@ -33,8 +34,10 @@ class Jshint(Tool):
         output = docker.run(
             'nodejs',
             command,
-            source_dir=self.base_path)
-        process_checkstyle(self.problems, output, False)
+            source_dir=self.base_path,
+            stream=True)
+        with output:
+            process_checkstyle(self.problems, output, False)
 
     def create_command(self, files):
         command = ['jshint', '--checkstyle-reporter']
@@ -31,9 +31,9 @@ class Jsonlint(Tool):
         output = docker.run(
             'python2',
             command,
-            source_dir=self.base_path)
-        if not output:
-            return False
-
-        output = output.split("\n")
-        process_quickfix(self.problems, output, docker.strip_base)
+            source_dir=self.base_path,
+            stream=True)
+        with output:
+            if not output:
+                return False
+            process_quickfix(self.problems, output, docker.strip_base)
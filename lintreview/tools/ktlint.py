@@ -7,6 +7,7 @@ from lintreview.tools import Tool, process_checkstyle, extract_version
 class Ktlint(Tool):
 
     name = 'ktlint'
+    config_files = ('.editorconfig',)
 
     def version(self):
         output = docker.run('ktlint', ['ktlint', '--version'], self.base_path)
@@ -33,8 +34,9 @@ class Ktlint(Tool):
         command = self._create_command()
         command += files
 
-        output = docker.run('ktlint', command, self.base_path)
-        process_checkstyle(self.problems, output, docker.strip_base)
+        output = docker.run('ktlint', command, self.base_path, stream=True)
+        with output:
+            process_checkstyle(self.problems, output, docker.strip_base)
 
     def _create_command(self):
         command = ['ktlint', '--color', '--reporter=checkstyle']
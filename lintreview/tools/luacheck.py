@@ -8,6 +8,7 @@ from lintreview.tools import Tool, process_quickfix, extract_version
 class Luacheck(Tool):
 
     name = 'luacheck'
+    config_files = ('.luacheckrc',)
 
     def version(self):
         output = docker.run('luacheck', ['luacheck', '--version'], self.base_path)
@@ -8,6 +8,9 @@ from lintreview.tools import Tool, process_quickfix, stringify, extract_version
 class Mypy(Tool):
 
     name = 'mypy'
+    whole_project = True
+    cache_dir = '/cache/mypy'
+    cache_args = ('--cache-dir', '/cache/mypy')
 
     def version(self):
         output = docker.run('python3', ['mypy', '--version'], self.base_path)
@@ -30,9 +33,13 @@ class Mypy(Tool):
         command = ['mypy', '--no-error-summary', '--show-absolute-path']
         if 'config' in self.options:
             command += ['--config-file', stringify(self.options.get('config'))]
+        cache = self.cache_mount()
+        if cache:
+            command += self.cache_args
         command += files
 
-        output = docker.run('python3', command, source_dir=self.base_path)
+        output = docker.run('python3', command, source_dir=self.base_path,
+                            cache=cache)
         if not output:
             return False
         output = output.strip().split("\n")
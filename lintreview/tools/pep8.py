@@ -6,6 +6,7 @@ from lintreview.tools import Tool, process_quickfix, python_image
 class Pep8(Tool):
 
     name = 'pep8'
+    config_files = ('.pep8', 'setup.cfg', 'tox.ini')
 
     AUTOPEP8_OPTIONS = [
         'exclude',
@@ -42,12 +43,12 @@ class Pep8(Tool):
         command += files
 
         image = python_image(self.options)
-        output = docker.run(image, command, source_dir=self.base_path)
-        if not output:
-            return False
-        output = output.split("\n")
-
-        process_quickfix(self.problems, output, docker.strip_base)
+        output = docker.run(image, command, source_dir=self.base_path,
+                            stream=True)
+        with output:
+            if not output:
+                return False
+            process_quickfix(self.problems, output, docker.strip_base)
 
     def has_fixer(self):
         """
@@ -26,6 +26,7 @@ OPTIONAL_PACKAGES = {
 class Phpcs(Tool):
 
     name = 'phpcs'
+    config_files = ('phpcs.xml', 'phpcs.xml.dist', '.phpcs.xml', '.phpcs.xml.dist')
     custom_image = None
 
     def version(self):
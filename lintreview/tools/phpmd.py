@@ -12,6 +12,7 @@ import lintreview.docker as docker
 class Phpmd(Tool):
 
     name = 'phpmd'
+    config_files = ('phpmd.xml', 'phpmd.xml.dist', 'ruleset.xml')
 
     def version(self):
         output = docker.run('php', ['phpmd', '--version'], self.base_path)
@@ -7,6 +7,7 @@ from lintreview.tools import Tool, process_quickfix, extract_version
 class Puppet(Tool):
 
     name = 'puppet-lint'
+    config_files = ('.puppet-lint.rc',)
 
     def version(self):
         output = docker.run('ruby2', ['puppet-lint', '--version'], self.base_path)
@@ -29,13 +30,12 @@ class Puppet(Tool):
         """
         command = self._create_command()
         command += files
-        output = docker.run('ruby2', command, self.base_path)
+        output = docker.run('ruby2', command, self.base_path, stream=True)
 
-        if not output:
-            return False
-
-        output = output.split("\n")
-        process_quickfix(self.problems, output, docker.strip_base)
+        with output:
+            if not output:
+                return False
+            process_quickfix(self.problems, output, docker.strip_base)
 
     def _create_command(self):
         command = ['puppet-lint']
@@ -16,6 +16,7 @@ class Py3k(Tool):
     """
 
     name = 'py3k'
+    config_files = ('pylintrc', '.pylintrc')
 
     def version(self):
         output = docker.run('python2', ['pylint', '--version'], self.base_path)
@@ -39,14 +40,13 @@ class Py3k(Tool):
         to save resources.
         """
         command = self.make_command(files)
-        output = docker.run('python2', command, self.base_path)
-        if not output:
-            return False
-
-        output = output.split("\n")
-        output = [line for line in output if not line.startswith("*********")]
-
-        process_quickfix(self.problems, output, docker.strip_base)
+        output = docker.run('python2', command, self.base_path, stream=True)
+        with output:
+            if not output:
+                return False
+            lines = (line for line in output
+                     if not line.startswith("*********"))
+            process_quickfix(self.problems, lines, docker.strip_base)
 
     def make_command(self, files):
         msg_template = '{path}:{line}:{column}:{msg_id} {msg}'
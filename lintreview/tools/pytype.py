@@ -13,6 +13,7 @@ buildlog = logging.getLogger('buildlog')
 class Pytype(Tool):
 
     name = 'pytype'
+    whole_project = True
 
     def version(self):
         output = docker.run('pytype', ['pytype', '--version'], self.base_path)
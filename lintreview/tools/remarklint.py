@@ -13,6 +13,7 @@ filename_pattern = re.compile(r'^[\S]+.*$')
 class Remarklint(Tool):
 
     name = 'remarklint'
+    config_files = ('.remarkrc*', '.remarkignore', 'package.json')
 
     def version(self):
         output = docker.run('nodejs', ['run-remark', '--version'], self.base_path)
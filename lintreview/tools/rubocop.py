@@ -8,6 +8,10 @@ from lintreview.tools import Tool, process_quickfix, extract_version
 class Rubocop(Tool):
 
     name = 'rubocop'
+    config_files = ('.rubocop*.yml',)
+    # The default cache location for the root user.
+    cache_dir = '/root/.cache/rubocop_cache'
+    cache_args = ('--cache', 'true')
 
     def version(self):
         output = docker.run('ruby2', ['rubocop', '--version'], self.base_path)
@@ -29,8 +33,11 @@ class Rubocop(Tool):
         Run code checks with rubocop
         """
         command = self._create_command()
+        cache = self.cache_mount()
+        if cache:
+            command += self.cache_args
         command += files
-        output = docker.run('ruby2', command, self.base_path)
+        output = docker.run('ruby2', command, self.base_path, cache=cache)
         if not output:
             return
         output = output.split("\n")
@@ -7,6 +7,7 @@ import lintreview.docker as docker
 class Sasslint(Tool):
 
     name = 'sasslint'
+    config_files = ('.sass-lint.yml', '.sasslintrc')
 
     def version(self):
         output = docker.run('nodejs', ['sass-lint', '--version'], self.base_path)
@@ -7,6 +7,7 @@ from lintreview.tools import Tool, process_checkstyle, extract_version
 class Shellcheck(Tool):
 
     name = 'shellcheck'
+    config_files = ('.shellcheckrc',)
 
     def version(self):
         output = docker.run('shellcheck', ['shellcheck', '--version'], self.base_path)
@@ -42,8 +43,10 @@ class Shellcheck(Tool):
         Run code checks with shellcheck.
         """
         command = self.create_command(files)
-        output = docker.run('shellcheck', command, self.base_path)
-        process_checkstyle(self.problems, output, docker.strip_base)
+        output = docker.run('shellcheck', command, self.base_path,
+                            stream=True)
+        with output:
+            process_checkstyle(self.problems, output, docker.strip_base)
         list(map(self.escape_backtick, self.problems))
 
     def escape_backtick(self, problem):
@@ -7,6 +7,7 @@ import lintreview.docker as docker
 class Standardjs(Tool):
 
     name = 'standardjs'
+    config_files = ('package.json',)
 
     def version(self):
         output = docker.run('nodejs', ['standard', '--version'], self.base_path)
@@ -8,6 +8,7 @@ import lintreview.docker as docker
 class Stylelint(Tool):
 
     name = 'stylelint'
+    config_files = ('.stylelintrc*', 'stylelint.config.js', '.stylelintignore', 'package.json')
 
     def version(self):
         output = docker.run('nodejs', ['stylelint', '--version'], self.base_path)
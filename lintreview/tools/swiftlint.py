@@ -8,6 +8,7 @@ from lintreview.tools import Tool, process_checkstyle, extract_version
 class Swiftlint(Tool):
 
     name = 'swiftlint'
+    config_files = ('.swiftlint.yml',)
 
     def version(self):
         output = docker.run('swiftlint', ['swiftlint', 'version'], self.base_path)
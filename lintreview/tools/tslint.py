@@ -9,6 +9,7 @@ import lintreview.docker as docker
 class Tslint(Tool):
 
     name = 'tslint'
+    config_files = ('tslint.json', 'tslint.yaml')
 
     def version(self):
         output = docker.run('nodejs', ['tslint', '--version'], self.base_path)
@@ -8,6 +8,7 @@ from lintreview.tools import Tool, process_quickfix, extract_version
 class Yamllint(Tool):
 
     name = 'yamllint'
+    config_files = ('.yamllint', '.yamllint.yaml', '.yamllint.yml')
 
     def version(self):
         output = docker.run('python2', ['yamllint', '--version'], self.base_path)
@@ -1,9 +1,12 @@
 import logging
 import pkg_resources
 
+import lintreview.metrics as metrics
+
 from flask import Flask, request, Response
 from lintreview.config import load_config
 from lintreview.github import get_repository, get_lintrc
+from lintreview.state import get_state_store
 from lintreview.tasks import process_pull_request
 
 config = load_config()
@@ -19,6 +22,21 @@ def ping():
     return "lint-review: %s pong\n" % (version,)
 
 
+@app.route("/metrics")
+def show_metrics():
+    """Expose review metrics in the prometheus text format.
+
+    Metrics collected by workers are read from METRICS_PATH.
+    """
+    collected = metrics.Registry()
+    path = app.config.get('METRICS_PATH')
+    if path:
+        collected.merge(metrics.load(path))
+    collected.merge(metrics.registry)
+    return Response(collected.render(),
+                    mimetype='text/plain; version=0.0.4')
+
+
 @app.route("/review/start", methods=["POST"])
 def start_review():
     event = request.headers.get('X-Github-Event')
@@ -33,6 +51,7 @@ def start_review():
         base_repo_url = pull_request["base"]["repo"]["git_url"]
         head_repo_url = pull_request["head"]["repo"]["git_url"]
         head_repo_ref = pull_request["head"]["ref"]
+        head_sha = pull_request["head"].get("sha")
         user = pull_request["base"]["repo"]["owner"]["login"]
         head_user = pull_request["head"]["repo"]["owner"]["login"]
         repo = pull_request["base"]["repo"]["name"]
@@ -61,7 +80,11 @@ def start_review():
         return Response(status=204)
     try:
         log.info("Scheduling pull request for %s/%s %s", user, repo, number)
-        process_pull_request.delay(user, repo, number, lintrc)
+        state = get_state_store(app.config)
+        if state and head_sha:
+            # Reviews of older heads will be skipped.
+            state.record_head(user, repo, number, head_sha)
+        process_pull_request.delay(user, repo, number, lintrc, head_sha)
     except Exception:
         log.error('Could not publish job to celery. Make sure its running.')
         return Response(status=500)
@@ -62,6 +62,96 @@ CELERY_ENABLE_UTC = True
 # directories to prevent collisions.
 WORKSPACE = env('LINTREVIEW_WORKSPACE', '/tmp/workspace')
 
+# The number of linters each celery worker can run concurrently.
+# Linters run in separate docker containers, so running them in parallel
+# reduces review time to roughly that of the slowest tool.
+TOOL_WORKERS = env('LINTREVIEW_TOOL_WORKERS', 1, int)
+
+# Path to a sqlite database used to cache linter results.
+# Results are stored per file, tool version and tool configuration
+# so unchanged files are not linted again when a pull request is updated.
+# Leave unset to disable the cache.
+RESULT_CACHE_PATH = env('LINTREVIEW_RESULT_CACHE_PATH', None)
+
+# The maximum size of cached results in bytes. The least
+# recently used results are removed when the cache is full.
+RESULT_CACHE_SIZE = env('LINTREVIEW_RESULT_CACHE_SIZE', 100 * 1024 * 1024, int)
+
+# Keep bare mirrors of reviewed repositories in this directory.
+# Pull requests are cloned using the mirror as a reference, so only
+# new objects are downloaded. Leave unset to disable mirrors.
+GIT_MIRROR_PATH = env('LINTREVIEW_GIT_MIRROR_PATH', None)
+
+# The maximum size of all mirrors in bytes. The least recently
+# used mirrors are removed when the limit is exceeded.
+GIT_MIRROR_MAX_SIZE = env('LINTREVIEW_GIT_MIRROR_MAX_SIZE', 10 * 1024 ** 3, int)
+
+# Only check out the changed files and the configuration files
+# linters need, using a shallow partial clone of the pull request head.
+# Linters that check the whole project will still get a full checkout.
+GIT_SPARSE_CHECKOUT = env('LINTREVIEW_GIT_SPARSE_CHECKOUT', False, bool)
+
+# Read pull request changes by diffing the cloned repository instead of
+# paging through the GitHub files API. Large pull requests need far fewer
+# API requests, and files the API omits patches for are reviewed.
+# Falls back to the API when the diff fails. Not used with sparse checkouts.
+GIT_LOCAL_DIFF = env('LINTREVIEW_GIT_LOCAL_DIFF', False, bool)
+
+# Path to a sqlite database shared by the webserver and workers that
+# tracks the newest commit of each pull request. Reviews of commits that
+# have been replaced by newer pushes are skipped or stopped early.
+# Leave unset to review every push.
+STATE_PATH = env('LINTREVIEW_STATE_PATH', None)
+
+# Only lint files that changed since the last completed review of a
+# pull request. Problems from the last review are reused for other files.
+# Requires STATE_PATH. Reviews use all files when the .lintrc
+# or linter configuration files change.
+INCREMENTAL_REVIEW = env('LINTREVIEW_INCREMENTAL_REVIEW', False, bool)
+
+# Drop problems on lines that were not changed as soon as tools report
+# them, instead of when the review is published. Reduces memory use
+# when tools report many problems in large files.
+FILTER_UNCHANGED_LINES = env('LINTREVIEW_FILTER_UNCHANGED_LINES', False, bool)
+
+# Path to a sqlite database where workers store timing metrics.
+# The webserver reads it to serve metrics at /metrics in the
+# prometheus text format. Leave unset to only expose metrics
+# collected by the webserver process.
+METRICS_PATH = env('LINTREVIEW_METRICS_PATH', None)
+
+# The maximum bytes of output read from a tool container. Output
+# beyond this is discarded and reported on the pull request.
+DOCKER_MAX_OUTPUT = env('LINTREVIEW_DOCKER_MAX_OUTPUT', 50 * 1024 * 1024, int)
+
+# The number of connections to the docker daemon each process keeps open.
+# Increase this when running many tools concurrently with TOOL_WORKERS.
+DOCKER_CLIENT_POOL_SIZE = env('LINTREVIEW_DOCKER_CLIENT_POOL_SIZE', 10, int)
+
+# Path to a sqlite database tracking docker volumes that keep tool caches,
+# like the mypy cache, between reviews. Volumes are kept per repository,
+# tool and tool version. Leave unset to disable cache volumes.
+DOCKER_CACHE_PATH = env('LINTREVIEW_DOCKER_CACHE_PATH', None)
+
+# The maximum size of all cache volumes in bytes. The least
+# recently used volumes are removed when the limit is exceeded.
+DOCKER_CACHE_MAX_SIZE = env('LINTREVIEW_DOCKER_CACHE_MAX_SIZE', 5 * 1024 ** 3, int)
+
+# Run tool commands in long lived containers with `docker exec`
+# instead of creating a new container for each command. Containers
+# are kept per image and pull request checkout, so they are only
+# reused within a review and are removed when the review completes.
+DOCKER_POOL_ENABLED = env('LINTREVIEW_DOCKER_POOL_ENABLED', False, bool)
+
+# The maximum number of pooled containers per image and checkout.
+DOCKER_POOL_SIZE = env('LINTREVIEW_DOCKER_POOL_SIZE', 2, int)
+
+# Pooled containers are replaced after running this many commands.
+DOCKER_POOL_MAX_USES = env('LINTREVIEW_DOCKER_POOL_MAX_USES', 50, int)
+
+# Pooled containers are removed after being idle for this many seconds.
+DOCKER_POOL_IDLE_TIMEOUT = env('LINTREVIEW_DOCKER_POOL_IDLE_TIMEOUT', 300, int)
+
 # This config file contains default settings for .lintrc
 # LINTRC_DEFAULTS = './lintrc_defaults.ini'
 
@@ -90,6 +180,31 @@ GITHUB_OAUTH_TOKEN = env('GITHUB_OAUTH_TOKEN', None)
 # Default Retry settings are used if no config is provided.
 GITHUB_CLIENT_RETRY_OPTIONS = env('GITHUB_CLIENT_RETRY_OPTIONS', None, json.loads)
 
+# Path to a sqlite database where the GitHub API rate limits are tracked.
+# Workers sharing the database pace their requests to stay within the
+# limits, giving priority to publishing reviews. Leave unset to disable.
+GITHUB_RATE_LIMIT_PATH = env('LINTREVIEW_GITHUB_RATE_LIMIT_PATH', None)
+
+# The maximum seconds a request will wait for the rate limit.
+GITHUB_RATE_LIMIT_MAX_WAIT = env('LINTREVIEW_GITHUB_RATE_LIMIT_MAX_WAIT', 60, int)
+
+# Path to a sqlite database used to cache GitHub API responses.
+# Cached responses are revalidated with conditional requests, which
+# don't count against the rate limit when nothing has changed.
+# Cached responses include private repository data and are stored
+# unencrypted, so only the lintreview user should be able to read
+# the directory holding the database.
+# Leave unset to disable the cache.
+GITHUB_CACHE_PATH = env('LINTREVIEW_GITHUB_CACHE_PATH', None)
+
+# The maximum size of cached GitHub responses in bytes. The least
+# recently used responses are removed when the cache is full.
+GITHUB_CACHE_SIZE = env('LINTREVIEW_GITHUB_CACHE_SIZE', 50 * 1024 * 1024, int)
+
+# The number of checkrun annotation chunks published concurrently.
+# The first chunk, which sets the conclusion, is always sent first.
+CHECKRUN_WORKERS = env('LINTREVIEW_CHECKRUN_WORKERS', 4, int)
+
 # Set to a path containing a custom CA bundle.
 # This is useful when you have github:enterprise on an internal
 # network with self-signed certificates.
@@ -14,7 +14,7 @@ setup(
                 "& a variety of code checking tools.",
     author="Mark Story",
     author_email="mark@mark-story.com",
-    packages=find_packages(exclude=['tests*']),
+    packages=find_packages(exclude=['tests*', 'benchmarks*']),
     entry_points={
         'console_scripts': [
             'lintreview = lintreview.cli:main',
@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+import lintreview.docker as docker
+from benchmarks import runner
+from benchmarks.fake_docker import FakeDocker
+from benchmarks.scenarios import Scenario
+
+
+class TestBenchmarks(TestCase):
+
+    def test_fake_docker(self):
+        original = docker.run
+        outputs = {'a.py': ['/src/a.py:1:1: E1 error']}
+        with FakeDocker(outputs) as fake:
+            assert docker.image_exists('python3')
+            output = docker.run('python3', ['flake8', '/src/a.py',
+                                            '/src/b.py'], '/tmp')
+            assert '/src/a.py:1:1: E1 error\n' == output
+            assert 1 == fake.runs
+        assert original == docker.run
+
+    def test_run_scenario(self):
+        scenario = Scenario(10)
+        assert 10 == len(scenario.pull_files)
+        assert 3 == len(scenario.comments)
+
+        result = runner.run_scenario(scenario)
+        assert 10 == result['files']
+        assert result['problems'] > result['comments'] > 0
+        assert set(runner.STAGES) == set(result['stages'])
+        for values in result['stages'].values():
+            assert values['seconds'] >= 0
+
+    def test_compare(self):
+        baseline = {'results': {'10': {'stages': {
+            'publish': {'seconds': 1.0, 'peak_bytes': 1000},
+            'parse_diff': {'seconds': 0.001},
+        }}}}
+        current = {'results': {'10': {'stages': {
+            'publish': {'seconds': 1.1, 'peak_bytes': 2000},
+            'parse_diff': {'seconds': 0.004},
+        }}}}
+        regressions = runner.compare(current, baseline, threshold=0.2)
+        assert 1 == len(regressions)
+        assert 'publish peak_bytes' in regressions[0]
+
+        assert [] == runner.compare(current, {'results': {}})
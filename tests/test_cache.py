@@ -0,0 +1,75 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from lintreview.cache import ResultCache, get_result_cache
+
+
+class TestResultCache(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'cache', 'results.db')
+
+    def test_get_result_cache(self):
+        assert get_result_cache({}) is None
+        assert get_result_cache({'RESULT_CACHE_PATH': ''}) is None
+
+        cache = get_result_cache({
+            'RESULT_CACHE_PATH': self.path,
+            'RESULT_CACHE_SIZE': 1024,
+        })
+        assert isinstance(cache, ResultCache)
+        assert 1024 == cache.max_size
+        assert os.path.exists(self.path)
+
+    def test_get__miss(self):
+        cache = ResultCache(self.path)
+        assert cache.get('nope') is None
+
+    def test_set_and_get(self):
+        cache = ResultCache(self.path)
+        cache.set('key', [[1, 'Bad things'], [4, 'Worse things']])
+        cache.set('empty', [])
+
+        assert [[1, 'Bad things'], [4, 'Worse things']] == cache.get('key')
+        assert [] == cache.get('empty')
+        assert 2 == len(cache)
+
+    def test_set__replace(self):
+        cache = ResultCache(self.path)
+        cache.set('key', [[1, 'Bad things']])
+        cache.set('key', [[2, 'Other things']])
+        assert [[2, 'Other things']] == cache.get('key')
+        assert 1 == len(cache)
+
+    def test_set__evicts_least_recently_used(self):
+        cache = ResultCache(self.path, max_size=50)
+        cache.set('first', [[1, 'a' * 10]])
+        cache.set('second', [[1, 'b' * 10]])
+        # Reading makes first more recently used.
+        cache.get('first')
+        cache.set('third', [[1, 'c' * 10]])
+
+        assert cache.get('second') is None
+        assert cache.get('first') is not None
+        assert cache.get('third') is not None
+
+    def test_size__running_total(self):
+        cache = ResultCache(self.path, max_size=50)
+        cache.set('first', [[1, 'a' * 10]])
+        assert 19 == cache.size()
+        cache.set('first', [[1, 'a' * 12]])
+        assert 21 == cache.size(), 'Replacing updates the total'
+        cache.set('second', [[1, 'b' * 10]])
+        cache.set('third', [[1, 'c' * 10]])
+        assert 38 == cache.size(), 'Evicted entries are subtracted'
+
+    def test_size__existing_database(self):
+        cache = ResultCache(self.path)
+        cache.set('first', [[1, 'a' * 10]])
+        with cache._connect() as db:
+            db.execute('DROP TABLE meta')
+
+        cache = ResultCache(self.path)
+        assert 19 == cache.size()
@@ -169,6 +169,57 @@ class ReviewConfigTest(TestCase):
         self.assertEqual(None, config.get('unknown'))
         self.assertEqual('default', config.get('unknown', 'default'))
 
+    def test_tool_workers(self):
+        config = build_review_config(simple_ini)
+        self.assertEqual(1, config.tool_workers())
+
+        config = build_review_config(simple_ini, {'TOOL_WORKERS': '4'})
+        self.assertEqual(4, config.tool_workers())
+
+        config = build_review_config(simple_ini, {'TOOL_WORKERS': 0})
+        self.assertEqual(1, config.tool_workers())
+
+    def test_checkrun_workers(self):
+        config = build_review_config(simple_ini)
+        self.assertEqual(4, config.checkrun_workers())
+
+        config = build_review_config(simple_ini, {'CHECKRUN_WORKERS': '8'})
+        self.assertEqual(8, config.checkrun_workers())
+
+        config = build_review_config(simple_ini, {'CHECKRUN_WORKERS': 0})
+        self.assertEqual(1, config.checkrun_workers())
+
+    def test_local_diff(self):
+        config = build_review_config(simple_ini)
+        self.assertFalse(config.local_diff())
+
+        config = build_review_config(simple_ini, {'GIT_LOCAL_DIFF': True})
+        self.assertTrue(config.local_diff())
+
+    def test_incremental_review(self):
+        config = build_review_config(simple_ini)
+        self.assertFalse(config.incremental_review())
+
+        config = build_review_config(simple_ini, {'INCREMENTAL_REVIEW': True})
+        self.assertTrue(config.incremental_review())
+
+    def test_filter_unchanged_lines(self):
+        config = build_review_config(simple_ini)
+        self.assertFalse(config.filter_unchanged_lines())
+
+        config = build_review_config(
+            simple_ini, {'FILTER_UNCHANGED_LINES': True})
+        self.assertTrue(config.filter_unchanged_lines())
+
+    def test_digest(self):
+        config = build_review_config(simple_ini)
+        other = build_review_config(simple_ini, {'TOOL_WORKERS': 4})
+        self.assertEqual(config.digest(), other.digest())
+
+        changed = build_review_config(simple_ini)
+        changed.update({'linters': {'phpcs': {'standard': 'PSR2'}}})
+        self.assertNotEqual(config.digest(), changed.digest())
+
     def test_summary_threshold__undefined(self):
         config = build_review_config(simple_ini)
         self.assertEqual(None, config.summary_threshold())
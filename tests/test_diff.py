@@ -1,10 +1,13 @@
+import io
 import re
 
 from unittest import TestCase
 from mock import patch
 
 from . import load_fixture, create_pull_files
-from lintreview.diff import DiffCollection, Diff, parse_diff, ParseError
+from lintreview.diff import (
+    DiffCollection, Diff, iter_diff, parse_diff, ParseError
+)
 
 
 class TestDiffCollection(TestCase):
@@ -78,6 +81,18 @@ class TestDiffCollection(TestCase):
         result = changes.get_files(ignore_patterns=ignore)
         self.assertEqual(expected, result)
 
+    def test_all_changes__indexed(self):
+        changes = parse_diff(self.two_files)
+        filename = 'Console/Command/Task/AssetBuildTask.php'
+
+        result = changes.all_changes(filename)
+        self.assertEqual(1, len(result))
+        self.assertEqual(filename, result[0].filename)
+        self.assertEqual([], changes.all_changes('nope.php'))
+
+        result.append('not a diff')
+        self.assertEqual(1, len(changes.all_changes(filename)))
+
     def test_has_line_changed__no_file(self):
         changes = parse_diff(self.two_files)
         self.assertFalse(changes.has_line_changed('derp', 99))
@@ -178,6 +193,36 @@ index fa9a814..769886c 100644
             parse_diff(data)
         self.assertIn('Could not parse', str(ctx.exception))
 
+    def test_parse_diff__stream(self):
+        expected = parse_diff(self.two_files)
+        for source in (io.StringIO(self.two_files),
+                       iter(self.two_files.splitlines(True)),
+                       io.BytesIO(self.two_files.encode('utf8'))):
+            out = parse_diff(source)
+            self.assertEqual(expected.get_files(), out.get_files())
+            for a, b in zip(expected, out):
+                self.assertEqual(a.patch, b.patch)
+
+    def test_iter_diff(self):
+        lines = iter(self.two_files.splitlines(True))
+        out = iter_diff(lines)
+        first = next(out)
+        self.assertEqual('Console/Command/Task/AssetBuildTask.php',
+                         first.filename)
+        assert len(list(lines)) > 0, 'Should not consume the whole input'
+
+    def test_line_positions(self):
+        changes = parse_diff(self.two_files)
+        filename = 'Console/Command/Task/AssetBuildTask.php'
+        lines = [117, 119, 1, 9999]
+        expected = dict(
+            (line, changes.line_position(filename, line)) for line in lines)
+        assert expected == changes.line_positions(filename, lines)
+        assert 5 == expected[117]
+        assert expected[1] is None
+
+        assert {1: None} == changes.line_positions('not there', [1])
+
     def test_first_changed_line(self):
         changes = parse_diff(self.two_files)
         filename = 'Console/Command/Task/AssetBuildTask.php'
@@ -322,6 +367,58 @@ class TestDiff(TestCase):
         self.assertEqual(len(diff.hunks), len(proto.hunks))
         self.assertEqual(diff.hunks[0].patch, proto.hunks[0].patch)
 
+    def test_construct_with_hunks_kwarg__unordered(self):
+        data = load_fixture('diff/intersecting_hunks_updated.txt')
+        proto = parse_diff(data)[0]
+        hunks = list(reversed(proto.hunks))
+
+        diff = Diff(None, proto.filename, None, hunks=hunks)
+        for line in range(1, 100):
+            self.assertEqual(proto.line_position(line),
+                             diff.line_position(line))
+            self.assertEqual(proto.has_line_changed(line),
+                             diff.has_line_changed(line))
+
+    def test_line_position__matches_hunks(self):
+        data = load_fixture('diff/intersecting_hunks_updated.txt')
+        diff = parse_diff(data)[0]
+        assert len(diff.hunks) > 1
+        for line in range(1, 100):
+            positions = [hunk.line_position(line) for hunk in diff.hunks]
+            expected = [p for p in positions if p]
+            self.assertEqual(expected[0] if expected else None,
+                             diff.line_position(line))
+            changed = any(hunk.has_line_changed(line) for hunk in diff.hunks)
+            self.assertEqual(changed, diff.has_line_changed(line))
+
+    def test_hunk_start_end(self):
+        diff = parse_diff(self.two_files)[0]
+        hunk = diff.hunks[0]
+        assert hunk.start <= min(hunk.added_lines())
+        assert hunk.end >= max(hunk.added_lines())
+
+    def test_hunk_parsing__lazy(self):
+        diff = parse_diff(self.two_files)[0]
+        hunk = diff.hunks[0]
+        assert hunk._added is None, 'Body should not be parsed yet'
+        assert hunk.has_line_changed(117)
+        assert hunk._added is not None
+
+    def test_hunk_parsing__runs(self):
+        body = ''.join('+line {}\n'.format(i) for i in range(10000))
+        patch = '@@ -1,0 +1,10000 @@\n' + body
+        diff = Diff(patch, 'generated.py', None)
+        hunk = diff.hunks[0]
+
+        self.assertEqual(1, hunk.first_added_line())
+        self.assertEqual(10000, len(hunk.added_lines()))
+        self.assertEqual(3, len(hunk._added), 'Should be a single run')
+        self.assertEqual(1, diff.line_position(1))
+        self.assertEqual(10000, diff.line_position(10000))
+        self.assertEqual(None, diff.line_position(10001))
+        self.assertEqual(patch, diff.patch)
+        assert not hasattr(hunk, '__dict__')
+
     def test_construct_with_empty_hunks_kwarg(self):
         diff = Diff(None, 'test.py', 'abc123', hunks=[])
         self.assertEqual(0, len(diff.hunks))
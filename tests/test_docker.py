@@ -1,4 +1,11 @@
+import os
+import shutil
+import tempfile
+import time
 from unittest import TestCase
+from docker.errors import APIError
+from mock import Mock, patch
+from requests.exceptions import ConnectionError, ReadTimeout
 
 import lintreview.docker as docker
 from tests import test_dir, requires_image
@@ -81,3 +88,315 @@ class TestDocker(TestCase):
             docker.run,
             'python2', cmd, test_dir, timeout=5
         )
+
+
+class TestContainerPool(TestCase):
+
+    def setUp(self):
+        patcher = patch('lintreview.docker._get_client')
+        self.client = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+        self.container = Mock(id='abc123', status='running')
+        self.client.containers.run.return_value = self.container
+        self.client.api.exec_create.return_value = {'Id': 'exec1'}
+        self.client.api.exec_start.side_effect = lambda *args, **kwargs: iter(
+            [(b'stdout\n', None), (None, b'stderr\n')])
+
+        docker.configure({
+            'DOCKER_POOL_ENABLED': True,
+            'DOCKER_POOL_SIZE': 1,
+            'DOCKER_POOL_MAX_USES': 2,
+        })
+        self.addCleanup(docker.configure, {})
+
+    def test_configure__disabled(self):
+        docker.configure({})
+        assert docker._pool is None
+
+    def test_run__reuses_container(self):
+        output = docker.run('python3', ['flake8', 'a.py'], '/tmp/src')
+        assert 'stderr\nstdout\n' == output
+
+        docker.run('python3', ['flake8', 'b.py'], '/tmp/src')
+        assert 1 == self.client.containers.run.call_count
+        self.client.containers.run.assert_called_with(
+            image='python3',
+            entrypoint=docker.ContainerPool.KEEPALIVE,
+            volumes={'/tmp/src': {'bind': '/src', 'mode': 'rw'}},
+            detach=True)
+        self.client.api.exec_create.assert_called_with(
+            'abc123',
+            ['flake8', 'b.py'],
+            stdout=True,
+            stderr=True,
+            environment=None,
+            workdir=None,
+            user='')
+
+    def test_run__separate_source_dirs(self):
+        docker.run('python3', ['flake8'], '/tmp/one')
+        docker.run('python3', ['flake8'], '/tmp/two')
+        assert 2 == self.client.containers.run.call_count
+
+    def test_run__recycles_after_max_uses(self):
+        for i in range(3):
+            docker.run('python3', ['flake8'], '/tmp/src')
+        assert 2 == self.client.containers.run.call_count
+        self.container.remove.assert_called_with(v=True, force=True)
+
+    def test_run__replaces_unhealthy_container(self):
+        docker.run('python3', ['flake8'], '/tmp/src')
+        self.container.status = 'exited'
+        docker.run('python3', ['flake8'], '/tmp/src')
+        assert 2 == self.client.containers.run.call_count
+        self.container.remove.assert_called()
+
+    def test_run__named_container_not_pooled(self):
+        self.container.logs.side_effect = lambda **kwargs: iter([b'output'])
+        docker.run('python3', ['flake8'], '/tmp/src', name='custom')
+        self.client.api.exec_create.assert_not_called()
+        self.container.wait.assert_called()
+        self.container.logs.assert_called_with(
+            stdout=True, stderr=False, stream=True)
+
+    def test_run__truncated(self):
+        docker.configure({
+            'DOCKER_POOL_ENABLED': True,
+            'DOCKER_MAX_OUTPUT': 10,
+        })
+        self.client.api.exec_start.side_effect = lambda *args, **kwargs: iter(
+            [(b'line one\n', None), (b'line two\n', None)])
+        output = docker.run('python3', ['flake8'], '/tmp/src')
+        assert 'line one\nl' == output
+        assert ['python3'] == docker.take_truncated()
+        assert [] == docker.take_truncated()
+
+        # The exec may still be running so the container is replaced.
+        self.container.remove.assert_called_with(v=True, force=True)
+
+    def test_run__stream(self):
+        output = docker.run('python3', ['flake8'], '/tmp/src', stream=True)
+        with output:
+            assert ['stderr', 'stdout'] == list(output)
+            assert 14 == len(output)
+            assert not output.truncated
+
+    def test_run__timeout_removes_container(self):
+        self.client.api.exec_start.side_effect = ReadTimeout('Timed out')
+        self.assertRaises(
+            docker.TimeoutError,
+            docker.run, 'python3', ['flake8'], '/tmp/src')
+        self.container.remove.assert_called_with(v=True, force=True)
+
+    def test_run__total_timeout(self):
+        def frames(*args, **kwargs):
+            while True:
+                time.sleep(0.02)
+                yield (b'still going\n', None)
+        self.client.api.exec_start.side_effect = frames
+        self.assertRaises(
+            docker.TimeoutError,
+            docker.run, 'python3', ['flake8'], '/tmp/src', timeout=0.05)
+        self.container.remove.assert_called_with(v=True, force=True)
+
+    def test_run__cache_volume(self):
+        cache = ('lintreview-cache-abc', '/cache/mypy')
+        docker.run('python3', ['mypy'], '/tmp/src', cache=cache)
+        docker.run('python3', ['mypy'], '/tmp/src')
+        assert 2 == self.client.containers.run.call_count, \
+            'Cache volumes use separate containers'
+        self.client.containers.run.assert_any_call(
+            image='python3',
+            entrypoint=docker.ContainerPool.KEEPALIVE,
+            volumes={
+                '/tmp/src': {'bind': '/src', 'mode': 'rw'},
+                'lintreview-cache-abc': {'bind': '/cache/mypy', 'mode': 'rw'},
+            },
+            detach=True)
+
+    def test_drain_pool(self):
+        docker.run('python3', ['flake8'], '/tmp/one')
+        docker.drain_pool('/tmp/two')
+        self.container.remove.assert_not_called()
+
+        docker.drain_pool('/tmp/one')
+        self.container.remove.assert_called_with(v=True, force=True)
+
+    def test_reap__idle_containers(self):
+        docker.run('python3', ['flake8'], '/tmp/src')
+        docker._pool.idle_timeout = -1
+        docker._pool.reap()
+        self.container.remove.assert_called_with(v=True, force=True)
+
+
+class TestCacheVolumes(TestCase):
+
+    def setUp(self):
+        patcher = patch('lintreview.docker._get_client')
+        self.client = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, True)
+        self.path = os.path.join(self.tmpdir, 'volumes.db')
+        docker.configure({'DOCKER_CACHE_PATH': self.path})
+        self.addCleanup(docker.configure, {})
+
+    def set_usage(self, **sizes):
+        self.client.df.return_value = {
+            'Volumes': [
+                {'Name': name, 'UsageData': {'Size': size, 'RefCount': refs}}
+                for name, (size, refs) in sizes.items()
+            ] + [{'Name': 'other', 'UsageData': {'Size': 100, 'RefCount': 0}}]
+        }
+
+    def test_configure(self):
+        assert docker.cache_enabled()
+        docker.configure({})
+        assert not docker.cache_enabled()
+        assert docker.cache_volume('repo', 'mypy', '1.0') is None
+
+    def test_cache_volume(self):
+        name = docker.cache_volume('repo', 'mypy', '1.0')
+        assert name.startswith(docker.CACHE_VOLUME_PREFIX)
+        assert name == docker.cache_volume('repo', 'mypy', '1.0')
+        assert name != docker.cache_volume('repo', 'mypy', '1.1')
+        assert name != docker.cache_volume('other', 'mypy', '1.0')
+
+    def test_run__cache_volume(self):
+        self.client.containers.run.return_value.logs.return_value = iter([])
+        cache = ('lintreview-cache-abc', '/cache/mypy')
+        docker.run('python3', ['mypy'], '/tmp/src', cache=cache)
+        volumes = self.client.containers.run.call_args[1]['volumes']
+        assert {'bind': '/cache/mypy', 'mode': 'rw'} == \
+            volumes['lintreview-cache-abc']
+
+    @patch('lintreview.docker.time.time')
+    def test_evict(self, now):
+        now.return_value = 1000
+        old = docker.cache_volume('repo', 'old', '1.0')
+        now.return_value = 2000
+        new = docker.cache_volume('repo', 'new', '1.0')
+
+        volumes = docker._cache_volumes
+        volumes.max_size = 150
+        self.set_usage(**{old: (100, 0), new: (100, 0)})
+        volumes.evict(force=True)
+        self.client.volumes.get.assert_called_once_with(old)
+        self.client.volumes.get.return_value.remove.assert_called_once_with()
+
+        # Forgotten volumes are not removed again.
+        self.client.volumes.get.reset_mock()
+        self.set_usage(**{new: (100, 0)})
+        volumes.evict(force=True)
+        self.client.volumes.get.assert_not_called()
+
+    def test_evict__in_use(self):
+        volume = docker.cache_volume('repo', 'mypy', '1.0')
+        docker._cache_volumes.max_size = 10
+        self.set_usage(**{volume: (100, 1)})
+        docker.evict_cache_volumes()
+        self.client.volumes.get.assert_not_called()
+
+    def test_evict__remove_error(self):
+        volume = docker.cache_volume('repo', 'mypy', '1.0')
+        docker._cache_volumes.max_size = 10
+        self.set_usage(**{volume: (100, 0)})
+        self.client.volumes.get.return_value.remove.side_effect = \
+            APIError('volume is in use')
+        docker.evict_cache_volumes()
+
+        self.client.volumes.get.reset_mock()
+        docker._cache_volumes.evict(force=True)
+        self.client.volumes.get.assert_called_with(volume)
+
+    def test_evict__interval(self):
+        self.set_usage()
+        docker.evict_cache_volumes()
+        docker.evict_cache_volumes()
+        assert 1 == self.client.df.call_count
+
+
+class TestContainerOutput(TestCase):
+
+    def test_iter(self):
+        output = docker.ContainerOutput()
+        output.write(b'one\ntw')
+        output.write(b'o\n\xe2\x98\xa0\n')
+        output.write(b'error\n', stderr=True)
+        assert ['error', 'one', 'two', u'\u2620'] == list(output)
+        assert 'error\none\ntwo\n\u2620\n' == output.read()
+        assert 18 == len(output)
+
+    def test_spool_to_disk(self):
+        output = docker.ContainerOutput()
+        line = b'x' * 99 + b'\n'
+        for i in range(docker.ContainerOutput.SPOOL_SIZE // 100 + 1):
+            output.write(line)
+        assert output._stdout._rolled
+        assert 'x' * 99 == next(iter(output))
+
+    def test_write__max_size(self):
+        output = docker.ContainerOutput(max_size=5)
+        assert output.write(b'abc')
+        assert not output.write(b'defg')
+        assert output.truncated
+        assert not output.write(b'more')
+        assert 'abcde' == output.read()
+        assert 5 == len(output)
+
+
+class TestClient(TestCase):
+
+    def setUp(self):
+        docker._reset_client()
+        self.addCleanup(docker._reset_client)
+
+    def test_get_client__shared(self):
+        client = docker._get_client()
+        assert client is docker._get_client()
+        assert isinstance(client.api, docker._APIClient)
+
+    def test_request_timeout(self):
+        client = docker._get_client()
+        default = {'timeout': client.api.timeout}
+        assert default == client.api._set_request_timeout({})
+
+        with docker._request_timeout(120):
+            assert {'timeout': 120} == client.api._set_request_timeout({})
+            assert {'timeout': 5} == client.api._set_request_timeout(
+                {'timeout': 5})
+            with docker._request_timeout(None):
+                assert {'timeout': None} == client.api._set_request_timeout({})
+            assert {'timeout': 120} == client.api._set_request_timeout({})
+
+        assert default == client.api._set_request_timeout({}), \
+            'Later requests should use the default timeout'
+
+    def test_get_client__new_client_after_fork(self):
+        client = docker._get_client()
+        with patch('os.getpid', return_value=-1):
+            assert client is not docker._get_client()
+
+    def test_get_client__pool_size(self):
+        docker.configure({'DOCKER_CLIENT_POOL_SIZE': 3})
+        self.addCleanup(docker.configure, {})
+        client = docker._get_client()
+        adapter = client.api._custom_adapter
+        assert isinstance(adapter, docker._UnixHTTPAdapter)
+        assert 3 == adapter.maxsize
+
+    def test_reconnect(self):
+        calls = []
+
+        @docker.reconnect
+        def operation():
+            calls.append(docker._get_client())
+            if len(calls) == 1:
+                raise ConnectionError('Daemon went away')
+            return 'done'
+
+        assert 'done' == operation()
+        assert 2 == len(calls)
+        assert calls[0] is not calls[1]
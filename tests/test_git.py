@@ -1,9 +1,13 @@
 import os
+import shutil
+import subprocess
+import tempfile
 import pytest
 from unittest import TestCase
 from mock import patch
 
 import lintreview.git as git
+from lintreview.diff import parse_diff
 from .test_github import config
 from . import (
     root_dir,
@@ -210,3 +214,237 @@ class TestGit(TestCase):
             f.write('skull and crossbones')
 
         git.destroy(clone_path)
+
+
+class TestGitLocal(TestCase):
+    """Tests that use a local repository instead of cloning from github"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmpdir, 'source')
+        self.mirrors = os.path.join(self.tmpdir, 'mirrors')
+        self.checkout = os.path.join(self.tmpdir, 'checkout')
+        self._git('init', '-q', self.source)
+        self.head = self._commit('first')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, True)
+
+    def _git(self, *args):
+        command = ['git', '-c', 'user.name=test', '-c', 'user.email=t@t']
+        output = subprocess.check_output(command + list(args))
+        return output.decode('utf8').strip()
+
+    def _commit(self, message):
+        with open(os.path.join(self.source, 'file.txt'), 'a') as f:
+            f.write(message + '\n')
+        self._git('-C', self.source, 'add', 'file.txt')
+        self._git('-C', self.source, 'commit', '-q', '-m', message)
+        return self._git('-C', self.source, 'rev-parse', 'HEAD')
+
+    def test_mirror_path(self):
+        res = git.mirror_path(
+            '/mirrors', 'https://github.com/markstory/lint-review.git')
+        self.assertEqual('/mirrors/github.com/markstory/lint-review.git', res)
+
+        res = git.mirror_path('/mirrors', 'https://github.com/markstory/lint')
+        self.assertEqual('/mirrors/github.com/markstory/lint.git', res)
+
+        res = git.mirror_path('/mirrors', 'https://github.com/../../etc')
+        assert res.startswith('/mirrors/github.com/')
+
+    def test_process__chdir(self):
+        cwd = os.getcwd()
+        with patch('lintreview.git.os.chdir') as chdir:
+            return_code, output = git._process(
+                ['git', 'rev-parse', 'HEAD'], chdir=self.source)
+        chdir.assert_not_called()
+        self.assertEqual(0, return_code)
+        self.assertEqual(self.head, output.strip())
+        self.assertEqual(cwd, os.getcwd())
+
+    def test_clone_or_update__mirror(self):
+        settings = {'GIT_MIRROR_PATH': self.mirrors}
+        git.clone_or_update(settings, self.source, self.checkout, self.head)
+
+        mirror = git.mirror_path(self.mirrors, self.source)
+        assert os.path.isdir(mirror)
+        assert git.exists(self.checkout)
+        alternates = os.path.join(
+            self.checkout, '.git', 'objects', 'info', 'alternates')
+        assert not os.path.exists(alternates), 'Should not borrow objects'
+
+        remote = self._git('-C', self.checkout, 'remote', 'get-url', 'origin')
+        self.assertEqual(self.source, remote)
+
+        shutil.rmtree(mirror)
+        self.assertEqual(
+            self.head, self._git('-C', self.checkout, 'rev-parse', 'HEAD'))
+        self._git('-C', self.checkout, 'fsck', '--connectivity-only')
+
+    def test_update_mirror__refs(self):
+        self._git('-C', self.source, 'tag', 'v1.0')
+        self._git('-C', self.source, 'update-ref', 'refs/pull/1/head', self.head)
+        mirror = git.update_mirror(
+            self.mirrors, 'https://example.com/repo', self.source)
+
+        refs = self._git('-C', mirror, 'for-each-ref', '--format=%(refname)')
+        assert 'refs/tags/v1.0' in refs.split()
+        assert any(ref.startswith('refs/heads/') for ref in refs.split())
+        assert 'refs/pull/1/head' not in refs, 'Should skip pull request refs'
+
+    def test_update_mirror__no_credentials(self):
+        url = 'https://example.com/repo'
+        mirror = git.update_mirror(self.mirrors, url, self.source)
+        self.assertEqual(
+            self.head, self._git('-C', mirror, 'rev-parse', 'HEAD'))
+
+        self._git('-C', mirror, 'remote', 'set-url', 'origin', self.source)
+        git.update_mirror(self.mirrors, url, self.source)
+        with open(os.path.join(mirror, 'config')) as f:
+            assert self.source not in f.read()
+        self.assertEqual(
+            url, self._git('-C', mirror, 'remote', 'get-url', 'origin'))
+
+    def test_clone_or_update__mirror_updated(self):
+        settings = {'GIT_MIRROR_PATH': self.mirrors}
+        git.clone_or_update(settings, self.source, self.checkout, self.head)
+        git.destroy(self.checkout)
+
+        head = self._commit('second')
+        git.clone_or_update(settings, self.source, self.checkout, head)
+
+        mirror = git.mirror_path(self.mirrors, self.source)
+        self.assertEqual(head, self._git('-C', mirror, 'rev-parse', 'HEAD'))
+        self.assertEqual(
+            head, self._git('-C', self.checkout, 'rev-parse', 'HEAD'))
+
+    def test_clone_or_update__sparse(self):
+        os.makedirs(os.path.join(self.source, 'lib', 'deep'))
+        os.makedirs(os.path.join(self.source, 'other'))
+        for name in ('lib/deep/a.py', 'lib/.eslintrc', 'other/b.py'):
+            with open(os.path.join(self.source, name), 'w') as f:
+                f.write(name)
+        self._git('-C', self.source, 'add', '.')
+        head = self._commit('second')
+        self._git('-C', self.source, 'config', 'uploadpack.allowFilter', 'true')
+
+        settings = {'GIT_SPARSE_CHECKOUT': True}
+        paths = ['/lib/deep/a.py', '.eslintrc']
+        git.clone_or_update(
+            settings, 'file://' + self.source, self.checkout, head, paths)
+
+        assert os.path.exists(os.path.join(self.checkout, 'file.txt'))
+        assert os.path.exists(os.path.join(self.checkout, 'lib/deep/a.py'))
+        assert os.path.exists(os.path.join(self.checkout, 'lib/.eslintrc'))
+        assert not os.path.exists(os.path.join(self.checkout, 'other'))
+        self.assertEqual(
+            head, self._git('-C', self.checkout, 'rev-parse', 'HEAD'))
+
+    def test_clone_or_update__sparse_disabled(self):
+        settings = {}
+        git.clone_or_update(
+            settings, self.source, self.checkout, self.head, ['/nothing'])
+        assert os.path.exists(os.path.join(self.checkout, 'file.txt'))
+        assert not os.path.exists(
+            os.path.join(self.checkout, '.git', 'info', 'sparse-checkout'))
+
+    def test_diff_lines(self):
+        with open(os.path.join(self.source, 'file.txt'), 'a') as f:
+            f.write('more\n')
+        lines = git.diff_lines(self.source)
+        assert not isinstance(lines, (list, str)), 'Should be lazy'
+
+        lines = list(lines)
+        assert lines[0].startswith('diff --git a/file.txt b/file.txt')
+        self.assertIn('+more\n', lines)
+        self.assertEqual(
+            git.diff(self.source), ''.join(lines))
+
+    def test_diff_lines__files(self):
+        with open(os.path.join(self.source, 'other.txt'), 'w') as f:
+            f.write('other\n')
+        self._git('-C', self.source, 'add', 'other.txt')
+        self._commit('second')
+        for name in ('file.txt', 'other.txt'):
+            with open(os.path.join(self.source, name), 'a') as f:
+                f.write('more\n')
+
+        lines = list(git.diff_lines(self.source, ['other.txt']))
+        assert lines[0].startswith('diff --git a/other.txt b/other.txt')
+        self.assertEqual(1, len([line for line in lines if line.startswith('diff')]))
+
+    def test_diff_lines__error(self):
+        with self.assertRaises(IOError):
+            list(git.diff_lines(self.tmpdir))
+
+    def test_diff_range_lines(self):
+        self._git('-C', self.source, 'checkout', '-q', '-b', 'feature')
+        head = self._commit('second')
+        self._git('-C', self.source, 'checkout', '-q', '-')
+        with open(os.path.join(self.source, 'other.txt'), 'w') as f:
+            f.write('other\n')
+        self._git('-C', self.source, 'add', 'other.txt')
+        self._git('-C', self.source, 'commit', '-q', '-m', 'base change')
+        base = self._git('-C', self.source, 'rev-parse', 'HEAD')
+
+        lines = git.diff_range_lines(self.source, base, head)
+        assert not isinstance(lines, (list, str)), 'Should be lazy'
+
+        changes = parse_diff(lines)
+        self.assertEqual(['file.txt'], changes.get_files())
+        self.assertTrue(changes.has_line_changed('file.txt', 2))
+        self.assertEqual(2, changes.line_position('file.txt', 2))
+
+    def test_diff_range_lines__missing_commit(self):
+        with self.assertRaises(IOError):
+            list(git.diff_range_lines(self.source, 'f' * 40, self.head))
+
+    def test_changed_files(self):
+        with open(os.path.join(self.source, 'other.txt'), 'w') as f:
+            f.write('other\n')
+        self._git('-C', self.source, 'add', 'other.txt')
+        head = self._commit('second')
+
+        result = git.changed_files(self.source, self.head, head)
+        self.assertEqual(['file.txt', 'other.txt'], sorted(result))
+        self.assertEqual([], git.changed_files(self.source, head, head))
+        with self.assertRaises(IOError):
+            git.changed_files(self.source, 'f' * 40, head)
+
+    def test_prune_mirrors(self):
+        old = git.update_mirror(self.mirrors, 'https://example.com/old', self.source)
+        new = git.update_mirror(self.mirrors, 'https://example.com/new', self.source)
+        os.utime(old + '.lock', (1, 1))
+
+        git.prune_mirrors(self.mirrors, 10 * 1024 ** 3)
+        assert os.path.isdir(old)
+
+        git.prune_mirrors(self.mirrors, 1)
+        assert not os.path.isdir(old), 'Oldest mirror should be removed'
+        assert not os.path.isdir(new)
+
+    def test_clone_or_update__prune_interval(self):
+        settings = {'GIT_MIRROR_PATH': self.mirrors, 'GIT_MIRROR_MAX_SIZE': 1}
+        with patch('lintreview.git.prune_mirrors') as prune:
+            git.clone_or_update(
+                settings, self.source, self.checkout, self.head)
+            git.destroy(self.checkout)
+            git.clone_or_update(
+                settings, self.source, self.checkout, self.head)
+        self.assertEqual(1, prune.call_count)
+
+        marker = os.path.join(self.mirrors, '.pruned')
+        os.utime(marker, (1, 1))
+        git.destroy(self.checkout)
+        with patch('lintreview.git.prune_mirrors') as prune:
+            git.clone_or_update(
+                settings, self.source, self.checkout, self.head)
+        prune.assert_called_with(self.mirrors, 1)
+
+    def test_prune_mirrors__skip_locked(self):
+        mirror = git.update_mirror(
+            self.mirrors, 'https://example.com/repo', self.source)
+        with git._lock(mirror, exclusive=False):
+            git.prune_mirrors(self.mirrors, 1)
+        assert os.path.isdir(mirror), 'Mirrors in use should be kept'
@@ -0,0 +1,141 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import responses
+
+import lintreview.github as github
+import lintreview.httpcache as httpcache
+from lintreview.cache import ResultCache
+from lintreview.ratelimit import RateLimitAdapter
+
+URL = 'https://api.github.com/repos/markstory/lint-test'
+
+
+class TestHttpCache(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'github.db')
+        self.config = {
+            'GITHUB_OAUTH_TOKEN': 'a-token',
+            'GITHUB_CACHE_PATH': self.path,
+        }
+
+    def test_get_http_cache(self):
+        assert httpcache.get_http_cache({}) is None
+        cache = httpcache.get_http_cache(self.config)
+        assert isinstance(cache, ResultCache)
+
+    def test_get_client(self):
+        gh = github.get_client(self.config)
+        adapter = gh.session.get_adapter('https://')
+        assert isinstance(adapter, httpcache.CachingAdapter)
+
+        self.config['GITHUB_RATE_LIMIT_PATH'] = os.path.join(
+            self.tmpdir, 'ratelimit.db')
+        gh = github.get_client(self.config)
+        adapter = gh.session.get_adapter('https://')
+        assert isinstance(adapter.adapter, RateLimitAdapter)
+
+    @responses.activate
+    def test_not_modified(self):
+        responses.add(
+            responses.GET, URL,
+            json={'name': 'lint-test'},
+            headers={'ETag': '"abc"', 'Link': '<next>; rel="next"'})
+        responses.add(
+            responses.GET, URL,
+            status=304,
+            headers={'ETag': '"abc"', 'X-RateLimit-Remaining': '10'})
+
+        gh = github.get_client(self.config)
+        first = gh.session.get(URL)
+        assert 200 == first.status_code
+        assert 'If-None-Match' not in responses.calls[0].request.headers
+
+        second = gh.session.get(URL)
+        assert '"abc"' == responses.calls[1].request.headers['If-None-Match']
+        assert 200 == second.status_code
+        assert {'name': 'lint-test'} == second.json()
+        assert '<next>; rel="next"' == second.headers['Link']
+        assert '10' == second.headers['X-RateLimit-Remaining']
+
+    @responses.activate
+    def test_last_modified(self):
+        modified = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        responses.add(
+            responses.GET, URL,
+            json={'name': 'lint-test'},
+            headers={'Last-Modified': modified})
+        responses.add(responses.GET, URL, status=304)
+
+        gh = github.get_client(self.config)
+        gh.session.get(URL)
+        response = gh.session.get(URL)
+        request = responses.calls[1].request
+        assert modified == request.headers['If-Modified-Since']
+        assert 'If-None-Match' not in request.headers
+        assert {'name': 'lint-test'} == response.json()
+
+    @responses.activate
+    def test_modified(self):
+        responses.add(
+            responses.GET, URL,
+            json={'name': 'lint-test'},
+            headers={'ETag': '"abc"'})
+        responses.add(
+            responses.GET, URL,
+            json={'name': 'updated'},
+            headers={'ETag': '"def"'})
+        responses.add(responses.GET, URL, status=304)
+
+        gh = github.get_client(self.config)
+        gh.session.get(URL)
+        assert {'name': 'updated'} == gh.session.get(URL).json()
+
+        response = gh.session.get(URL)
+        assert '"def"' == responses.calls[2].request.headers['If-None-Match']
+        assert {'name': 'updated'} == response.json()
+
+    @responses.activate
+    def test_uncacheable(self):
+        responses.add(responses.GET, URL, json={'name': 'lint-test'})
+        responses.add(
+            responses.POST, URL,
+            json={'name': 'lint-test'},
+            headers={'ETag': '"abc"'})
+
+        gh = github.get_client(self.config)
+        gh.session.get(URL)
+        gh.session.post(URL, json={})
+        gh.session.get(URL)
+        assert 'If-None-Match' not in responses.calls[2].request.headers
+        assert 0 == len(gh.session.get_adapter(URL).cache)
+
+    @responses.activate
+    def test_separate_credentials(self):
+        responses.add(
+            responses.GET, URL,
+            json={'name': 'lint-test'},
+            headers={'ETag': '"abc"'})
+
+        gh = github.get_client(self.config)
+        gh.session.get(URL)
+
+        self.config['GITHUB_OAUTH_TOKEN'] = 'other-token'
+        other = github.get_client(self.config)
+        other.session.get(URL)
+        assert 'If-None-Match' not in responses.calls[1].request.headers
+
+    @responses.activate
+    def test_token_not_stored(self):
+        responses.add(
+            responses.GET, URL,
+            json={'name': 'lint-test'},
+            headers={'ETag': '"abc"'})
+
+        gh = github.get_client(self.config)
+        gh.session.get(URL)
+        with open(self.path, 'rb') as f:
+            assert b'a-token' not in f.read()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+from unittest import TestCase
+from mock import patch
+
+import lintreview.metrics as metrics
+from lintreview.metrics import Registry
+
+
+class TestMetrics(TestCase):
+
+    def setUp(self):
+        metrics.registry.take()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'metrics.db')
+
+    def tearDown(self):
+        metrics.registry.take()
+
+    def test_span(self):
+        with metrics.span('clone') as span:
+            pass
+        assert span.elapsed >= 0
+
+        key = (metrics.STAGE_SECONDS, (('stage', 'clone'),))
+        buckets, total, count = metrics.registry.histograms[key]
+        assert 1 == count
+        assert [1] * len(metrics.BUCKETS) == buckets
+
+    def test_span__labels(self):
+        with metrics.span('tool', tool='flake8'):
+            pass
+        key = (metrics.STAGE_SECONDS, (('stage', 'tool'), ('tool', 'flake8')))
+        assert key in metrics.registry.histograms
+
+    def test_timed(self):
+        @metrics.timed('publish')
+        def publish(value):
+            return value * 2
+
+        assert 4 == publish(2)
+        key = (metrics.STAGE_SECONDS, (('stage', 'publish'),))
+        assert 1 == metrics.registry.histograms[key][2]
+
+    def test_record_container(self):
+        with metrics.span('tool', tool='flake8') as outer:
+            with metrics.span('container') as inner:
+                metrics.record_container(100)
+            metrics.record_container(50)
+        assert 2 == outer.containers
+        assert 150 == outer.output_bytes
+        assert 1 == inner.containers
+
+        key = (metrics.STAGE_OUTPUT_BYTES, (('stage', 'tool'), ('tool', 'flake8')))
+        assert 150 == metrics.registry.counters[key]
+
+    def test_review_totals(self):
+        with patch.object(metrics.buildlog, 'info') as info:
+            with metrics.review() as totals:
+                with metrics.span('clone'):
+                    metrics.record_container(10)
+        assert 1 == totals['containers']
+        assert 10 == totals['output_bytes']
+        assert 'clone' in totals['stages']
+        assert info.called
+        assert 'Review totals' in info.call_args[0][0]
+
+    def test_flush_and_load(self):
+        with metrics.span('clone'):
+            metrics.record_container(10)
+        metrics.flush(self.path)
+        assert {} == metrics.registry.histograms
+
+        with metrics.span('clone'):
+            pass
+        metrics.flush(self.path)
+
+        loaded = metrics.load(self.path)
+        key = (metrics.STAGE_SECONDS, (('stage', 'clone'),))
+        assert 2 == loaded.histograms[key][2]
+        key = (metrics.STAGE_CONTAINERS, (('stage', 'clone'),))
+        assert 1 == loaded.counters[key]
+
+    def test_load__missing(self):
+        loaded = metrics.load(self.path)
+        assert {} == loaded.histograms
+
+    def test_render(self):
+        registry = Registry()
+        registry.observe('req_seconds', 0.3, (('stage', 'a"b'),))
+        registry.inc('req_total', 2, (('stage', 'clone'),))
+        output = registry.render()
+
+        assert '# TYPE req_seconds histogram' in output
+        assert 'req_seconds_bucket{stage="a\\"b",le="0.25"} 0' in output
+        assert 'req_seconds_bucket{stage="a\\"b",le="0.5"} 1' in output
+        assert 'req_seconds_bucket{stage="a\\"b",le="+Inf"} 1' in output
+        assert 'req_seconds_count{stage="a\\"b"} 1' in output
+        assert '# TYPE req_total counter' in output
+        assert 'req_total{stage="clone"} 2' in output
@@ -1,11 +1,12 @@
 from unittest import TestCase
-from mock import patch, sentinel, ANY
+from mock import patch, sentinel, ANY, Mock
 import json
 import responses
 
 from lintreview.config import build_review_config
 from lintreview.diff import DiffCollection
 from lintreview.processor import Processor
+from lintreview.review import IssueComment
 from lintreview.fixers.error import ConfigurationError, WorkflowError
 
 from . import load_fixture, test_dir, requires_image, fixer_ini, create_repo
@@ -44,6 +45,99 @@ class TestProcessor(TestCase):
         assert isinstance(subject._changes, DiffCollection)
         assert 1 == len(subject._changes), 'File count is wrong'
 
+    @responses.activate
+    @patch('lintreview.processor.git')
+    def test_load_changes__local_diff(self, git):
+        repo = create_repo()
+        pull = repo.pull_request(1)
+        diff = load_fixture('diff/one_file_pull_request.txt')
+        git.exists.return_value = True
+        git.diff_range_lines.return_value = iter(diff.splitlines(True))
+
+        config = build_review_config('', app_config)
+        api = Processor(repo, pull, './tests', config)
+        api.load_changes()
+        assert not git.diff_range_lines.called
+
+        config = build_review_config('', dict(app_config, GIT_LOCAL_DIFF=True))
+        subject = Processor(repo, pull, './tests', config)
+        calls = len(responses.calls)
+        subject.load_changes()
+
+        git.diff_range_lines.assert_called_with('./tests', pull.base, pull.head)
+        assert calls == len(responses.calls), 'No API requests made'
+        filename = 'View/Helper/AssetCompressHelper.php'
+        assert [filename] == subject._changes.get_files()
+        for line in range(451, 470):
+            self.assertEqual(
+                api._changes.line_position(filename, line),
+                subject._changes.line_position(filename, line))
+
+    @responses.activate
+    @patch('lintreview.processor.git')
+    def test_load_changes__local_diff_error(self, git):
+        repo = create_repo()
+        pull = repo.pull_request(1)
+        git.exists.return_value = True
+        git.diff_range_lines.side_effect = IOError('bad object')
+
+        config = build_review_config('', dict(app_config, GIT_LOCAL_DIFF=True))
+        subject = Processor(repo, pull, './tests', config)
+        subject.load_changes()
+
+        assert git.diff_range_lines.called
+        assert 1 == len(subject._changes), 'Loaded from the API'
+
+    @responses.activate
+    def test_checkout_paths__no_changes(self):
+        repo = create_repo()
+        pull = repo.pull_request(1)
+
+        config = build_review_config('', app_config)
+        subject = Processor(repo, pull, './tests', config)
+        self.assertRaises(RuntimeError, subject.checkout_paths)
+
+    @responses.activate
+    def test_checkout_paths(self):
+        self.tool_patcher.stop()
+        repo = create_repo()
+        pull = repo.pull_request(1)
+
+        ini = """
+[tools]
+linters = phpcs
+
+[tool_phpcs]
+standard = ./test/phpcs.xml
+"""
+        config = build_review_config(ini, app_config)
+        subject = Processor(repo, pull, './tests', config)
+        subject.load_changes()
+        paths = subject.checkout_paths()
+        self.tool_patcher.start()
+
+        assert '/View/Helper/AssetCompressHelper.php' in paths
+        assert '/test/phpcs.xml' in paths
+        assert 'phpcs.xml' in paths
+
+    @responses.activate
+    def test_checkout_paths__import_error(self):
+        self.tool_patcher.stop()
+        repo = create_repo()
+        pull = repo.pull_request(1)
+
+        ini = """
+[tools]
+linters = nope
+"""
+        config = build_review_config(ini, app_config)
+        subject = Processor(repo, pull, './tests', config)
+        subject.load_changes()
+        paths = subject.checkout_paths()
+        self.tool_patcher.start()
+
+        assert paths is None
+
     @responses.activate
     def test_run_tools__no_changes(self):
         repo = create_repo()
@@ -75,6 +169,106 @@ linters = nope
         assert len(problems) == 1
         assert 'could not load linters' in problems[0].body
 
+    def _incremental_processor(self, changed, digest=None):
+        repo = create_repo()
+        pull = repo.pull_request(1)
+        config = build_review_config('', app_config)
+        config.incremental_review = lambda: True
+
+        filename = 'View/Helper/AssetCompressHelper.php'
+        state = Mock()
+        state.last_review.return_value = (
+            'abc123',
+            digest or config.digest(),
+            {filename: [[454, 'Old problem']]})
+        tool = Mock(whole_project=False)
+        tool.checkout_paths.return_value = ['.eslintrc*', '/conf/lint.json']
+        self.tool_stub.factory.return_value = [tool]
+
+        subject = Processor(repo, pull, './tests', config, state=state)
+        subject.load_changes()
+        with patch('lintreview.processor.git.changed_files') as changed_files:
+            changed_files.return_value = changed
+            subject.run_tools()
+        return subject, state
+
+    @responses.activate
+    def test_run_tools__incremental(self):
+        subject, state = self._incremental_processor(['README.md'])
+        filename = 'View/Helper/AssetCompressHelper.php'
+
+        self.tool_stub.run.assert_called_with(
+            ANY, [], ANY, workers=1, cache=None)
+        result = subject.problems.all(filename)
+        self.assertEqual(1, len(result))
+        self.assertEqual('Old problem', result[0].body)
+
+        state.last_review.assert_called_with('markstory', 'lint-test', 1)
+        subject.record_review()
+        state.record_review.assert_called_with(
+            'markstory', 'lint-test', 1, ANY, ANY,
+            {filename: [[454, 'Old problem']]})
+
+    @responses.activate
+    def test_run_tools__incremental_tool_failure(self):
+        def run(*args, **kwargs):
+            problems = self.tool_stub.factory.call_args[0][1]
+            problems.add(IssueComment('Linter timed out'))
+        self.tool_stub.run.side_effect = run
+
+        subject, state = self._incremental_processor(['README.md'])
+        subject.record_review()
+        state.record_review.assert_not_called()
+
+    @responses.activate
+    def test_run_tools__incremental_import_error(self):
+        self.tool_stub.factory.side_effect = RuntimeError('nope')
+        subject, state = self._incremental_processor(['README.md'])
+        self.tool_stub.factory.side_effect = None
+
+        subject.record_review()
+        state.last_review.assert_not_called()
+        state.record_review.assert_not_called()
+
+    @responses.activate
+    def test_run_tools__incremental_fixers(self):
+        filename = 'View/Helper/AssetCompressHelper.php'
+        with patch.object(Processor, 'apply_fixers') as apply_fixers:
+            with patch('lintreview.config.ReviewConfig.fixers_enabled',
+                       return_value=True):
+                self._incremental_processor(['README.md'])
+            apply_fixers.assert_called_with(ANY, [])
+
+            with patch('lintreview.config.ReviewConfig.fixers_enabled',
+                       return_value=True):
+                self._incremental_processor([filename])
+            apply_fixers.assert_called_with(ANY, [filename])
+
+    @responses.activate
+    def test_run_tools__incremental_file_changed(self):
+        filename = 'View/Helper/AssetCompressHelper.php'
+        subject, state = self._incremental_processor([filename])
+
+        self.tool_stub.run.assert_called_with(
+            ANY, [filename], ANY, workers=1, cache=None)
+        self.assertEqual(0, len(subject.problems))
+
+    @responses.activate
+    def test_run_tools__incremental_config_changed(self):
+        filename = 'View/Helper/AssetCompressHelper.php'
+        for changed in (['web/.eslintrc.json'], ['conf/lint.json']):
+            self._incremental_processor(changed)
+            self.tool_stub.run.assert_called_with(
+                ANY, [filename], ANY, workers=1, cache=None)
+
+    @responses.activate
+    def test_run_tools__incremental_lintrc_changed(self):
+        filename = 'View/Helper/AssetCompressHelper.php'
+        self._incremental_processor(['README.md'], digest='old')
+
+        self.tool_stub.run.assert_called_with(
+            ANY, [filename], ANY, workers=1, cache=None)
+
     @responses.activate
     def test_run_tools__ignore_patterns(self):
         repo = create_repo()
@@ -90,7 +284,9 @@ linters = nope
         self.tool_stub.run.assert_called_with(
             ANY,
             [],
-            ANY
+            ANY,
+            workers=1,
+            cache=None
         )
 
     @responses.activate
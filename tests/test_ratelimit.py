@@ -0,0 +1,123 @@
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+import responses
+from mock import patch
+
+import lintreview.github as github
+import lintreview.ratelimit as ratelimit
+from lintreview.ratelimit import RateLimitStore
+
+
+class TestRateLimit(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'ratelimit.db')
+        self.store = RateLimitStore(self.path)
+
+    def test_priority(self):
+        assert ratelimit.PRIORITY_NORMAL == ratelimit.current_priority()
+        with ratelimit.priority(ratelimit.PRIORITY_HIGH):
+            with ratelimit.priority(ratelimit.PRIORITY_LOW):
+                assert ratelimit.PRIORITY_LOW == ratelimit.current_priority()
+            assert ratelimit.PRIORITY_HIGH == ratelimit.current_priority()
+        assert ratelimit.PRIORITY_NORMAL == ratelimit.current_priority()
+
+    def test_pacing_delay(self):
+        now = 1000.0
+        reset = now + 600
+        normal = ratelimit.PRIORITY_NORMAL
+
+        # Plenty remaining
+        assert 0 == ratelimit.pacing_delay(4000, 5000, reset, normal, now)
+
+        # Spread the remaining requests above the reserve until reset.
+        delay = ratelimit.pacing_delay(1100, 5000, reset, normal, now)
+        assert 1.0 == delay
+
+        # Low priority requests have a larger reserve.
+        low = ratelimit.pacing_delay(
+            1100, 5000, reset, ratelimit.PRIORITY_LOW, now)
+        assert 600 == low
+
+        # High priority requests can use the whole limit.
+        high = ratelimit.pacing_delay(
+            100, 5000, reset, ratelimit.PRIORITY_HIGH, now)
+        assert 6.0 == high
+
+        # Nothing left waits for the reset.
+        assert 600 == ratelimit.pacing_delay(0, 5000, reset, normal, now)
+        assert 0 == ratelimit.pacing_delay(0, 5000, now - 1, normal, now)
+
+    def test_store(self):
+        assert self.store.get('key') is None
+
+        reset = time.time() + 60
+        self.store.update('key', 10, 5000, reset)
+        assert (10, 5000, reset) == self.store.get('key')
+
+        self.store.update('key', 10, 5000, time.time() - 1)
+        assert self.store.get('key') is None
+
+    def test_get_rate_limit_store(self):
+        assert ratelimit.get_rate_limit_store({}) is None
+        store = ratelimit.get_rate_limit_store(
+            {'GITHUB_RATE_LIMIT_PATH': self.path})
+        assert isinstance(store, RateLimitStore)
+
+    def test_get_client(self):
+        gh = github.get_client({
+            'GITHUB_OAUTH_TOKEN': 'a-token',
+            'GITHUB_RATE_LIMIT_PATH': self.path,
+            'GITHUB_RATE_LIMIT_MAX_WAIT': 5,
+        })
+        adapter = gh.session.get_adapter('https://')
+        assert isinstance(adapter, ratelimit.RateLimitAdapter)
+        assert 5 == adapter.max_wait
+
+    @responses.activate
+    @patch('lintreview.ratelimit.time.sleep')
+    def test_adapter(self, sleep):
+        reset = int(time.time()) + 600
+        responses.add(
+            responses.GET,
+            'https://api.github.com/repos/markstory/lint-test',
+            json={},
+            headers={
+                'X-RateLimit-Remaining': '100',
+                'X-RateLimit-Limit': '5000',
+                'X-RateLimit-Reset': str(reset),
+            })
+        gh = github.get_client({
+            'GITHUB_OAUTH_TOKEN': 'a-token',
+            'GITHUB_RATE_LIMIT_PATH': self.path,
+        })
+        url = 'https://api.github.com/repos/markstory/lint-test'
+        gh.session.get(url)
+        sleep.assert_not_called()
+
+        # The limit is shared with other clients using the same token.
+        other = github.get_client({
+            'GITHUB_OAUTH_TOKEN': 'a-token',
+            'GITHUB_RATE_LIMIT_PATH': self.path,
+            'GITHUB_RATE_LIMIT_MAX_WAIT': 30,
+        })
+        other.session.get(url)
+        assert 1 == sleep.call_count
+        assert 30 == sleep.call_args[0][0]
+
+        with ratelimit.priority(ratelimit.PRIORITY_HIGH):
+            other.session.get(url)
+        assert 2 == sleep.call_count
+        assert sleep.call_args[0][0] < 10
+
+        # Other tokens have separate limits.
+        unrelated = github.get_client({
+            'GITHUB_OAUTH_TOKEN': 'other-token',
+            'GITHUB_RATE_LIMIT_PATH': self.path,
+        })
+        unrelated.session.get(url)
+        assert 2 == sleep.call_count
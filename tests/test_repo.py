@@ -198,6 +198,31 @@ class TestGithubPullRequest(TestCase):
             data=review)
         assert self.model._json.called
 
+    def test_data(self):
+        pull = GithubPullRequest(self.model)
+        data = pull.data
+        assert data is pull.data, 'Snapshot is reused'
+        assert 1 == data.number
+        assert 'a840e46033fab78c30fccb31d4d58dd0a8160d40' == data.head
+        assert 'master' == data.target_branch
+        assert data.from_private_fork is False
+        with self.assertRaises(AttributeError):
+            data.head = 'abc123'
+
+    def test_refresh(self):
+        fixture = load_fixture('pull_request.json')
+        data = json.loads(fixture)
+        data['head']['sha'] = 'abc123'
+        refreshed = PullRequest(data, self.session)
+        self.model.refresh = Mock(return_value=refreshed)
+
+        pull = GithubPullRequest(self.model)
+        assert 'a840e46033fab78c30fccb31d4d58dd0a8160d40' == pull.head
+
+        assert 'abc123' == pull.refresh().head
+        assert 'abc123' == pull.head
+        assert self.model.refresh.called
+
     def test_maintainer_can_modify__same_repo(self):
         pull = GithubPullRequest(self.model)
         self.assertEqual(True, pull.maintainer_can_modify)
@@ -261,6 +286,23 @@ class TestGithubPullRequest(TestCase):
         self.assertEqual('refs/pull/1/head', pull.head_branch)
 
 
+    def test_deleted_fork(self):
+        fixture = load_fixture('pull_request.json')
+        data = json.loads(fixture)
+        data['head']['repo'] = None
+        data['maintainer_can_modify'] = False
+
+        pull = GithubPullRequest(PullRequest(data, self.session))
+        self.assertEqual(1, pull.number)
+        self.assertEqual(data['head']['sha'], pull.head)
+        self.assertEqual(data['base']['sha'], pull.base)
+        self.assertEqual('master', pull.target_branch)
+        self.assertEqual('markstory/lint-test/pull/1', pull.display_name)
+        self.assertEqual(False, pull.from_private_fork)
+        self.assertEqual(False, pull.maintainer_can_modify)
+        self.assertEqual(data['base']['repo']['clone_url'], pull.clone_url)
+        self.assertEqual('refs/pull/1/head', pull.head_branch)
+
 @contextmanager
 def add_ok_label(pull_request, *labels, **kw):
     if labels:
@@ -1,5 +1,9 @@
 import json
+import requests
 import responses
+from github3.exceptions import GitHubException
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from mock import patch
 from unittest import TestCase
 
 from . import load_fixture, fixer_ini, create_repo
@@ -536,6 +540,108 @@ class TestReview(TestCase):
         assert 'log contents' in second_payload['output']['text']
         assert 20 == len(second_payload['output']['annotations'])
 
+    @responses.activate
+    @patch('lintreview.review.CHECKRUN_CHUNK_SIZE', 10)
+    def test_publish_as_checkrun__concurrent_chunks(self):
+        filename = "View/Helper/AssetCompressHelper.php"
+        errors = [
+            Comment(filename, 454 + i, 454 + i, 'Something worse {}'.format(i))
+            for i in range(0, 70)
+        ]
+        problems = Problems()
+        problems.set_changes(parse_diff(load_fixture('diff/long_diff.txt')))
+        problems.add_many(errors)
+
+        self.stub_comments()
+
+        run_url = 'https://api.github.com/repos/markstory/lint-test/check-runs/42'
+        responses.add(responses.PATCH, run_url, json={}, status=200)
+
+        repo = create_repo()
+        pull = repo.pull_request(1)
+        app_config = {
+            'GITHUB_OAUTH_TOKEN': config['GITHUB_OAUTH_TOKEN'],
+            'CHECKRUN_WORKERS': 3,
+        }
+        review_config = build_review_config(fixer_ini, app_config)
+        review = Review(repo, pull, review_config)
+        review.publish(problems, 42)
+
+        patches = [
+            json.loads(call.request.body)
+            for call in responses.calls
+            if call.request.method == 'PATCH'
+        ]
+        assert 7 == len(patches)
+        assert 'conclusion' in patches[0], 'First chunk has conclusion'
+        for payload in patches[1:]:
+            assert 'conclusion' not in payload
+        annotations = [
+            annotation['message']
+            for payload in patches
+            for annotation in payload['output']['annotations']
+        ]
+        assert 70 == len(annotations)
+        assert 70 == len(set(annotations))
+
+    def _publish_chunks(self, *responses_list):
+        filename = "View/Helper/AssetCompressHelper.php"
+        errors = [
+            Comment(filename, 454 + i, 454 + i, 'Something worse {}'.format(i))
+            for i in range(0, 70)
+        ]
+        problems = Problems()
+        problems.set_changes(parse_diff(load_fixture('diff/long_diff.txt')))
+        problems.add_many(errors)
+
+        self.stub_comments()
+
+        run_url = 'https://api.github.com/repos/markstory/lint-test/check-runs/42'
+        for kwargs in responses_list:
+            responses.add(responses.PATCH, run_url, **kwargs)
+
+        repo = create_repo()
+        pull = repo.pull_request(1)
+        app_config = {
+            'GITHUB_OAUTH_TOKEN': config['GITHUB_OAUTH_TOKEN'],
+        }
+        review_config = build_review_config(fixer_ini, app_config)
+        review = Review(repo, pull, review_config)
+        review.publish(problems, 42)
+        return run_url
+
+    @responses.activate
+    @patch('lintreview.review.time.sleep')
+    def test_publish_as_checkrun__retry_chunk(self, sleep):
+        refused = requests.exceptions.ConnectionError(MaxRetryError(
+            None, '/check-runs/42', NewConnectionError(None, 'refused')))
+        run_url = self._publish_chunks(
+            dict(json={}, status=200),
+            dict(body=refused),
+            dict(body=requests.exceptions.ConnectTimeout()),
+            dict(json={}, status=200))
+
+        responses.assert_call_count(run_url, 4)
+        self.assertEqual(2, sleep.call_count)
+        sleep.assert_called_with(2.0)
+        last_payload = json.loads(responses.calls[-1].request.body)
+        assert 20 == len(last_payload['output']['annotations'])
+
+    @responses.activate
+    @patch('lintreview.review.time.sleep')
+    def test_publish_as_checkrun__no_retry_after_sending(self, sleep):
+        errors = (
+            dict(json={}, status=502),
+            dict(body=requests.exceptions.ReadTimeout()),
+        )
+        for error in errors:
+            responses.reset()
+            with self.assertRaises(GitHubException):
+                self._publish_chunks(dict(json={}, status=200), error)
+            run_url = 'https://api.github.com/repos/markstory/lint-test/check-runs/42'
+            responses.assert_call_count(run_url, 2)
+        sleep.assert_not_called()
+
     @responses.activate
     def test_publish_as_checkrun__has_errors_force_success_status(self):
         app_config = {
@@ -642,6 +748,92 @@ class TestProblems(TestCase):
         expected = 'Tabs bad'
         self.assertEqual(expected, result[0].body)
 
+    def test_add_batch(self):
+        changes = parse_diff(self.two_files)
+        filename = 'Console/Command/Task/AssetBuildTask.php'
+        records = [
+            (filename, 117, 'Something bad'),
+            ('other.py', 3, 'Also bad'),
+            (filename, 117, 'Tabs bad'),
+            (filename, 117, 'Tabs bad'),
+            (filename, 119, 'More bad'),
+            (filename, 0, 'File level'),
+        ]
+        problems = Problems(changes=changes)
+        problems.add_batch(iter(records))
+
+        expected = Problems(changes=changes)
+        for record in records:
+            expected.add(*record)
+        self.assertEqual(4, len(problems))
+        self.assertEqual(expected.all(filename), problems.all(filename))
+        self.assertEqual(expected.all('other.py'), problems.all('other.py'))
+        self.assertEqual(4, problems.added_in_thread())
+        self.assertEqual(
+            [p.key() for p in expected.all()],
+            [p.key() for p in problems.all()],
+            'Should keep the order problems were reported in')
+
+        result = problems.all(filename)
+        self.assertEqual(5, result[0].position)
+        self.assertEqual('Something bad\nTabs bad', result[0].body)
+        self.assertEqual(Comment.FIRST_LINE_IN_DIFF, result[2].line)
+
+    def test_add_batch__no_changes(self):
+        self.problems.add('file.py', 10, 'Tabs bad')
+        self.problems.add_batch([
+            ('file.py', 10, 'Spaces are good'),
+            ('file.py', 11, 'Not good'),
+        ])
+        self.assertEqual(2, len(self.problems))
+        result = self.problems.all()
+        self.assertEqual('Tabs bad\nSpaces are good', result[0].body)
+        self.assertEqual(11, result[1].position)
+
+    def test_add__filter_changes(self):
+        changes = parse_diff(self.two_files)
+        filename = 'Console/Command/Task/AssetBuildTask.php'
+        problems = Problems(changes=changes, filter_changes=True)
+        problems.add(filename, 117, 'Changed line')
+        problems.add(filename, 1, 'Unchanged line')
+        problems.add('not in diff.py', 1, 'Not in diff')
+        problems.add(filename, Comment.FIRST_LINE_IN_DIFF, 'File level')
+        problems.add(IssueComment('General comment'))
+
+        self.assertEqual(2, problems.dropped_in_thread())
+        self.assertEqual(2, len(problems))
+        result = problems.all(filename)
+        self.assertEqual(117, result[0].line)
+        self.assertEqual('Changed line\nFile level', result[0].body)
+
+        problems.limit_to_changes()
+        self.assertEqual(2, len(problems))
+
+    def test_add_batch__filter_changes(self):
+        changes = parse_diff(self.two_files)
+        filename = 'Console/Command/Task/AssetBuildTask.php'
+        records = [
+            (filename, 117, 'Changed line'),
+            (filename, 1, 'Unchanged line'),
+            ('not in diff.py', 0, 'Not in diff'),
+            (filename, 0, 'File level'),
+        ]
+        problems = Problems(changes=changes, filter_changes=True)
+        problems.add_batch(records)
+        self.assertEqual(2, problems.dropped_in_thread())
+
+        expected = Problems(changes=changes, filter_changes=True)
+        for record in records:
+            expected.add(*record)
+        self.assertEqual(expected.all(), problems.all())
+
+    def test_add__filter_changes_without_changes(self):
+        problems = Problems(filter_changes=True)
+        problems.add('file.py', 10, 'Not good')
+        problems.add_batch([('file.py', 11, 'Not good')])
+        self.assertEqual(2, len(problems))
+        self.assertEqual(0, problems.dropped_in_thread())
+
     def test_add__with_diff_containing_block_offset(self):
         changes = parse_diff(self.block_offset)
 
@@ -693,6 +885,45 @@ class TestProblems(TestCase):
         assert 1 == self.problems.error_count()
         assert 2 == len(self.problems)
 
+    def test_remove(self):
+        self.problems.add('file.py', 10, 'Not good', 4)
+        self.problems.add('file.py', 11, 'Bad', 5)
+        self.problems.add(IssueComment('General'))
+
+        self.problems.remove(Comment('file.py', 10, 4, 'Different'))
+        self.assertEqual(3, len(self.problems))
+
+        self.problems.remove(Comment('file.py', 10, 4, 'Not good'))
+        self.assertEqual(2, len(self.problems))
+
+        self.problems.add('file.py', 12, 'Added later', 6)
+        self.problems.remove(Comment('file.py', 12, 6, 'Added later'))
+        self.assertEqual(2, len(self.problems))
+        self.assertEqual([], self.problems.all('nope.py'))
+
+    def test_remove__after_body_change(self):
+        self.problems.add('file.py', 10, 'Tabs bad', 4)
+        self.problems.remove(Comment('file.py', 10, 4, 'Nope'))
+        self.problems.add('file.py', 10, 'Spaces good', 4)
+
+        self.problems.remove(Comment('file.py', 10, 4, 'Tabs bad'))
+        self.assertEqual(1, len(self.problems))
+        self.problems.remove(Comment('file.py', 10, 4, 'Tabs bad\nSpaces good'))
+        self.assertEqual(0, len(self.problems))
+
+    def test_difference(self):
+        for i in range(0, 100):
+            self.problems.add('file.py', i, 'Problem {}'.format(i), i + 1)
+        existing = Problems()
+        for i in range(0, 100, 2):
+            existing.add('file.py', None, 'Problem {}'.format(i), i + 1)
+        existing.add('other.py', None, 'Problem 1', 2)
+
+        self.problems.difference(existing)
+        self.assertEqual(50, len(self.problems))
+        lines = [problem.line for problem in self.problems]
+        self.assertEqual(list(range(1, 100, 2)), lines)
+
     def test_limit_to_changes__remove_problems(self):
         changes = parse_diff(self.two_files)
 
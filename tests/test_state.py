@@ -0,0 +1,60 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from lintreview.state import StateStore, Superseded, get_state_store
+
+
+class TestStateStore(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'state', 'state.db')
+
+    def test_get_state_store(self):
+        assert get_state_store({}) is None
+        assert get_state_store({'STATE_PATH': ''}) is None
+
+        store = get_state_store({'STATE_PATH': self.path})
+        assert isinstance(store, StateStore)
+        assert os.path.exists(self.path)
+
+    def test_latest_head(self):
+        store = StateStore(self.path)
+        assert store.latest_head('markstory', 'lint-test', 1) is None
+
+        store.record_head('markstory', 'lint-test', 1, 'abc123')
+        store.record_head('markstory', 'lint-test', 1, 'def456')
+        store.record_head('markstory', 'lint-test', 2, 'fff000')
+        assert 'def456' == store.latest_head('markstory', 'lint-test', 1)
+        assert 'fff000' == store.latest_head('markstory', 'lint-test', 2)
+
+    def test_check_current(self):
+        store = StateStore(self.path)
+        # Nothing recorded, or no head to compare.
+        store.check_current('markstory', 'lint-test', 1, 'abc123')
+
+        store.record_head('markstory', 'lint-test', 1, 'abc123')
+        store.check_current('markstory', 'lint-test', 1, 'abc123')
+        store.check_current('markstory', 'lint-test', 1, None)
+
+        store.record_head('markstory', 'lint-test', 1, 'def456')
+        with self.assertRaises(Superseded) as ctx:
+            store.check_current('markstory', 'lint-test', 1, 'abc123')
+        self.assertIn('def456', str(ctx.exception))
+
+    def test_shared_between_instances(self):
+        StateStore(self.path).record_head('markstory', 'lint-test', 1, 'abc')
+        other = StateStore(self.path)
+        assert 'abc' == other.latest_head('markstory', 'lint-test', 1)
+
+    def test_record_review(self):
+        store = StateStore(self.path)
+        assert store.last_review('markstory', 'lint-test', 1) is None
+
+        files = {'a.py': [[1, 'Bad']], 'b.py': []}
+        store.record_review('markstory', 'lint-test', 1, 'abc', 'cfg', files)
+        head, config, result = store.last_review('markstory', 'lint-test', 1)
+        assert 'abc' == head
+        assert 'cfg' == config
+        assert files == result
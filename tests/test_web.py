@@ -1,4 +1,5 @@
 from lintreview import web
+import lintreview.metrics as metrics
 from mock import patch, Mock
 from unittest import TestCase
 import json
@@ -44,6 +45,15 @@ class WebTest(TestCase):
         self.assertEqual("lint-review: {} pong\n".format(web.version),
                          res.data.decode('utf-8'))
 
+    def test_metrics(self):
+        with metrics.span('clone'):
+            pass
+        res = self.app.get('/metrics')
+        self.assertEqual(200, res.status_code)
+        body = res.data.decode('utf-8')
+        self.assertIn('# TYPE lintreview_stage_seconds histogram', body)
+        self.assertIn('lintreview_stage_seconds_count{stage="clone"}', body)
+
     def test_start_request_no_get(self):
         res = self.app.get('/review/start')
         self.assertEqual(405, res.status_code)
@@ -137,3 +147,32 @@ linters = pep8"""
         self.assertTrue(task.delay.called, 'Process request should be called')
         self.assertEqual(204, res.status_code)
         self.assertEqual('', res.data.decode('utf-8'))
+
+    @patch('lintreview.web.get_state_store')
+    @patch('lintreview.web.get_repository')
+    @patch('lintreview.web.get_lintrc')
+    @patch('lintreview.web.process_pull_request')
+    def test_start_review_schedule_job__records_head(self, task, lintrc,
+                                                     get_repo, get_state):
+        get_repo.return_value = Mock()
+        state = Mock()
+        get_state.return_value = state
+        synchronize = test_data.copy()
+        synchronize['action'] = 'synchronize'
+        data = json.dumps(synchronize)
+
+        lintrc.return_value = """
+[tools]
+linters = pep8"""
+
+        res = self.app.post('/review/start',
+                            content_type='application/json',
+                            data=data,
+                            headers={
+                                'X-Github-Event': 'pull_request'
+                            })
+        self.assertEqual(204, res.status_code)
+        head = test_data['pull_request']['head']['sha']
+        state.record_head.assert_called_with('mark', 'testing', '3', head)
+        task.delay.assert_called_with(
+            'mark', 'testing', '3', lintrc.return_value, head)
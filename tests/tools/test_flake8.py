@@ -1,4 +1,8 @@
+import os
+import shutil
+import tempfile
 from unittest import TestCase
+from mock import patch
 
 from lintreview.review import Problems
 from lintreview.tools.flake8 import Flake8
@@ -20,6 +24,27 @@ class TestFlake8(TestCase):
     def test_version(self):
         assert self.tool.version() != ''
 
+    @patch('lintreview.tools._get_tool_version')
+    def test_cache_keys__config_files(self, version):
+        version.return_value = '3.7.9'
+        base_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_path, True)
+        os.mkdir(os.path.join(base_path, 'pkg'))
+        with open(os.path.join(base_path, 'pkg', 'a.py'), 'w') as f:
+            f.write('import os\n')
+
+        tool = Flake8(Problems(), {}, base_path)
+        files = ['/src/pkg/a.py']
+        original = tool.cache_keys(files)
+        assert original['/src/pkg/a.py']
+
+        for name in ('.flake8', 'setup.cfg', 'tox.ini'):
+            with open(os.path.join(base_path, name), 'w') as f:
+                f.write('[flake8]\nmax-line-length = 120\n')
+            keys = tool.cache_keys(files)
+            assert original != keys, 'Editing {} misses the cache'.format(name)
+            original = keys
+
     def test_match_file(self):
         self.assertFalse(self.tool.match_file('test.php'))
         self.assertFalse(self.tool.match_file('test.js'))
@@ -1,14 +1,24 @@
+import io
+import os
+import tempfile
+import time
+
 from unittest import TestCase
 from mock import Mock, patch
 
+import lintreview.docker as docker
+import lintreview.metrics as metrics
 import lintreview.tools as tools
+from lintreview.cache import ResultCache
 from lintreview.config import ReviewConfig, build_review_config
+from lintreview.diff import DiffCollection
 from lintreview.docker import TimeoutError
-from lintreview.review import Review, Problems, Comment
+from lintreview.review import Review, Problems, Comment, IssueComment
 from lintreview.tools import pep8, jshint
 from tests import root_dir, fixtures_path, requires_image
 
 import github3
+from xml.etree import ElementTree
 
 
 sample_ini = """
@@ -55,6 +65,20 @@ class TestFactory(TestCase):
         self.assertIsInstance(linters[0], pep8.Pep8)
         self.assertIsInstance(linters[1], jshint.Jshint)
 
+    @patch('lintreview.docker.image_exists')
+    def test_warm_up(self, image_exists):
+        image_exists.return_value = False
+        config = build_review_config(sample_ini)
+        with patch('lintreview.tools.log') as log:
+            tools.warm_up(config, '')
+        assert image_exists.called
+        assert 2 == log.warning.call_count
+
+    def test_warm_up__bad_linter(self):
+        config = ReviewConfig()
+        config.load_ini(bad_ini)
+        tools.warm_up(config, '')
+
 
 class TestToolBase(TestCase):
 
@@ -73,6 +97,32 @@ class TestToolBase(TestCase):
         tool = tools.Tool(problems, None)
         self.assertEqual(tool.options, {})
 
+    @patch('lintreview.docker.cache_volume')
+    @patch('lintreview.docker.cache_enabled')
+    def test_cache_mount(self, cache_enabled, cache_volume):
+        cache_enabled.return_value = True
+        cache_volume.return_value = 'lintreview-cache-abc'
+
+        tool = tools.Tool(Problems(), {}, '/workspace/user/repo/1')
+        assert tool.cache_mount() is None, 'No cache_dir declared'
+
+        class CachedTool(tools.Tool):
+            name = 'cached'
+            cache_dir = '/cache/tool'
+
+            def version(self):
+                return '1.2.3'
+
+        self.addCleanup(tools._version_cache.pop, 'cached', None)
+        tool = CachedTool(Problems(), {}, '/workspace/user/repo/1')
+        result = tool.cache_mount()
+        assert ('lintreview-cache-abc', '/cache/tool') == result
+        cache_volume.assert_called_with(
+            '/workspace/user/repo', 'cached', '1.2.3')
+
+        cache_enabled.return_value = False
+        assert tool.cache_mount() is None
+
     def test_tool_apply_base__no_base(self):
         problems = Problems()
         tool = tools.Tool(problems, {})
@@ -106,6 +156,40 @@ class TestToolBase(TestCase):
         result = tool.apply_base('../../../comments_current.json')
         self.assertEqual(result, 'comments_current.json')
 
+    def test_tool_checkout_paths(self):
+        problems = Problems()
+        options = {
+            'config': './config/lint.json',
+            'ignore': 'E501,W2',
+            'exclude': '../outside, /etc/passwd',
+            'flags': '--strict',
+            'fix': True,
+        }
+        tool = CachingTool(problems, options, fixtures_path)
+        result = tool.checkout_paths()
+        assert 'setup.cfg' in result
+        assert '/config/lint.json' in result
+        assert '/E501' in result
+        assert '/../outside' not in result
+        assert '/etc/passwd' not in result
+        assert '/--strict' not in result
+
+    def test_tool_checkout_paths__whole_project(self):
+        tool = CachingTool(Problems(), {}, fixtures_path)
+        tool.whole_project = True
+        assert tool.checkout_paths() is None
+
+    def test_checkout_paths(self):
+        tool = CachingTool(Problems(), {}, fixtures_path)
+        files = ['src/a.py', 'src/[weird]*.py']
+        result = tools.checkout_paths([tool], files)
+        self.assertEqual(
+            ['/src/\\[weird]\\*.py', '/src/a.py', 'setup.cfg'], result)
+
+        other = CachingTool(Problems(), {}, fixtures_path)
+        other.whole_project = True
+        assert tools.checkout_paths([tool, other], files) is None
+
     @requires_image('python2')
     def test_run(self):
         config = build_review_config(simple_ini)
@@ -142,6 +226,183 @@ class TestToolBase(TestCase):
         assert 'timed out during' in errors[0].body
         assert 'run pep8 linter' in errors[0].body
 
+    @patch('lintreview.docker.run')
+    def test_run_truncated_output(self, mock_docker):
+        def run(image, command, source_dir, **kwargs):
+            output = docker.ContainerOutput(max_size=100)
+            output.write(b'/src/tests/fixtures/pep8/has_errors.py:2:1: '
+                         b'E302 expected 2 blank lines\n' * 2)
+            docker._truncated().append(image)
+            return output
+        mock_docker.side_effect = run
+
+        config = build_review_config(simple_ini)
+        problems = Problems()
+        files = ['./tests/fixtures/pep8/has_errors.py']
+        tool_list = tools.factory(config, problems, root_dir)
+        tools.run(tool_list, files, [])
+
+        errors = problems.all()
+        assert 2 == len(errors)
+        assert 'E302 expected 2 blank lines' == errors[0].body
+        assert isinstance(errors[1], IssueComment)
+        assert 'pep8 linter was too large' in errors[1].body
+
+    @patch('lintreview.docker.run')
+    def test_run__workers(self, mock_docker):
+        problems = Problems()
+        tool_list = [
+            SlowTool(problems, {'name': 'first', 'line': 1, 'delay': 0.05}),
+            SlowTool(problems, {'name': 'second', 'line': 2}),
+        ]
+        files = ['a.py', 'b.py']
+        with self.assertLogs('buildlog', level='INFO') as logs:
+            tools.run(tool_list, files, [], workers=2)
+
+        assert 4 == len(problems)
+        messages = [line for line in logs.output if 'SlowTool' in line]
+        assert [
+            'INFO:buildlog:SlowTool first start',
+            'INFO:buildlog:SlowTool first done',
+            'INFO:buildlog:SlowTool second start',
+            'INFO:buildlog:SlowTool second done',
+        ] == messages
+        assert 'slow added 2 review notes' in logs.output[-1]
+
+    @patch('lintreview.docker.run')
+    def test_run__workers_error(self, mock_docker):
+        problems = Problems()
+        tool_list = [
+            SlowTool(problems, {'name': 'first', 'error': True}),
+            SlowTool(problems, {'name': 'second'}),
+        ]
+        self.assertRaises(ValueError,
+                          tools.run, tool_list, ['a.py'], [], workers=2)
+        assert 1 == len(problems)
+
+    def test_run__dropped_problems(self):
+        metrics.registry.take()
+        problems = Problems(changes=DiffCollection([]), filter_changes=True)
+        tool_list = [SlowTool(problems, {'name': 'first'})]
+        with self.assertLogs('buildlog', level='INFO') as logs:
+            tools.run(tool_list, ['a.py', 'b.py'], [])
+
+        assert 0 == len(problems)
+        assert 'INFO:buildlog:slow dropped 2 problems on unchanged lines' \
+            in logs.output
+        key = (metrics.DROPPED_PROBLEMS, (('tool', 'slow'),))
+        assert 2 == metrics.registry.take().counters[key]
+
+
+class TestToolCache(TestCase):
+
+    def setUp(self):
+        self.base_path = tempfile.mkdtemp()
+        self.cache = ResultCache(os.path.join(self.base_path, 'cache.db'))
+        for name in ('a.py', 'b.py'):
+            with open(os.path.join(self.base_path, name), 'w') as f:
+                f.write('import os\n')
+
+    def make_tool(self, problems, options=None):
+        tool = CachingTool(problems, options or {}, self.base_path)
+        tool.version = lambda: '1.0'
+        tools._version_cache.pop(tool.name, None)
+        return tool
+
+    def test_execute__cache_miss_then_hit(self):
+        problems = Problems()
+        tool = self.make_tool(problems)
+        tool.execute(['/src/a.py', '/src/b.py'], cache=self.cache)
+        assert ['/src/a.py', '/src/b.py'] == tool.processed
+        assert 2 == len(problems)
+        assert 2 == len(self.cache)
+
+        problems = Problems()
+        tool = self.make_tool(problems)
+        tool.execute(['/src/a.py', '/src/b.py'], cache=self.cache)
+        assert [] == tool.processed
+        assert 2 == len(problems)
+        errors = problems.all('a.py')
+        assert 1 == errors[0].line
+        assert 'Problem in a.py' == errors[0].body
+
+    def test_execute__changed_file_is_processed(self):
+        tool = self.make_tool(Problems())
+        tool.execute(['/src/a.py', '/src/b.py'], cache=self.cache)
+
+        with open(os.path.join(self.base_path, 'b.py'), 'w') as f:
+            f.write('import sys\n')
+        problems = Problems()
+        tool = self.make_tool(problems)
+        tool.execute(['/src/a.py', '/src/b.py'], cache=self.cache)
+        assert ['/src/b.py'] == tool.processed
+        assert 2 == len(problems)
+
+    def test_execute__options_change_key(self):
+        tool = self.make_tool(Problems())
+        tool.execute(['/src/a.py'], cache=self.cache)
+
+        tool = self.make_tool(Problems(), {'ignore': 'E501'})
+        tool.execute(['/src/a.py'], cache=self.cache)
+        assert ['/src/a.py'] == tool.processed
+
+    def test_execute__config_file_change_key(self):
+        config = os.path.join(self.base_path, 'setup.cfg')
+        with open(config, 'w') as f:
+            f.write('[flake8]\n')
+        tool = self.make_tool(Problems())
+        tool.execute(['/src/a.py'], cache=self.cache)
+
+        with open(config, 'w') as f:
+            f.write('[flake8]\nignore = E501\n')
+        tool = self.make_tool(Problems())
+        tool.execute(['/src/a.py'], cache=self.cache)
+        assert ['/src/a.py'] == tool.processed
+
+    def test_execute__issue_comments_not_cached(self):
+        problems = Problems()
+        tool = self.make_tool(problems, {'general': True})
+        tool.execute(['/src/a.py'], cache=self.cache)
+        assert 2 == len(problems)
+        assert 0 == len(self.cache)
+
+    def test_execute__whole_project_not_cached(self):
+        tool = self.make_tool(Problems())
+        tool.whole_project = True
+        tool.execute(['/src/a.py'], cache=self.cache)
+        assert 0 == len(self.cache)
+
+
+class CachingTool(tools.Tool):
+    name = 'cachingtool'
+    config_files = ('setup.cfg',)
+
+    def process_files(self, files):
+        self.processed = files
+        for f in files:
+            filename = docker.strip_base(f)
+            self.problems.add(filename, 1, 'Problem in ' + filename)
+        if self.options.get('general'):
+            self.problems.add(IssueComment('Config is weird'))
+
+    def execute(self, files, cache=None):
+        self.processed = []
+        super(CachingTool, self).execute(files, cache=cache)
+
+
+class SlowTool(tools.Tool):
+    name = 'slow'
+
+    def process_files(self, files):
+        name = self.options['name']
+        tools.buildlog.info('SlowTool %s start', name)
+        time.sleep(self.options.get('delay', 0))
+        if self.options.get('error'):
+            raise ValueError('Tool failure')
+        for f in files:
+            self.problems.add(f, self.options.get('line', 1), 'Problem from ' + name)
+        tools.buildlog.info('SlowTool %s done', name)
+
 
 class TestPythonImage(TestCase):
     def test(self):
@@ -217,6 +478,101 @@ class TestProcessCheckstyle(TestCase):
         assert errors[0].line == Comment.FIRST_LINE_IN_DIFF
         assert errors[0].body == 'Not good'
 
+    def test_process__bytes_and_streams(self):
+        xml = (b'<?xml version="1.0" encoding="utf-8"?>\n'
+               b'<checkstyle>\n'
+               b'<file name="things.py">\n'
+               b'<error line="1" message="Not good \xe2\x98\xa0" />\n'
+               b'</file>\n'
+               b'</checkstyle>\n')
+        sources = [
+            xml,
+            xml.decode('utf-8'),
+            io.BytesIO(xml),
+            xml.decode('utf-8').splitlines(),
+        ]
+        for source in sources:
+            problems = Problems()
+            tools.process_checkstyle(problems, source, lambda x: x)
+            things = problems.all('things.py')
+            assert 1 == len(things)
+            assert u'Not good ☠' == things[0].body
+
+    def test_process__chunked(self):
+        files = ''.join(
+            '<file name="file{0}.py"><error line="{0}" message="Bad" /></file>'
+            .format(i) for i in range(1, 5000))
+        xml = '<checkstyle>{}</checkstyle>'.format(files)
+        assert len(xml) > tools.XML_CHUNK_SIZE
+
+        problems = Problems()
+        tools.process_checkstyle(problems, xml, lambda x: x)
+        assert 4999 == len(problems)
+        assert 4999 == problems.all('file4999.py')[0].line
+
+    def test_process__chunked_stream(self):
+        files = ''.join(
+            '<file name="file{0}.py"><error line="{0}" message="Bad" /></file>'
+            .format(i) for i in range(1, 5000))
+        xml = '<checkstyle>{}</checkstyle>'.format(files).encode('utf-8')
+        reads = []
+
+        class Report(io.BytesIO):
+            def read(self, size=-1):
+                reads.append(size)
+                return super(Report, self).read(size)
+
+            def __iter__(self):
+                raise AssertionError('Should not read by line')
+
+        problems = Problems()
+        tools.process_checkstyle(problems, Report(xml), lambda x: x)
+        assert 4999 == len(problems)
+        assert len(reads) > 2
+        assert all(size == tools.XML_CHUNK_SIZE for size in reads)
+
+    def test_process__empty(self):
+        problems = Problems()
+        tools.process_checkstyle(problems, '', lambda x: x)
+        tools.process_checkstyle(problems, [], lambda x: x)
+        assert 0 == len(problems)
+
+    def test_process__malformed(self):
+        problems = Problems()
+        xml = '<checkstyle><file name="a.py"><error line="1" message="Bad" />'
+        with self.assertRaises(ElementTree.ParseError):
+            tools.process_checkstyle(problems, xml, lambda x: x)
+
+        xml = ('<checkstyle><file name="a.py"><error line="1" message="Bad" />'
+               '</file><file name="b.py"></checkstyle>')
+        with self.assertRaises(ElementTree.ParseError):
+            tools.process_checkstyle(problems, xml, lambda x: x)
+        assert 0 == len(problems), 'Should not add problems from broken output'
+
+        with self.assertRaises(ElementTree.ParseError):
+            tools.process_checkstyle(problems, 'Not xml', lambda x: x)
+
+
+class TestProcessPmd(TestCase):
+    def test_process(self):
+        problems = Problems()
+        xml = io.BytesIO(b"""<?xml version="1.0" encoding="UTF-8" ?>
+<pmd version="6.0">
+<file name="/src/Things.php">
+<violation beginline="3" endline="4" rule="UnusedLocalVariable"
+  externalInfoUrl="https://phpmd.org/rules/unusedcode.html">
+Avoid unused local variables such as '$a'.
+</violation>
+<violation beginline="nope" rule="Broken">Bad line</violation>
+</file>
+</pmd>
+""")
+        tools.process_pmd(problems, xml, docker.strip_base)
+        errors = problems.all('Things.php')
+        assert 1 == len(errors)
+        assert 3 == errors[0].line
+        assert errors[0].body.startswith('UnusedLocalVariable: Avoid unused')
+
 
 class ProcessQuickfix(TestCase):
     def test(self):